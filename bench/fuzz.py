@@ -0,0 +1,87 @@
+"""time each vendor parser on garbled and adversarial receipts
+
+   python -m bench.fuzz [--sizes 1000,10000,100000] [--count 20]
+                        [--slow 0.5] [--save-slow DIR]
+
+   for each vendor and size, --count receipts are garbled at random (see
+   synthetic.garble) and each of the vendor's adversarial receipts (see
+   synthetic.adversarial) is built. the slowest garbled parse and each
+   adversarial parse are reported in microseconds per KB, which should
+   stay flat as the size grows; a parse that grows faster is backtracking
+   or rescanning. parses are run without a time budget, and any taking
+   more than --slow seconds are listed, and saved under --save-slow to be
+   reproduced with python -m receipts.classify --budget 0 FILE. a parse
+   raising anything but ReceiptError is listed too.
+"""
+import os
+import time
+
+import click
+
+from receipts.classify import classify
+from receipts.errors import ReceiptError
+from receipts import synthetic
+
+
+def parse(data):
+    """return (seconds, outcome) for classifying data without a budget"""
+    start = time.perf_counter()
+    try:
+        classify(data, budget=None)
+        outcome = "ok"
+    except ReceiptError as exc:
+        outcome = exc.stage or "error"
+    except Exception as exc:
+        outcome = f"raised {exc!r}"
+    return time.perf_counter() - start, outcome
+
+
+def cases(vendor, size, count):
+    """yield (name, text) for each receipt to parse"""
+    for seed in range(count):
+        yield f"garbled {seed}", synthetic.fuzzed(vendor, size, seed)
+    yield from synthetic.adversarial(vendor, size)
+
+
+@click.command()
+@click.option("--sizes", default="1000,10000,100000",
+              help="comma separated receipt sizes in characters")
+@click.option("--count", default=20, help="garbled receipts per size")
+@click.option("--vendor", "-v", type=click.Choice(synthetic.VENDORS),
+              multiple=True, help="vendors to fuzz (default all)")
+@click.option("--slow", default=0.5, help="seconds taken to be too slow")
+@click.option("--save-slow", type=click.Path(file_okay=False),
+              help="write the slow and failing receipts here")
+def cli(sizes, count, vendor, slow, save_slow):
+    problems = []
+    for name in vendor or synthetic.VENDORS:
+        for size in (int(size) for size in sizes.split(",")):
+            garbled = []
+            for case, data in cases(name, size, count):
+                seconds, outcome = parse(data)
+                per_kb = seconds * 1e6 * 1024 / max(len(data), 1)
+                if seconds > slow or outcome.startswith("raised"):
+                    problems.append((name, size, case, data, seconds,
+                                     outcome))
+                if case.startswith("garbled"):
+                    garbled.append(per_kb)
+                else:
+                    print(f"{name:<13} {size:>8} {case:<22} {per_kb:>10.1f}"
+                          f" us/KB  {outcome}")
+            print(f"{name:<13} {size:>8} {'garbled (slowest)':<22}"
+                  f" {max(garbled):>10.1f} us/KB")
+
+    for name, size, case, data, seconds, outcome in problems:
+        print(f"{name} {size} {case}: {seconds:.3f}s {outcome}")
+        if save_slow:
+            os.makedirs(save_slow, exist_ok=True)
+            path = os.path.join(save_slow, f"{name}-{size}-"
+                                f"{case.replace(' ', '-')}.txt")
+            with open(path, "w") as output:
+                output.write(data)
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
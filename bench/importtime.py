@@ -0,0 +1,57 @@
+"""check cold import times against the budget in bench/importtime.json
+
+   python -m bench.importtime [--repeat 5] [--update]
+
+   each module is imported in a fresh interpreter with -X importtime and
+   the best cumulative time is compared against its budget in microseconds;
+   exits nonzero when any module is over budget
+"""
+import json
+import os.path
+import subprocess
+import sys
+
+import click
+
+BUDGET = os.path.join(os.path.dirname(__file__), "importtime.json")
+
+
+def importtime(module):
+    """cumulative import time of module in microseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise Exception(f"no import time reported for {module}")
+
+
+@click.command()
+@click.option("--repeat", default=5, help="imports per module, best is kept")
+@click.option("--update", is_flag=True,
+              help="write the measured times as the new budget")
+def cli(repeat, update):
+    with open(BUDGET) as f:
+        budget = json.load(f)
+    measured = {}
+    over = []
+    for module, limit in budget.items():
+        best = min(importtime(module) for _ in range(repeat))
+        measured[module] = best
+        status = "ok" if best <= limit else "OVER"
+        if best > limit:
+            over.append(module)
+        print(f"{module:<20} {best / 1000:>7.1f}ms"
+              f" budget {limit / 1000:>7.1f}ms {status}")
+    if update:
+        with open(BUDGET, "w") as f:
+            json.dump(measured, f, indent=2)
+            f.write("\n")
+    elif over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,90 @@
+"""compare ocr uploads with and without image preprocessing
+
+   python -m bench.preprocess [--count 16] [--bandwidth 2000000]
+   python -m bench.preprocess --check [--endpoint URL]
+
+   synthetic receipt photos are sent to a local stand-in annotator which
+   charges for the upload at --bandwidth bytes per second, once as they are
+   and once prepared by receipts.preprocess, reporting the bytes uploaded
+   and the end to end time. --check instead sends each photo both ways to
+   the real vision api (or --endpoint) and reports any photo whose text
+   changed. needs Pillow.
+"""
+import os
+import tempfile
+import time
+
+import click
+
+from receipts.standin import StandIn
+from receipts import synthetic
+from receipts import vision
+
+
+def photos(directory, count):
+    """write count receipt photos to directory, returning their paths"""
+    paths = []
+    for index in range(count):
+        text = synthetic.receipt(synthetic.VENDORS[index % 3], lines=40,
+                                 seed=index)
+        path = os.path.join(directory, f"receipt{index}.jpg")
+        with open(path, "wb") as f:
+            f.write(synthetic.photo(text, orientation=(1, 6)[index % 2],
+                                    seed=index))
+        paths.append(path)
+    return paths
+
+
+def upload(paths, bandwidth, prepare):
+    """return (bytes uploaded, seconds) sending paths to a stand-in"""
+    server = StandIn(bandwidth=bandwidth).start()
+    try:
+        start = time.perf_counter()
+        for _, response in vision.annotate_batch(
+                paths, vision.HttpAnnotator(server.url), batch_size=4,
+                prepare=prepare):
+            if error := response.get("error"):
+                raise Exception(error["message"])
+        return server.bytes, time.perf_counter() - start
+    finally:
+        server.stop()
+
+
+def check(paths, annotator):
+    """return the paths whose text changes when they are prepared"""
+    changed = []
+    for path in paths:
+        raw = vision.text(vision.annotate(path, annotator))
+        prepared = vision.text(vision.annotate(path, annotator, prepare=True))
+        if raw.split() != prepared.split():
+            changed.append(path)
+    return changed
+
+
+@click.command()
+@click.option("--count", default=16, help="photos to send")
+@click.option("--bandwidth", default=2_000_000.0,
+              help="stand-in upload speed in bytes per second")
+@click.option("--check", "check_text", is_flag=True, default=False,
+              help="check the ocr text is unchanged by preprocessing")
+@click.option("--endpoint",
+              help="vision REST api to check against (default google)")
+def cli(count, bandwidth, check_text, endpoint):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = photos(directory, count)
+        if check_text:
+            annotator = vision.HttpAnnotator(endpoint) if endpoint else None
+            changed = check(paths, annotator)
+            for path in changed:
+                print(f"{os.path.basename(path)}: text changed")
+            print(f"{len(paths) - len(changed)}/{len(paths)} unchanged")
+            return
+
+        for name, prepare in (("original", False), ("preprocessed", True)):
+            sent, elapsed = upload(paths, bandwidth, prepare)
+            print(f"{name:<13} {sent / count / 1e6:>7.2f}MB/image"
+                  f" {elapsed:>7.2f}s {count / elapsed:>6.2f} images/s")
+
+
+if __name__ == "__main__":
+    cli()
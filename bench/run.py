@@ -0,0 +1,113 @@
+"""benchmark each vendor parser and summary on synthetic receipts
+
+   python -m bench.run [--count 300] [--lines 50] [--compare OLD.json]
+
+   reports receipts per second (best of --repeat runs) and the peak memory
+   traced while parsing one pass. results are saved as
+   bench/results/<commit>.json (with a -dirty suffix for uncommitted
+   changes) so runs can be compared across commits with --compare.
+"""
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+
+import click
+
+from receipts.classify import classify
+from receipts.summary import summary
+from receipts import synthetic
+from receipts import vendor
+
+
+RESULTS = os.path.join(os.path.dirname(__file__), "results")
+
+
+def parser(name):
+    """return a function parsing one receipt with the named vendor parser"""
+    module = vendor.load(vendor.names().index(name))
+    return lambda data: list(module.classify(data))
+
+
+def summarize(data):
+    return summary(classify(data))
+
+
+def measure(work, receipts, repeat):
+    """return (receipts per second, peak traced bytes) for work"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in receipts:
+            work(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        for data in receipts:
+            work(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(receipts) / best, peak
+
+
+def revision():
+    """the current commit, marked dirty if the tree has changes"""
+    def git(*args):
+        return subprocess.run(("git",) + args, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    try:
+        commit = git("rev-parse", "--short", "HEAD")
+        dirty = git("status", "--porcelain", "--untracked-files=no")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def cases(count, options):
+    """yield (name, work, receipts) for each benchmark"""
+    for name in synthetic.VENDORS:
+        receipts = list(synthetic.receipts(count, (name,), **options))
+        yield name, parser(name), receipts
+    receipts = list(synthetic.receipts(count, **options))
+    yield "summary", summarize, receipts
+
+
+@click.command()
+@click.option("--count", default=300, help="receipts per benchmark")
+@click.option("--lines", default=50, help="item lines per receipt")
+@click.option("--discounts", default=0.2, help="chance of a discount")
+@click.option("--misalign", default=0.2,
+              help="chance of a misaligned safeway cost")
+@click.option("--repeat", default=3, help="timed runs, the best is kept")
+@click.option("--compare", type=click.File("r"),
+              help="earlier results to compare against")
+@click.option("--save/--no-save", default=True,
+              help="save results under bench/results")
+def cli(count, lines, discounts, misalign, repeat, compare, save):
+    options = dict(lines=lines, discounts=discounts, misalign=misalign)
+    before = json.load(compare)["results"] if compare else {}
+    results = {}
+    for name, work, receipts in cases(count, options):
+        rate, peak = measure(work, receipts, repeat)
+        results[name] = dict(receipts_per_second=rate, peak_bytes=peak)
+        line = f"{name:<14} {rate:>10.1f} receipts/s {peak / 1024:>9.1f}KB"
+        if (old := before.get(name)):
+            line += f" ({rate / old['receipts_per_second']:.2f}x," \
+                f" {peak / old['peak_bytes']:.2f}x memory)"
+        print(line)
+
+    if save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, f"{revision()}.json")
+        with open(path, "w") as f:
+            json.dump(dict(revision=revision(), count=count, repeat=repeat,
+                           options=options, results=results), f, indent=2)
+            f.write("\n")
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,37 @@
+"""time each safeway parsing stage on receipts of growing length
+
+   python -m bench.safeway [--sizes 10,100,1000,10000] [--misalign 0.8]
+
+   the receipts are badly misaligned, with runs of descriptions whose costs
+   all follow at the end of the run, and section labels between the runs.
+   the time per line of every stage should stay flat as the receipt grows
+"""
+import time
+
+import click
+
+from receipts import safeway
+from receipts import synthetic
+
+
+@click.command()
+@click.option("--sizes", default="10,100,1000,10000",
+              help="comma separated body line counts")
+@click.option("--misalign", default=0.8,
+              help="chance of a misaligned cost")
+def cli(sizes, misalign):
+    print(f"{'lines':>8} {'total':>9}  " + " ".join(
+        f"{stage:>10}" for stage in safeway.Pipeline.STAGES) + "  (us/line)")
+    for size in (int(size) for size in sizes.split(",")):
+        pipeline = safeway.Pipeline(synthetic.receipt(
+            "SAFEWAY", lines=size, misalign=misalign, seed=0))
+        start = time.perf_counter()
+        pipeline["result"]
+        elapsed = time.perf_counter() - start
+        print(f"{size:>8} {elapsed:>8.4f}s  " + " ".join(
+            f"{pipeline.timings[stage] / size * 1e6:>10.2f}"
+            for stage in safeway.Pipeline.STAGES))
+
+
+if __name__ == "__main__":
+    cli()
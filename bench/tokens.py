@@ -0,0 +1,36 @@
+"""time the harris teeter and whole foods parsers on very long receipts
+
+   python -m bench.tokens [--sizes 100,1000,10000,100000]
+
+   the time per item should stay flat as the receipt grows
+"""
+import time
+
+import click
+
+from receipts import harristeeter
+from receipts import synthetic
+from receipts import wholefoods
+
+
+VENDORS = (harristeeter, wholefoods)
+
+
+@click.command()
+@click.option("--sizes", default="100,1000,10000,100000",
+              help="comma separated item counts")
+def cli(sizes):
+    for module in VENDORS:
+        for size in (int(size) for size in sizes.split(",")):
+            data = synthetic.receipt(module.NAME, lines=2 * size,
+                                     discounts=0.5, seed=0)
+            start = time.perf_counter()
+            items = list(module.classify(data))
+            elapsed = time.perf_counter() - start
+            print(f"{module.NAME:<14} {size:>8} items"
+                  f" {elapsed:>9.4f}s"
+                  f" {elapsed / len(items) * 1e6:>7.2f}us/item")
+
+
+if __name__ == "__main__":
+    cli()
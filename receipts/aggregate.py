@@ -0,0 +1,193 @@
+"""grouped totals over many receipts
+
+   python -m receipts.aggregate --by vendor,month,kind receipt.txt ...
+
+   Receipts holds the money items of many receipts in columns (receipt
+   index, kind, cents), with each receipt's vendor, date and source kept
+   once. totals() and check() work on whole columns with numpy (listed in
+   requirements.txt), and fall back to a loop over the stdlib arrays when
+   it is not installed.
+"""
+from array import array
+
+import click
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from receipts.cache import ItemCache
+from receipts.classify import classify_paths
+from receipts.item import Item, ItemBatch
+from receipts.money import dollars
+
+
+KEYS = ("vendor", "day", "month", "kind")
+SPENDING = (Item.FOOD, Item.NON_FOOD, Item.TAX)
+
+
+class Receipts:
+
+    def __init__(self):
+        self.receipt = array("q")
+        self.kinds = bytearray()
+        self.cents = array("q")
+        self.vendors = []
+        self.dates = []
+        self.sources = []
+
+    def __len__(self):
+        return len(self.vendors)
+
+    def add(self, items):
+        """add one receipt's Items (or ItemBatch)"""
+        if not isinstance(items, ItemBatch):
+            items = ItemBatch.from_items(items)
+        attrs = items.attrs()
+        index = len(self.vendors)
+        self.vendors.append(attrs.get(Item.VENDOR) or "")
+        self.dates.append(attrs.get(Item.DATE) or "")
+        self.sources.append(attrs.get(Item.SOURCE))
+
+        text_kinds = ItemBatch.TEXT_KINDS
+        for kind, value in zip(items.kinds, items.cents):
+            if kind not in text_kinds:
+                self.receipt.append(index)
+                self.kinds.append(kind)
+                self.cents.append(value)
+
+    def keys(self, name):
+        """return the group key of each receipt (or kind) for a KEYS name"""
+        if name == "vendor":
+            return self.vendors
+        if name == "day":
+            return self.dates
+        if name == "month":
+            return [date[:7] for date in self.dates]
+        raise ValueError(f"key must be one of {KEYS}")
+
+    def totals(self, by=("vendor", "month", "kind"), kinds=SPENDING):
+        """return {key tuple: cents} summed over items of the given kinds
+
+           a "kind" key is the kind's name, e.g. "food"
+        """
+        for name in by:
+            if name not in KEYS:
+                raise ValueError(f"key must be one of {KEYS}")
+        receipt_keys = [self.keys(name) for name in by if name != "kind"]
+        position = by.index("kind") if "kind" in by else None
+        wanted = {ord(kind) for kind in kinds}
+
+        if numpy is None:
+            return self._totals(receipt_keys, position, wanted)
+
+        receipt = numpy.frombuffer(self.receipt, dtype=numpy.int64)
+        kind = numpy.frombuffer(self.kinds, dtype=numpy.uint8)
+        cents = numpy.frombuffer(self.cents, dtype=numpy.int64)
+        mask = numpy.isin(kind, list(wanted))
+        receipt, kind, cents = receipt[mask], kind[mask], cents[mask]
+        if not len(cents):
+            return {}
+
+        # one integer code per line for each key, then per distinct row
+        columns = []
+        labels = []
+        for values in receipt_keys:
+            unique, codes = numpy.unique(
+                numpy.array(values, dtype=object).astype(str),
+                return_inverse=True)
+            columns.append(codes[receipt])
+            labels.append(unique.tolist())
+        if position is not None:
+            unique, codes = numpy.unique(kind, return_inverse=True)
+            columns.insert(position, codes)
+            labels.insert(position, [Item.KIND_NAMES[chr(k)] for k in unique])
+        if not columns:
+            return {(): int(cents.sum())}
+
+        # combine the key columns into one mixed radix code per line
+        code = numpy.zeros(len(cents), dtype=numpy.int64)
+        for column, label in zip(columns, labels):
+            code = code * len(label) + column
+        rows, inverse = numpy.unique(code, return_inverse=True)
+        sums = _sum(inverse, cents, len(rows))
+
+        result = {}
+        for row, total in zip(rows.tolist(), sums.tolist()):
+            key = []
+            for label in reversed(labels):
+                row, index = divmod(row, len(label))
+                key.append(label[index])
+            result[tuple(reversed(key))] = total
+        return result
+
+    def _totals(self, receipt_keys, position, wanted):
+        receipt_keys = list(zip(*receipt_keys)) or [()] * len(self)
+        result = {}
+        for receipt, kind, cents in zip(self.receipt, self.kinds, self.cents):
+            if kind not in wanted:
+                continue
+            key = receipt_keys[receipt]
+            if position is not None:
+                name = Item.KIND_NAMES[chr(kind)]
+                key = key[:position] + (name,) + key[position:]
+            result[key] = result.get(key, 0) + cents
+        return result
+
+    def check(self):
+        """return the indexes of receipts whose total != food+non_food+tax"""
+        total, spent = ord(Item.TOTAL), {ord(kind) for kind in SPENDING}
+
+        if numpy is None:
+            difference = [0] * len(self)
+            for receipt, kind, cents in zip(
+                    self.receipt, self.kinds, self.cents):
+                if kind == total:
+                    difference[receipt] += cents
+                elif kind in spent:
+                    difference[receipt] -= cents
+            return [index for index, value in enumerate(difference) if value]
+
+        receipt = numpy.frombuffer(self.receipt, dtype=numpy.int64)
+        kind = numpy.frombuffer(self.kinds, dtype=numpy.uint8)
+        cents = numpy.frombuffer(self.cents, dtype=numpy.int64)
+        sign = numpy.where(kind == total, 1, 0) - \
+            numpy.isin(kind, list(spent)).astype(numpy.int64)
+        difference = _sum(receipt, sign * cents, len(self))
+        return numpy.flatnonzero(difference).tolist()
+
+
+def _sum(groups, cents, count):
+    """sum cents into count groups
+
+       bincount adds as float64, which is exact for totals under 2**53 cents
+    """
+    sums = numpy.bincount(groups, weights=cents, minlength=count)
+    return numpy.rint(sums).astype(numpy.int64)
+
+
+@click.command()
+@click.argument("source", nargs=-1)
+@click.option("--by", default="vendor,month,kind",
+              help=f"comma separated group keys from {','.join(KEYS)}")
+@click.option("--jobs", "-n", type=int, default=1,
+              help="number of worker processes")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+def cli(source, by, jobs, no_cache):
+    by = tuple(by.split(","))
+    receipts = Receipts()
+    cache = None if no_cache else ItemCache()
+    for items in classify_paths(source, jobs, cache=cache):
+        receipts.add(items)
+
+    for index in receipts.check():
+        print(f"{receipts.sources[index]}: total does not match sum of items")
+
+    for key, cents in sorted(receipts.totals(by).items()):
+        print(" ".join(str(part) for part in key), dollars(cents))
+
+
+if __name__ == "__main__":
+    cli()
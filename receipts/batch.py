@@ -0,0 +1,181 @@
+"""keep a run over many receipts going past the ones which fail
+
+   python -m receipts.summary --errors failed.jsonl receipts/*.txt
+   python -m receipts.summary --retry-failed failed.jsonl
+
+   a receipt which fails is written to the error report as a json line
+   holding the path it was read from, its source name, the vendor and
+   stage which failed, the exception and the text offset where parsing
+   stopped, and the run moves on to the next receipt. a file which cannot
+   be read is recorded the same way, with stage "read". --max-errors stops
+   the run once that many receipts have failed. --retry-failed reads a
+   report and processes only the receipts listed in it, so a fixed parser
+   can be checked against the failures of a long run without repeating
+   it; the report may be rewritten by the same run.
+"""
+from functools import partial
+import json
+import sys
+
+import click
+
+from receipts import metrics
+from receipts import sources
+
+
+def members(paths, qualified=False):
+    """yield (path, name, text) for each receipt held in paths, named as
+       sources.members names them
+
+       a path which cannot be read yields (path, name, exception) in place
+       of the receipts not yet read from it
+    """
+    for path in paths:
+        try:
+            for name, data in sources.file_members(path, qualified):
+                yield path, name, data
+        except Exception as exc:
+            yield path, sources.source_name(path, qualified), exc
+
+
+def failed(report):
+    """return {path: {name, ...}} for the receipts listed in a report"""
+    result = {}
+    with open(report) as lines:
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                result.setdefault(record["path"], set()).add(
+                    record["source"])
+    return result
+
+
+def selected(paths, retry_failed=None, qualified=False):
+    """yield (path, name, text) for each receipt in paths, or for each
+       receipt listed in the retry_failed report instead
+
+       the report is read before this returns, so it may be rewritten.
+       a file which could not be read is listed by its file name, and all
+       of its receipts are retried.
+    """
+    if not retry_failed:
+        return members(paths, qualified)
+    listed = failed(retry_failed)
+    return ((path, name, data)
+            for path, name, data in members(listed, qualified)
+            if name in listed[path] or isinstance(data, Exception) or
+            sources.source_name(path, qualified) in listed[path])
+
+
+def failure(path, name, exc, stage=None):
+    """return the report record for a receipt which raised exc"""
+    return dict(
+        path=path, source=name,
+        vendor=getattr(exc, "vendor", None),
+        stage=stage or getattr(exc, "stage", None),
+        exception=type(exc).__name__, error=str(exc),
+        offset=getattr(exc, "offset", None))
+
+
+def attempt(work, member):
+    """return (work((name, text)), None), or (None, failure) if it raises"""
+    path, name, data = member
+    try:
+        return work((name, data)), None
+    except Exception as exc:
+        return None, failure(path, name, exc)
+
+
+class Batch:
+    """run work over receipts, recording the ones which fail
+
+       failures are written to the report file at path, one json line
+       each. after max_errors failures no more receipts are taken.
+    """
+
+    def __init__(self, work, path=None, max_errors=None):
+        self.work = partial(attempt, work)
+        self.report = open(path, "w") if path else None
+        self.max_errors = max_errors
+        self.done = self.failures = 0
+
+    @property
+    def stopped(self):
+        return self.max_errors is not None and \
+            self.failures >= self.max_errors
+
+    def run(self, found, jobs=1, ordered=True):
+        """yield work((name, text)) for each receipt that succeeds
+
+           found yields (path, name, text), see selected
+        """
+        from receipts.classify import parallel
+
+        for result, record in parallel(self.work, self.taken(found), jobs,
+                                       ordered):
+            self.done += 1
+            if record is None:
+                yield result
+            else:
+                self.failures += 1
+                self.record(record)
+
+    def taken(self, found):
+        """yield the receipts in found to be worked on, recording the files
+           which could not be read"""
+        for member in found:
+            if self.stopped:
+                return
+            path, name, data = member
+            if isinstance(data, Exception):
+                self.done += 1
+                self.failures += 1
+                self.record(failure(path, name, data, "read"))
+            else:
+                yield member
+
+    def record(self, record):
+        if self.report is not None:
+            print(json.dumps(record), file=self.report, flush=True)
+        if metrics.enabled:
+            metrics.count("failures", vendor=record["vendor"] or "",
+                          stage=record["stage"] or "")
+        print(f"{record['source']}: {record['stage'] or 'error'}:"
+              f" {record['error']}", file=sys.stderr)
+
+    def finish(self):
+        """close the report and say how the run went on stderr"""
+        if self.report is not None:
+            self.report.close()
+        stopped = " (stopped at --max-errors)" if self.stopped else ""
+        print(f"{self.done - self.failures} receipts, {self.failures}"
+              f" failed{stopped}", file=sys.stderr)
+
+
+def options(command):
+    """add the batch mode options to a click command"""
+    for option in reversed((
+            click.option("--errors", "errors_path",
+                         type=click.Path(dir_okay=False),
+                         help="record failing receipts here as json lines"
+                         " and keep going"),
+            click.option("--max-errors", type=click.IntRange(min=1),
+                         help="keep going, but stop after this many"
+                         " failures"),
+            click.option("--retry-failed",
+                         type=click.Path(exists=True, dir_okay=False),
+                         help="process only the receipts listed in this"
+                         " error report"))):
+        command = option(command)
+    return command
+
+
+def start(work, paths, errors_path=None, max_errors=None, retry_failed=None,
+          jobs=1, ordered=True, qualified=False):
+    """return (Batch, results) for the commands taking options(), or
+       (None, None) when none of the options were given"""
+    if not (errors_path or max_errors or retry_failed):
+        return None, None
+    found = selected(paths, retry_failed, qualified)
+    batch = Batch(work, errors_path, max_errors)
+    return batch, batch.run(found, jobs, ordered)
@@ -0,0 +1,51 @@
+"""a time budget for parsing one receipt
+
+       with budget.limit(2.0):
+           items = list(parser.classify(data))
+
+   the parsers call check() as they go, which raises ParseTimeout once
+   the budget is spent, so a pathological receipt fails like any other bad
+   receipt instead of tying up a worker. vendor detection runs under the
+   same limit, and receipts.split checks it between the searches for each
+   receipt in a dump. the check is cooperative: it cannot stop a single
+   long regular expression search, so each step between checks must take
+   bounded time, which is why the parsers' patterns are anchored or
+   bounded rather than run over the whole receipt. the deadline is kept
+   per thread.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+from receipts.errors import ReceiptError
+
+
+BUDGET = 5.0  # seconds for one receipt, a normal one takes a millisecond
+
+_local = threading.local()
+
+
+class ParseTimeout(ReceiptError):
+    pass
+
+
+@contextmanager
+def limit(seconds):
+    """raise ParseTimeout from check() once seconds have passed
+
+       with seconds None or 0 there is no limit
+    """
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = time.perf_counter() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def check(stage=None, offset=None):
+    """raise ParseTimeout if the current budget is spent"""
+    if (deadline := getattr(_local, "deadline", None)) is not None and \
+            time.perf_counter() > deadline:
+        raise ParseTimeout("over the time budget", stage=stage,
+                           offset=offset)
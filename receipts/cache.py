@@ -0,0 +1,178 @@
+"""size bounded, least recently used, on-disk cache
+
+   entries are files named by key under a namespace directory. a hit touches
+   the file, so eviction removes the entries with the oldest mtime.
+"""
+import json
+import os
+import threading
+
+from receipts.item import Item
+
+
+DIRECTORY = os.environ.get(
+    "RECEIPTS_CACHE", os.path.join(os.path.expanduser("~"), ".cache",
+                                   "receipts"))
+MAX_SIZE = 256 * 1024 * 1024
+PARSER_VERSION = "1"  # bump to invalidate every vendor's cached items
+LOW_WATER = 0.9  # eviction stops when the cache is this full
+
+
+def digest(*parts):
+    """sha256 hex digest of str or bytes parts"""
+    import hashlib  # deferred: loading openssl is slow
+
+    result = hashlib.sha256()
+    for part in parts:
+        result.update(part.encode() if isinstance(part, str) else part)
+    return result.hexdigest()
+
+
+class Cache:
+    """entries under directory, evicted once they pass max_size bytes
+
+       one Cache may be shared by several threads, and is pickled without
+       its lock when handed to worker processes
+    """
+
+    DIRECTORY = DIRECTORY
+    MAX_SIZE = MAX_SIZE
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = directory or self.DIRECTORY
+        self.max_size = max_size or self.MAX_SIZE
+        self.size = None  # bytes in use, found on first put
+        self.lock = threading.Lock()  # guards size and eviction
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def path(self, namespace, key):
+        return os.path.join(self.directory, namespace, key)
+
+    def get(self, namespace, key):
+        """return the bytes stored for key, or None"""
+        path = self.path(namespace, key)
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, namespace, key, data):
+        """store bytes for key, evicting old entries if needed"""
+        import tempfile  # deferred: only needed when writing
+
+        path = self.path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            handle, temp = tempfile.mkstemp(prefix=".",
+                                            dir=os.path.dirname(path))
+            with os.fdopen(handle, "wb") as entry:
+                entry.write(data)
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp, path)
+
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.entries())
+            else:
+                self.size += len(data) - replaced
+            if self.size > self.max_size:
+                self.evict()
+
+    def entries(self):
+        """yield (mtime, size, path) for every cache entry"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):  # being written
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:  # removed by another process
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        """remove least recently used entries until under the low water mark"""
+        entries = sorted(self.entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_size * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def clear(self, namespace):
+        """remove every entry in namespace"""
+        for name in os.listdir(os.path.join(self.directory, namespace)):
+            os.remove(self.path(namespace, name))
+        self.size = None
+
+
+# modules every vendor parser relies on, beside this one
+SHARED = ("budget.py", "errors.py", "item.py", "lexer.py", "money.py",
+          "vendor.py")
+
+_versions = {}
+
+
+def version(module):
+    """return a hash of a parser module's source
+
+       cached results are keyed by this, so editing a vendor module
+       invalidates only that vendor's entries
+    """
+    if (result := _versions.get(module.__name__)) is None:
+        with open(module.__file__, "rb") as source:
+            result = _versions[module.__name__] = digest(source.read())
+    return result
+
+
+def shared_version():
+    """return a hash of the source of the SHARED modules
+
+       editing one of them invalidates every vendor's entries
+    """
+    if (result := _versions.get(SHARED)) is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        sources = []
+        for name in SHARED:
+            with open(os.path.join(directory, name), "rb") as source:
+                sources.append(source.read())
+        result = _versions[SHARED] = digest(*sources)
+    return result
+
+
+class ItemCache(Cache):
+    """cache of the Items parsed from receipt text"""
+
+    DIRECTORY = os.path.join(DIRECTORY, "items")
+
+    def key(self, module, data):
+        return digest(PARSER_VERSION, shared_version(), version(module),
+                      data)
+
+    def load(self, module, data):
+        """return cached Items for data parsed by module, or None"""
+        if (entry := self.get(module.NAME, self.key(module, data))) is None:
+            return None
+        return [Item(**item) for item in json.loads(entry)]
+
+    def save(self, module, data, items):
+        entry = json.dumps([item.as_dict() for item in items])
+        self.put(module.NAME, self.key(module, data), entry.encode())
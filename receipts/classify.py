@@ -1,58 +1,199 @@
-from decimal import Decimal
+from collections import deque
+from functools import partial
 import json
 import os.path
+import sys
 
 import click
 
-from receipts import harristeeter
-from receipts.item import Item
-from receipts import safeway
-from receipts import wholefoods
-
-
-def classify(data, source=None):
-
-    for kind in (harristeeter, safeway, wholefoods):
-        if kind.is_receipt(data):
-            items = [i for i in kind.classify(data)]
-            if source:
-                items.append(Item(Item.SOURCE, value=source))
-            return items
-
-    raise Exception("unable to classify data")
-
-
-def json_dump(items):
+from receipts import batch
+from receipts.budget import BUDGET, limit
+from receipts.cache import ItemCache
+from receipts.errors import ReceiptError
+from receipts.item import Item, ItemBatch
+from receipts import metrics
+from receipts.money import dollars
+from receipts import sources
+from receipts import vendor
+
+
+IN_FLIGHT = 4  # inputs queued per worker process
+
+
+@metrics.timed("classify")
+def classify(data, source=None, cache=None, budget=BUDGET):
+    """return the Items in receipt data
+
+       parsing stops with budget.ParseTimeout after budget seconds (None
+       or 0 for no limit). the time spent detecting the vendor counts
+       toward the budget.
+    """
+
+    with limit(budget):
+        with metrics.timer("detect"):
+            if (kind := vendor.detect(data)) is None:
+                raise ReceiptError("unable to classify data", stage="detect")
+
+        if cache is None or (items := cache.load(kind, data)) is None:
+            with metrics.timer("vendor_classify", vendor=kind.NAME):
+                try:
+                    items = [i for i in kind.classify(data)]
+                except ReceiptError as exc:
+                    exc.vendor = exc.vendor or kind.NAME
+                    raise
+                except Exception as exc:
+                    raise ReceiptError(str(exc), kind.NAME, "parse") from exc
+            if cache is not None:
+                cache.save(kind, data, items)
+    if metrics.enabled:
+        metrics.count("receipts", vendor=kind.NAME)
+        metrics.count("items", len(items), vendor=kind.NAME)
+    if source:
+        items.append(Item(Item.SOURCE, value=source))
+    return items
+
+
+def classify_path(path, cache=None, budget=BUDGET):
+    """read and classify the receipt stored at path"""
+    with open(path) as filedata:
+        data = filedata.read()
+
+    name = os.path.split(path)[1]
+    return classify(data, source=name, cache=cache, budget=budget)
+
+
+def classify_member(member, cache=None, budget=BUDGET):
+    """classify a (name, data) pair, recording name as its source"""
+    name, data = member
+    return classify(data, source=name, cache=cache, budget=budget)
+
+
+def parallel(work, iterable, jobs=1, ordered=True):
+    """yield work(x) for each x in iterable, using jobs processes
+
+       results are yielded in input order unless ordered is False, in which
+       case they are yielded as each one finishes. input is handed to the
+       pool as it is read, with at most IN_FLIGHT per worker waiting, so a
+       long iterable is never held in memory.
+    """
+    if jobs <= 1:
+        yield from map(work, iterable)
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    # gather the metrics recorded in the workers
+    gather = metrics.enabled
+    if gather:
+        work = partial(metrics.measured, work)
+
+    def result(future):
+        if not gather:
+            return future.result()
+        value, recorded = future.result()
+        metrics.merge(recorded)
+        return value
+
+    def finished(pending):
+        if ordered:
+            yield result(pending.popleft())
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield result(future)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for x in iterable:
+            pending.append(pool.submit(work, x))
+            if len(pending) >= jobs * IN_FLIGHT:
+                yield from finished(pending)
+        while pending:
+            yield from finished(pending)
+
+
+def classify_paths(paths, jobs=1, ordered=True, cache=None, budget=BUDGET,
+                   qualified=False):
+    """classify each receipt in paths, spreading the work over jobs processes
+
+       paths may name receipt files, zip or tar archives of them, or large
+       files of receipts back to back (see receipts.sources). results are
+       yielded in input order unless ordered is False. with qualified, each
+       receipt's source starts with the absolute path of its file.
+    """
+    work = partial(classify_member, cache=cache, budget=budget)
+    yield from parallel(work, sources.members(paths, qualified), jobs,
+                        ordered)
+
+
+@metrics.timed("json_dump")
+def json_dump(items, output=None):
+
+    if isinstance(items, ItemBatch):
+        base = {
+            Item.KIND_NAMES[kind]: value
+            for kind, value in items.attrs().items()
+        }
+        for kind, desc, value in items.lines():
+            serial = dict(kind=kind, desc=desc, value=dollars(value))
+            serial.update(base)
+            print(json.dumps(serial), file=output)
+        return
 
     base = {
         Item.KIND_NAMES[item.kind]: item.value
         for item in items
-        if not isinstance(item.value, Decimal)
+        if item.kind in Item.TEXT_KINDS
     }
 
     for item in items:
         if item.kind in (Item.FOOD, Item.NON_FOOD):
             serial = item.as_dict()
             serial.update(base)
-            print(json.dumps(serial))
+            print(json.dumps(serial), file=output)
 
 
 @click.command()
 @click.argument("source", nargs=-1)
 @click.option("--json", "-j", is_flag=True, default=False)
-def cli(source, json):
-
-    for path in source:
-        with open(path) as filedata:
-            data = filedata.read()
-
-        name = os.path.split(path)[1]
-        items = classify(data, source=name)
+@click.option("--jobs", "-n", type=int, default=1,
+              help="number of worker processes")
+@click.option("--unordered", is_flag=True, default=False,
+              help="print each result as soon as it is ready")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+@click.option("--metrics", "metrics_path", type=click.Path(dir_okay=False),
+              help="write timings and counts here (.json or prometheus)")
+@click.option("--budget", type=float, default=BUDGET,
+              help="seconds allowed to parse one receipt, checked between"
+              " parsing steps (0 for no limit)")
+@batch.options
+def cli(source, json, jobs, unordered, no_cache, metrics_path, budget,
+        errors_path, max_errors, retry_failed):
+
+    if metrics_path:
+        metrics.enable()
+    cache = None if no_cache else ItemCache()
+    run, results = batch.start(
+        partial(classify_member, cache=cache, budget=budget), source,
+        errors_path,
+        max_errors, retry_failed, jobs, ordered=not unordered)
+    if run is None:
+        results = classify_paths(source, jobs, ordered=not unordered,
+                                 cache=cache, budget=budget)
+    for items in results:
         if json:
             json_dump(items)
         else:
             for item in items:
                 print(item)
+    if run is not None:
+        run.finish()
+    if metrics_path:
+        metrics.write(metrics_path)
+    if run is not None and run.failures:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
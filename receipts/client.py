@@ -0,0 +1,133 @@
+"""thin client for the resident classify server
+
+   python -m receipts.client [--json] [--summary] receipt.txt ...
+
+   takes the same arguments as receipts.classify (plus --summary, which
+   prints what receipts.summary would) but sends each receipt to a running
+   receipts.server, so nothing but the standard library is imported.
+   --no-cache and --budget are sent along with each receipt; --jobs and
+   --unordered have no effect on a server, which is sent the receipts one
+   at a time. if no server is listening, or any of --metrics, --errors,
+   --max-errors and --retry-failed is given (they keep state for the whole
+   run), the receipts are classified in this process by the regular CLI.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+def socket_path():
+    """return the unix socket the server listens on"""
+    if path := os.environ.get("RECEIPTS_SOCKET"):
+        return path
+    directory = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(directory, f"receipts-{os.getuid()}.sock")
+
+
+def send(connection, replies, command, data, source=None,
+         json_output=False, cache=True, budget=None):
+    """send one receipt and return the server's response dict
+
+       replies is connection.makefile("rb"). budget is the parse time
+       budget in seconds, None for the server's default.
+    """
+    body = data.encode()
+    header = dict(command=command, source=source, json=json_output,
+                  cache=cache, budget=budget, length=len(body))
+    connection.sendall(json.dumps(header).encode() + b"\n" + body)
+    return json.loads(replies.readline())
+
+
+def cli_arguments(options):
+    """return the receipts.classify or receipts.summary arguments for
+       the client's options"""
+    arguments = []
+    if not options.summary:
+        arguments += ["--jobs", str(options.jobs)]
+        if options.json:
+            arguments.append("--json")
+        if options.unordered:
+            arguments.append("--unordered")
+    if options.no_cache:
+        arguments.append("--no-cache")
+    for flag, value in (("--metrics", options.metrics_path),
+                        ("--budget", options.budget),
+                        ("--errors", options.errors_path),
+                        ("--max-errors", options.max_errors),
+                        ("--retry-failed", options.retry_failed)):
+        if value is not None:
+            arguments += [flag, str(value)]
+    return arguments + options.source
+
+
+def local(options):
+    """classify in this process, as the regular CLIs would"""
+    if options.summary:
+        from receipts.summary import cli
+    else:
+        from receipts.classify import cli
+    cli(cli_arguments(options))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog="receipts.client")
+    parser.add_argument("source", nargs="*")
+    parser.add_argument("--json", "-j", action="store_true")
+    parser.add_argument("--summary", action="store_true")
+    parser.add_argument("--socket", default=socket_path())
+    parser.add_argument("--jobs", "-n", type=int, default=1,
+                        help="number of worker processes (no effect on a"
+                        " server)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="print each result as soon as it is ready (no"
+                        " effect on a server)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse every receipt, ignoring cached results")
+    parser.add_argument("--budget", type=float,
+                        help="seconds allowed to parse one receipt, checked"
+                        " between parsing steps (0 for no limit)")
+    parser.add_argument("--metrics", dest="metrics_path",
+                        help="write timings and counts here (runs locally)")
+    parser.add_argument("--errors", dest="errors_path",
+                        help="record failing receipts here as json lines and"
+                        " keep going (runs locally)")
+    parser.add_argument("--max-errors", type=int,
+                        help="keep going, but stop after this many failures"
+                        " (runs locally)")
+    parser.add_argument("--retry-failed",
+                        help="process only the receipts listed in this error"
+                        " report (runs locally)")
+    options = parser.parse_args(arguments)
+
+    if options.metrics_path or options.errors_path or \
+            options.max_errors or options.retry_failed:
+        return local(options)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(options.socket)
+    except OSError:
+        connection.close()
+        return local(options)
+
+    command = "summary" if options.summary else "classify"
+    failed = False
+    with connection, connection.makefile("rb") as replies:
+        for path in options.source:
+            with open(path) as data:
+                data = data.read()
+            response = send(connection, replies, command, data,
+                            os.path.basename(path), options.json,
+                            not options.no_cache, options.budget)
+            if response["ok"]:
+                sys.stdout.write(response["output"])
+            else:
+                print(f"{path}: {response['error']}", file=sys.stderr)
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""find receipts which have been seen before
+
+   two layers, one on each side of ocr:
+
+   - photos are compared by a perceptual hash of the receipt, cropped from
+     its background: a 2048 bit average hash of its tall, narrow layout of
+     text lines. a photo within DISTANCE bits of an earlier one is a retake
+     and is not sent. a photo is only added once it has been read, and one
+     which cannot be hashed is never taken for a retake. DISTANCE is kept
+     low, as a photo taken for a retake is never read; a retake which is
+     missed costs one ocr call and is caught by the second layer.
+   - classified receipts are compared by a fingerprint of their vendor,
+     date, total and the multiset of their items, which receipts.store
+     keeps indexed.
+
+   image hashes are looked up by locality sensitive hashing: each of TABLES
+   tables buckets the hashes by SAMPLE of their bits, at positions fixed by
+   SEED. hashes a few percent of their bits apart very likely agree on
+   every sampled bit of at least one table, while hashes further apart
+   rarely do, so a lookup only measures its distance to the few photos
+   sharing one of its buckets. with these settings a photo DISTANCE bits
+   from an earlier one is missed about one time in 200. the index is kept
+   in sqlite in the cache directory, so it is not loaded into memory.
+   image hashing needs Pillow.
+"""
+from collections import Counter
+import hashlib
+from operator import itemgetter
+import os
+import random
+import sqlite3
+import threading
+
+from receipts.cache import DIRECTORY
+from receipts.item import Item, normalize
+
+
+SIZE = (32, 64)  # average hash grid, receipts are tall
+BITS = SIZE[0] * SIZE[1]
+DISTANCE = 64  # of BITS, other receipts measured 70-600 apart
+TABLES = 12
+SAMPLE = 32  # bits keying each table
+SEED = 1  # change to rebuild the index when the settings above change
+
+_rng = random.Random(SEED)
+_samplers = [itemgetter(*_rng.sample(range(BITS), SAMPLE))
+             for _ in range(TABLES)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    hash BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bucket (
+    tab INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    image INTEGER NOT NULL REFERENCES image(id)
+);
+CREATE INDEX IF NOT EXISTS bucket_key ON bucket(tab, key);
+CREATE INDEX IF NOT EXISTS image_source ON image(source);
+"""
+
+
+def image_hash(content):
+    """return the perceptual hash of the receipt in an image
+
+       whether each pixel of a SIZE thumbnail of the receipt is brighter
+       than the mean, as an int
+    """
+    import io
+
+    from PIL import Image, ImageOps
+
+    from receipts.preprocess import receipt_box
+
+    with Image.open(io.BytesIO(content)) as original:
+        original.draft("L", (512, 512))  # decode jpegs at reduced size
+        image = ImageOps.exif_transpose(original).convert("L")
+    if (box := receipt_box(image)) is not None:
+        image = image.crop(box)
+    pixels = image.resize(SIZE, Image.Resampling.BOX).tobytes()
+    mean = sum(pixels) / len(pixels)
+    return int("".join("1" if value > mean else "0" for value in pixels), 2)
+
+
+def hashed(content):
+    """return image_hash(content), or None if it is not a readable image"""
+    try:
+        return image_hash(content)
+    except Exception:
+        return None
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def buckets(key):
+    """return the bucket of each table for a hash"""
+    digits = format(key, f"0{BITS}b")
+    return [int("".join(sampler(digits)), 2) for sampler in _samplers]
+
+
+class ImageIndex:
+    """perceptual hashes of the photos seen so far
+
+       kept in a sqlite database at path, or in memory without one. an
+       index may be used from any thread, one call at a time.
+    """
+
+    PATH = os.path.join(DIRECTORY, f"images-{SEED}.db")
+
+    def __init__(self, path=None):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path or ":memory:",
+                                          check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT count(*) FROM image").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def search(self, key, radius=DISTANCE):
+        """return [(distance, source)] for photos found within radius,
+           nearest first"""
+        found = []
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source, hash FROM image WHERE id IN"
+                " (SELECT image FROM bucket WHERE"
+                + " OR ".join(["(tab = ? AND key = ?)"] * TABLES) + ")",
+                [value for pair in enumerate(buckets(key))
+                 for value in pair]).fetchall()
+        for source, other in rows:
+            if (d := distance(key, int.from_bytes(other, "big"))) <= radius:
+                found.append((d, source))
+        return sorted(found)
+
+    def add(self, key, source):
+        """add the hash of a photo, unless source was added with it before"""
+        with self.lock, self.connection as db:
+            packed = key.to_bytes(BITS // 8, "big")
+            if db.execute("SELECT 1 FROM image WHERE source = ? AND hash = ?",
+                          (source, packed)).fetchone():
+                return
+            image = db.execute(
+                "INSERT INTO image (source, hash) VALUES (?, ?)",
+                (source, packed)).lastrowid
+            db.executemany(
+                "INSERT INTO bucket (tab, key, image) VALUES (?, ?, ?)",
+                [(tab, bucket, image)
+                 for tab, bucket in enumerate(buckets(key))])
+
+    def duplicate(self, key, source):
+        """return the source of the photo a hash duplicates, or None
+
+           a source seen again is not a duplicate of itself
+        """
+        if found := self.search(key):
+            original = found[0][1]
+            return None if original == source else original
+        return None
+
+
+def default_index():
+    """the image index kept in the cache directory"""
+    return ImageIndex(ImageIndex.PATH)
+
+
+def fingerprint(items):
+    """return a digest of a receipt's vendor, date, total and items, or
+       None for a receipt missing any of vendor, date and total
+
+       two receipts with the same fingerprint are copies of each other,
+       whatever their source and the order their items were read in. the
+       date has no time of day, so two identical purchases made at the
+       same store on the same day have the same fingerprint too.
+    """
+    attrs = {}
+    lines = Counter()
+    for item in items:
+        if item.kind in Item.TEXT_KINDS:
+            attrs[item.kind] = item.value
+        elif item.kind == Item.TOTAL:
+            attrs[Item.TOTAL] = item.cents
+        else:
+            lines[item.kind, normalize(item.desc), item.cents] += 1
+    parts = [attrs.get(Item.VENDOR), attrs.get(Item.DATE),
+             attrs.get(Item.TOTAL)]
+    if None in parts:
+        return None
+    parts += sorted(lines.items())
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
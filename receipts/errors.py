@@ -0,0 +1,13 @@
+class ReceiptError(Exception):
+    """a receipt which could not be read
+
+       vendor is the vendor's NAME once it is known, stage names the step
+       which failed ("detect", a parser stage or "summary") and offset is
+       the position in the receipt text where parsing stopped, when known
+    """
+
+    def __init__(self, message, vendor=None, stage=None, offset=None):
+        super().__init__(message)
+        self.vendor = vendor
+        self.stage = stage
+        self.offset = offset
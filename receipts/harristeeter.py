@@ -1,17 +1,42 @@
 import re
 
+from receipts import budget
+from receipts.errors import ReceiptError
+from receipts import lexer
 from receipts.item import Item
+from receipts.vendor import MARKERS
 
 
 NAME = "HARRISTEETER"
+SIGNATURE = "Harris Teeter"
+BODY, FOOTER = MARKERS[NAME]
+
+HEADER = re.compile(BODY + r" \d* ")
+FOOTER_START = re.compile(FOOTER)
+PRICE_YOU_PAY = re.compile(r"PRICE YOU PAY \d+\.\d\d ")
+TAX = re.compile(r"TAX (\d+\.\d\d) ")
+BALANCE = re.compile(r"BALANCE (\d+\.\d\d) ")
+DATE = re.compile(r"(\d\d)/(\d\d)/(\d\d) ")
 
 
 def is_receipt(data):
-    if re.search("Harris Teeter", data):
+    if re.search(SIGNATURE, data):
         return True
     return False
 
 
+def is_cost(data, token):
+    """True if token is a line item cost ("1.23" or "1.23-B")
+
+       a quantity price ("2 @ 1.99") is not a cost
+    """
+    if token.kind == lexer.AMOUNT or \
+            (token.kind == lexer.DISCOUNT and token.flag):
+        return token.end < len(data) and \
+            data[token.start - 2:token.start] != "@ "
+    return False
+
+
 def classify(data):
     """parse Items from harris teeter receipt data"""
 
@@ -19,41 +44,68 @@ def classify(data):
     data = data.replace("\n", " ")
 
     # remove header
-    header, body = re.split(r"VIC CUSTOMER \d* ", data, 1)
+    if (m := HEADER.search(data)) is None:
+        raise ReceiptError("no VIC CUSTOMER header", NAME, "header", 0)
+    position = m.end()
+
+    tokens = lexer.tokenize(data, position)
+    count = len(tokens)
+    index = 0  # first token at or after position
 
     yield Item(Item.VENDOR, value=NAME)
 
     # for each purchase
-    while not body.startswith("**** "):  # start of footer
-        if (m := re.match(r"PRICE YOU PAY \d+\.\d\d (.*)", body)):
-            body = m.group(1)  # ignore this
-        elif (m := re.match(r"TAX (\d+\.\d\d) (.*)", body)):
-            tax, body = m.groups()
-            yield Item(Item.TAX, value=tax)
-        elif (m := re.match(
-                r"(.*?) ((?<!@ )\d+\.\d\d)(?:( |-)([A-Z]))? (.*)", body)):
-            desc, cost, sep, kind, body = m.groups()
+    while not FOOTER_START.match(data, position):
+        budget.check("items", position)
+        if (m := PRICE_YOU_PAY.match(data, position)):
+            position = m.end()  # ignore this
+        elif (m := TAX.match(data, position)):
+            position = m.end()
+            yield Item(Item.TAX, value=m.group(1))
+        else:
+            found = index
+            while found < count and not (
+                    tokens[found].start > position and
+                    is_cost(data, tokens[found])):
+                found += 1
+            if found == count:
+                raise ReceiptError(
+                    f"unmatched data: {data[position:position + 50]}...",
+                    NAME, "items", position)
+
+            amount = tokens[found]
+            desc = data[position:amount.start - 1]
+            kind, end = amount.flag, amount.end
+            if amount.kind == lexer.DISCOUNT:  # discounted amount
+                cost = "-" + amount.amount
+            else:
+                cost = amount.amount
+                if found + 1 < count:
+                    flag = tokens[found + 1]
+                    if flag.kind == lexer.FLAG and len(flag.text) == 1 and \
+                            flag.start == end + 1 and flag.end < len(data):
+                        kind, end = flag.flag, flag.end
+            position = end + 1
+
             if desc.find("HOT FOODS") >= 0:
                 kind = Item.FOOD
             elif kind == "B":
                 kind = Item.FOOD
             else:
                 kind = Item.NON_FOOD
-            if sep == "-":  # discounted amount
-                cost = sep + cost
             yield Item(kind, desc, cost)
-        elif (m := re.match(r"(.*) - (\d+\.\d\d) (.*)", body)):
-            desc, cost, body = m.groups()
-            yield Item(Item.NON_FOOD, desc, cost)
-        else:
-            raise Exception(f"unmatched data: {body[:50]}...")
 
-    if (s := re.search(r"BALANCE (\d+\.\d\d) ", body)):
+        while index < count and tokens[index].start < position:
+            index += 1
+
+    body = data[position:]
+
+    if (s := BALANCE.search(body)):
         cost = s.group(1)
         yield Item(Item.TOTAL, value=cost)
 
-    if (s := re.search(r"(\d\d)/(\d\d)/(\d\d) (.*)", body)):
-        month, day, year, data = s.groups()
+    if (s := DATE.search(body)):
+        month, day, year = s.groups()
         yield Item(Item.DATE, value=f"20{year}-{month}-{day}")
 
 
@@ -1,6 +1,14 @@
+from array import array
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
 import json
+import re
+
+from receipts.money import cents, decimal, dollars
+
+
+def normalize(desc):
+    """upper case words of a description, without punctuation"""
+    return re.sub(r"[^A-Z0-9]+", " ", desc.upper()).strip()
 
 
 class Item:
@@ -25,16 +33,25 @@ class Item:
 
     VALID_KIND = tuple(kind for kind in KIND_NAMES.keys())
 
+    DEFAULT_DESC = {
+        TAX: "Tax",
+        TOTAL: "Total",
+        DATE: "Date",
+        VENDOR: "Vendor",
+        SOURCE: "Source",
+    }
+
+    TEXT_KINDS = (DATE, VENDOR, SOURCE)  # kinds whose value is not money
+
     def __init__(self, kind, desc=None, value=None):
+        """money values are held as integer cents (see receipts.money)
+
+           value reads as a two place Decimal for money kinds; cents reads
+           (and can be assigned) the integer amount directly
+        """
         self.kind = kind
 
-        if default := {
-                self.TAX: "Tax",
-                self.TOTAL: "Total",
-                self.DATE: "Date",
-                self.VENDOR: "Vendor",
-                self.SOURCE: "Source",
-                }.get(self.kind):
+        if default := self.DEFAULT_DESC.get(self.kind):
             desc = default
 
         self.desc = desc
@@ -52,34 +69,48 @@ class Item:
                 pass
             elif self.kind == self.DATE:
                 datetime.strptime(value, "%Y-%m-%d")  # just checking
-            elif value is None:
-                value = Decimal("0.00")
             else:
-                try:
-                    value = Decimal(value)
-                except InvalidOperation as exc:
-                    raise ValueError(f"invalid number {value}") from exc
+                name, value = "cents", cents(value)
+        elif name == "cents":
+            if not isinstance(value, int):
+                raise ValueError(f"invalid cents {value}")
         else:
             raise AttributeError(name)
 
+        if name == "cents":
+            self.__dict__.pop("value", None)
+        elif name == "value":
+            self.__dict__.pop("cents", None)
         self.__dict__[name] = value
 
+    @property
+    def value(self):
+        if (value := self.__dict__.get("cents")) is not None:
+            return decimal(value)
+        return self.__dict__.get("value")
+
+    @property
+    def cents(self):
+        return self.__dict__.get("cents")
+
+    def text(self):
+        """return the value as it is serialized"""
+        if (value := self.__dict__.get("cents")) is not None:
+            return dollars(value)
+        return self.__dict__.get("value")
+
     def __str__(self):
-        if isinstance(self.value, Decimal):
-            value = f"{self.value:>.2f}"
-        else:
-            value = self.value
         return (
             f"{self.kind}"
             f" {self.desc}"
-            f" {value}"
+            f" {self.text()}"
         )
 
     def as_dict(self):
         return dict(
             kind=self.kind,
             desc=self.desc,
-            value=f"{v:>.2f}" if isinstance(v := self.value, Decimal) else v
+            value=self.text(),
         )
 
     @classmethod
@@ -88,3 +119,154 @@ class Item:
 
     def dumps(self):
         return json.dumps(self.as_dict())
+
+
+class CompactItem:
+    """slotted item with pre-validated fields, as an ItemBatch yields them
+
+       no checks are made on assignment: value is integer cents for money
+       kinds and a str for Item.TEXT_KINDS
+    """
+
+    __slots__ = ("kind", "desc", "value")
+
+    def __init__(self, kind, desc, value):
+        self.kind = kind
+        self.desc = desc
+        self.value = value
+
+    @classmethod
+    def from_item(cls, item):
+        if item.kind in Item.TEXT_KINDS:
+            return cls(item.kind, item.desc, item.value)
+        return cls(item.kind, item.desc, item.cents)
+
+    def as_item(self):
+        if self.kind in Item.TEXT_KINDS:
+            return Item(self.kind, self.desc, self.value)
+        item = Item(self.kind, self.desc)
+        item.cents = self.value
+        return item
+
+    def __str__(self):
+        if self.kind in Item.TEXT_KINDS:
+            value = self.value
+        else:
+            value = dollars(self.value)
+        return f"{self.kind} {self.desc} {value}"
+
+    def as_dict(self):
+        if self.kind in Item.TEXT_KINDS:
+            value = self.value
+        else:
+            value = dollars(self.value)
+        return dict(kind=self.kind, desc=self.desc, value=value)
+
+
+class ItemBatch:
+    """columnar collection of items
+
+       kinds are stored as bytes, money values as integer cents and the
+       values of Item.TEXT_KINDS in a parallel list (None for money kinds).
+       nothing is validated beyond the conversion to cents.
+
+       this is a storage format for holding and summing many receipts
+       (see receipts.aggregate), which summary and json_dump also accept.
+       the vendor parsers build one Item per line, so a receipt is
+       converted with from_items once it has been parsed.
+    """
+
+    TEXT_KINDS = frozenset(ord(kind) for kind in Item.TEXT_KINDS)
+
+    def __init__(self):
+        self.kinds = bytearray()
+        self.descs = []
+        self.cents = array("q")
+        self.texts = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        kind = chr(self.kinds[index])
+        if kind in Item.TEXT_KINDS:
+            value = self.texts[index]
+        else:
+            value = self.cents[index]
+        return CompactItem(kind, self.descs[index], value)
+
+    def append(self, kind, desc=None, value=None):
+        if kind not in Item.VALID_KIND:
+            raise ValueError(f"kind must be one of {Item.VALID_KIND}")
+        if default := Item.DEFAULT_DESC.get(kind):
+            desc = default
+        if kind in Item.TEXT_KINDS:
+            self._append(kind, desc, 0, value)
+        else:
+            self._append(kind, desc, cents(value), None)
+
+    def _append(self, kind, desc, value, text):
+        self.kinds.append(ord(kind))
+        self.descs.append(desc)
+        self.cents.append(value)
+        self.texts.append(text)
+
+    def extend(self, items):
+        """add Items (or CompactItems) to the batch"""
+        for item in items:
+            if item.kind in Item.TEXT_KINDS:
+                self._append(item.kind, item.desc, 0, item.value)
+            elif isinstance(item, CompactItem):
+                self._append(item.kind, item.desc, item.value, None)
+            else:
+                self._append(item.kind, item.desc, item.cents, None)
+
+    @classmethod
+    def from_items(cls, items):
+        batch = cls()
+        batch.extend(items)
+        return batch
+
+    def attrs(self):
+        """return {kind: value} for the text kinds in the batch"""
+        text_kinds = self.TEXT_KINDS
+        return {
+            chr(kind): text
+            for kind, text in zip(self.kinds, self.texts)
+            if kind in text_kinds
+        }
+
+    def lines(self):
+        """yield (kind, desc, cents) for each food and non-food item"""
+        food, non_food = ord(Item.FOOD), ord(Item.NON_FOOD)
+        for kind, desc, value in zip(self.kinds, self.descs, self.cents):
+            if kind == food or kind == non_food:
+                yield chr(kind), desc, value
+
+    def totals(self):
+        """return {kind: cents} summed over the money kinds in the batch"""
+        result = {Item.FOOD: 0, Item.NON_FOOD: 0}
+        text_kinds = self.TEXT_KINDS
+        for kind, value in zip(self.kinds, self.cents):
+            if kind not in text_kinds:
+                kind = chr(kind)
+                result[kind] = result.get(kind, 0) + value
+        return result
+
+    @classmethod
+    def loads(cls, lines):
+        """build a batch from Item.dumps lines"""
+        batch = cls()
+        for line in lines:
+            data = json.loads(line)
+            batch.append(data["kind"], data.get("desc"), data.get("value"))
+        return batch
+
+    def dumps(self):
+        """yield one json line per item, as Item.dumps would"""
+        for item in self:
+            yield json.dumps(item.as_dict())
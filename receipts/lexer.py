@@ -0,0 +1,58 @@
+"""split ocr text into tokens
+
+   the text is scanned once; each whitespace separated word becomes a Token
+   recording its kind, its position in the text and, for money tokens, the
+   dollars.cents amount and any trailing tax flag. parsers walk the token
+   list by index instead of repeatedly matching against the rest of the
+   receipt.
+"""
+from collections import namedtuple
+import re
+
+from receipts import budget
+
+
+WORD = "WORD"
+AMOUNT = "AMOUNT"  # 12.34
+DOLLAR = "DOLLAR"  # $12.34
+DISCOUNT = "DISCOUNT"  # 12.34-, 12.34-B, -12.34 or -$12.34
+FLAG = "FLAG"  # single letter tax code, or FT
+
+
+Token = namedtuple("Token", "kind text start end amount flag")
+
+
+LEXER = re.compile(r"""
+    (?P<DOLLAR>\$\d+\.\d\d)(?!\S)
+  | (?P<DISCOUNT>-\$?\d+\.\d\d|\d+\.\d\d-[A-Z]?)(?!\S)
+  | (?P<AMOUNT>\d+\.\d\d)(?!\S)
+  | (?P<FLAG>FT|[A-Z])(?!\S)
+  | (?P<WORD>\S+)
+""", re.VERBOSE)
+
+
+AMOUNT_VALUE = re.compile(r"\d+\.\d\d")
+CHECK_EVERY = 4096  # tokens between time budget checks
+
+
+def tokenize(data, start=0, end=None):
+    """return the list of Tokens in data[start:end]"""
+    if end is None:
+        end = len(data)
+
+    result = []
+    for match in LEXER.finditer(data, start, end):
+        kind = match.lastgroup
+        text = match.group()
+        amount = flag = None
+        if kind in (AMOUNT, DOLLAR, DISCOUNT):
+            amount = AMOUNT_VALUE.search(text).group()
+            if kind == DISCOUNT and text[-1].isalpha():
+                flag = text[-1]
+        elif kind == FLAG:
+            flag = text
+        result.append(Token(kind, text, match.start(), match.end(),
+                            amount, flag))
+        if len(result) % CHECK_EVERY == 0:
+            budget.check("tokenize", match.start())
+    return result
@@ -0,0 +1,197 @@
+"""opt-in timers and counters for the parsing path
+
+   nothing is recorded until enable() is called; until then timer() hands
+   back a shared do-nothing context manager and timed() functions make one
+   extra check per call.
+
+       metrics.enable()
+       with metrics.timer("detect"):
+           ...
+       metrics.count("items", 12, vendor="SAFEWAY")
+       metrics.write("classify.prom")  # or classify.json
+
+   timers keep a call count, total and latency histogram for each name and
+   set of labels. results can be written in the prometheus text format (for
+   the node exporter textfile collector) or as a json report. work done in
+   worker processes is gathered with measured() and merge().
+"""
+from bisect import bisect_left
+from functools import wraps
+import json
+import time
+
+
+PREFIX = "receipts_"
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+enabled = False
+_timers = {}  # (name, labels): [bucket counts..., +Inf count, sum]
+_counters = {}  # (name, labels): total
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    _timers.clear()
+    _counters.clear()
+
+
+def observe(name, seconds, **labels):
+    """record one call of name taking seconds"""
+    key = (name, tuple(sorted(labels.items())))
+    if (histogram := _timers.get(key)) is None:
+        histogram = _timers[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+    histogram[bisect_left(BUCKETS, seconds)] += 1
+    histogram[-1] += seconds
+
+
+def count(name, value=1, **labels):
+    """add value to the counter name"""
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+class Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(name, **labels):
+    """return a context manager timing its body as a call of name"""
+    if not enabled:
+        return NULL_TIMER
+    return Timer(name, labels)
+
+
+def timed(name):
+    """decorator timing each call of a function as a call of name"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """return the recorded metrics in a form which can be pickled"""
+    return (dict((key, list(value)) for key, value in _timers.items()),
+            dict(_counters))
+
+
+def merge(recorded):
+    """add metrics recorded elsewhere (see snapshot) to these"""
+    timers, counters = recorded
+    for key, histogram in timers.items():
+        if (mine := _timers.get(key)) is None:
+            _timers[key] = list(histogram)
+        else:
+            for index, value in enumerate(histogram):
+                mine[index] += value
+    for key, value in counters.items():
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def measured(work, x):
+    """run work(x) in a worker process, returning (result, snapshot())"""
+    reset()
+    enable()
+    return work(x), snapshot()
+
+
+def format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def prometheus():
+    """return the metrics in the prometheus text exposition format"""
+    lines = []
+    for name in sorted({name for name, _ in _timers}):
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (other, labels), histogram in sorted(_timers.items()):
+            if other != name:
+                continue
+            cumulative = 0
+            for bound, value in zip(BUCKETS + ("+Inf",), histogram):
+                cumulative += value
+                le = format_labels(labels, (("le", bound),))
+                lines.append(f"{metric}_bucket{le} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)}"
+                         f" {histogram[-1]:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)}"
+                         f" {cumulative}")
+    for name in sorted({name for name, _ in _counters}):
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (other, labels), value in sorted(_counters.items()):
+            if other == name:
+                lines.append(f"{metric}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def report():
+    """return the metrics as a dict for a json report"""
+    timers = []
+    for (name, labels), histogram in sorted(_timers.items()):
+        calls = sum(histogram[:-1])
+        timers.append(dict(
+            name=name, labels=dict(labels), count=calls,
+            seconds=histogram[-1],
+            mean=histogram[-1] / calls if calls else 0.0,
+            buckets=dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"],
+                             histogram[:-1]))))
+    counters = [dict(name=name, labels=dict(labels), value=value)
+                for (name, labels), value in sorted(_counters.items())]
+    return dict(timers=timers, counters=counters)
+
+
+def write(path):
+    """write the metrics to path, as json if it ends in .json"""
+    with open(path, "w") as output:
+        if path.endswith(".json"):
+            json.dump(report(), output, indent=2)
+            output.write("\n")
+        else:
+            output.write(prometheus())
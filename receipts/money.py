@@ -0,0 +1,45 @@
+"""fixed point money
+
+   amounts are held as integer cents while parsing, summing and serializing.
+   receipt amounts always have two decimal places, so a "dollars.cents"
+   string converts by dropping the point. Decimal is only used at the edges
+   (see decimal) and for unusual input.
+"""
+from decimal import Decimal, InvalidOperation
+import re
+
+
+CENTS = re.compile(r"-?\d+\.\d\d$")
+
+
+def cents(value):
+    """convert a money value to integer cents
+
+       value can be a "dollars.cents" str, an int, float or Decimal, or None
+       (zero). a float is taken as the decimal it prints as, so 1.1 is 110
+       cents. a value that is not a whole number of cents is invalid.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str) and CENTS.match(value):
+        return int(value.replace(".", ""))
+    if isinstance(value, float):
+        value = str(value)
+    try:
+        scaled = Decimal(value).scaleb(2)
+    except InvalidOperation as exc:
+        raise ValueError(f"invalid number {value}") from exc
+    if not scaled.is_finite() or scaled != scaled.to_integral_value():
+        raise ValueError(f"invalid number {value}")
+    return int(scaled)
+
+
+def dollars(value):
+    """format integer cents as a dollars.cents string"""
+    sign, value = ("-", -value) if value < 0 else ("", value)
+    return f"{sign}{value // 100}.{value % 100:02d}"
+
+
+def decimal(value):
+    """convert integer cents to a two place Decimal"""
+    return Decimal(value).scaleb(-2)
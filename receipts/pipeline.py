@@ -0,0 +1,266 @@
+"""image -> ocr -> classify -> summary as one streaming command
+
+   python -m receipts.pipeline [--items] receipt.jpg receipt.txt ...
+
+   each stage runs in its own thread and hands results to the next through
+   a bounded queue, so parsing starts on the first receipt while the rest
+   are still being read or OCR'd, and a slow stage holds back the ones
+   before it. images are sent to google vision; .txt files skip OCR.
+   results are written as json lines and per-stage counts are reported on
+   stderr at the end. if the OCR stage itself fails, each image it had not
+   answered is written as a failure and the command exits with status 1.
+"""
+from collections import Counter
+import json
+import os.path
+import queue
+import sys
+import threading
+import time
+
+import click
+
+from receipts.cache import ItemCache
+from receipts.classify import classify
+from receipts import summary
+from receipts import vision
+
+
+DONE = object()  # end of stream marker
+
+QUEUE_SIZE = 32
+TEXT_SUFFIXES = (".txt",)
+
+
+class Stage:
+    """one pipeline stage running work(item) for each item in its inbox
+
+       work returns an iterable of results for the outbox. an item for which
+       work raises is passed on as a failure, and the stage carries on. a
+       stage stops once it has seen DONE from each of its producers.
+    """
+
+    def __init__(self, name, work, inbox, outbox, producers=1):
+        self.name = name
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.producers = producers
+        self.count = 0
+        self.error = None  # why the stage itself failed, if it did
+        self.busy = 0.0
+        self.started = self.finished = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def items(self):
+        producers = self.producers
+        while producers:
+            if (item := self.inbox.get()) is DONE:
+                producers -= 1
+            else:
+                yield item
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            for item in self.items():
+                start = time.perf_counter()
+                try:
+                    for result in self.work(item):
+                        self.busy += time.perf_counter() - start
+                        self.outbox.put(result)
+                        start = time.perf_counter()
+                except Exception as exc:
+                    self.outbox.put(failure(path_of(item), self.name,
+                                            str(exc)))
+                self.busy += time.perf_counter() - start
+                self.count += 1
+        finally:
+            self.finished = time.perf_counter()
+            self.outbox.put(DONE)
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rate = self.count / elapsed if elapsed else 0.0
+        return (f"{self.name:<8} {self.count:>7} items {self.busy:>8.3f}s busy"
+                f" {rate:>9.1f}/s")
+
+
+class OcrStage(Stage):
+    """stage which sends its images to vision.annotate_batch"""
+
+    def __init__(self, inbox, outbox, annotator=None, cache=None,
+                 layout=False, **kwargs):
+        super().__init__("ocr", None, inbox, outbox)
+        self.annotator = annotator
+        self.cache = cache
+        self.layout = layout
+        self.kwargs = kwargs
+
+    def run(self):
+        self.started = time.perf_counter()
+        received = []
+        answered = Counter()
+
+        def inputs():
+            for path in self.items():
+                received.append(path)
+                yield path
+
+        inbox = inputs()
+        try:
+            try:
+                self.annotate(inbox, answered)
+            except Exception as exc:
+                self.error = str(exc)
+                for _ in inbox:  # the images not yet taken
+                    pass
+                for path in received:
+                    if answered[path]:
+                        answered[path] -= 1
+                    else:
+                        self.count += 1
+                        self.outbox.put(failure(path, self.name, self.error))
+        finally:
+            self.finished = time.perf_counter()
+            self.busy = self.finished - self.started
+            self.outbox.put(DONE)
+
+    def annotate(self, paths, answered):
+        """pass on a result for each of paths, counting those answered"""
+        for path, response in vision.annotate_batch(
+                paths, self.annotator, self.cache, **self.kwargs):
+            answered[path] += 1
+            self.count += 1
+            if original := response.get("duplicate"):
+                self.outbox.put({"source": os.path.basename(path),
+                                 "stage": self.name,
+                                 "duplicate": original})
+            elif error := response.get("error"):
+                self.outbox.put(failure(path, self.name, error["message"]))
+            else:
+                self.outbox.put((path, vision.text(response, self.layout)))
+
+
+def failure(path, stage, message):
+    return {"source": os.path.basename(path), "stage": stage,
+            "error": message}
+
+
+def path_of(item):
+    """the path an item passed between stages was read from"""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, tuple):  # (path, text)
+        return item[0]
+    return next((i.value for i in item if i.kind == i.SOURCE), "")
+
+
+def read(path):
+    with open(path) as data:
+        yield path, data.read()
+
+
+def parser(cache=None):
+    def parse(received):
+        if isinstance(received, dict):  # failed in an earlier stage
+            yield received
+            return
+        path, data = received
+        yield classify(data, source=os.path.basename(path), cache=cache)
+    return parse
+
+
+def summarizer(items_only=False):
+    def summarize(items):
+        if isinstance(items, dict):
+            yield items
+        elif items_only:
+            yield [item.as_dict() for item in items]
+        else:
+            yield summary.summary(items)
+    return summarize
+
+
+def run(paths, output=sys.stdout, annotator=None, ocr_cache=None,
+        item_cache=None, items=False, queue_size=QUEUE_SIZE, **ocr_options):
+    """run paths through the pipeline, writing json lines to output
+
+       returns the list of Stages, for reporting
+    """
+    images, texts, parsed, summaries = (
+        queue.Queue(queue_size) for _ in range(4))
+
+    stages = [
+        Stage("read", read, queue.Queue(), texts),
+        OcrStage(images, texts, annotator, ocr_cache, **ocr_options),
+        Stage("parse", parser(item_cache), texts, parsed, producers=2),
+        Stage("summary", summarizer(items), parsed, summaries),
+    ]
+    for stage in stages:
+        stage.thread.start()
+
+    def feed():
+        for path in paths:
+            if path.lower().endswith(TEXT_SUFFIXES):
+                stages[0].inbox.put(path)
+            else:
+                images.put(path)
+        stages[0].inbox.put(DONE)
+        images.put(DONE)
+    threading.Thread(target=feed, daemon=True).start()
+
+    while (result := summaries.get()) is not DONE:
+        print(json.dumps(result, cls=summary.ItemDecoder), file=output,
+              flush=True)
+
+    for stage in stages:
+        stage.thread.join()
+    return stages
+
+
+@click.command()
+@click.argument("source", nargs=-1)
+@click.option("--items", is_flag=True, default=False,
+              help="write each receipt's items instead of its summary")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="ignore cached ocr responses and parsed items")
+@click.option("--endpoint",
+              help="use the vision REST api (or a stand-in) at this url")
+@click.option("--batch-size", type=int, default=16,
+              help="images per annotate request")
+@click.option("--jobs", "-n", type=int, default=4,
+              help="annotate requests in flight at once")
+@click.option("--queue-size", type=int, default=QUEUE_SIZE,
+              help="maximum items waiting between stages")
+@click.option("--layout", is_flag=True, default=False,
+              help="rebuild receipt rows from the ocr word boxes")
+@click.option("--preprocess", "prepare", is_flag=True, default=False,
+              help="rotate, crop, grayscale and shrink images before upload")
+@click.option("--dedup", is_flag=True, default=False,
+              help="skip retakes of images already seen")
+def cli(source, items, no_cache, endpoint, batch_size, jobs, queue_size,
+        layout, prepare, dedup):
+    stages = run(
+        source,
+        annotator=vision.HttpAnnotator(endpoint) if endpoint else None,
+        ocr_cache=None if no_cache else vision.ResponseCache(),
+        item_cache=None if no_cache else ItemCache(),
+        items=items,
+        queue_size=queue_size,
+        batch_size=batch_size,
+        jobs=jobs,
+        layout=layout,
+        prepare=prepare,
+        dedup=vision.dedup_index(dedup),
+    )
+    for stage in stages:
+        print(stage.report(), file=sys.stderr)
+        if stage.error:
+            print(f"{stage.name} failed: {stage.error}", file=sys.stderr)
+    if any(stage.error for stage in stages):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,72 @@
+"""shrink receipt photos before they are sent for ocr
+
+   phone photos are 4-12MB, most of it background and colour that document
+   text detection does not use. prepare(content) returns a much smaller
+   image holding the same text:
+
+   - the EXIF orientation is applied, so the text is upright
+   - the image is converted to grayscale
+   - it is cropped to the receipt, found as the bright region of the photo
+   - it is scaled down so its longest side is at most MAX_SIDE
+   - it is saved as a JPEG
+
+   an image which would not get smaller is sent as it is. Pillow is needed
+   (pip install Pillow) and is only imported once an image is prepared.
+"""
+import io
+
+
+VERSION = "1"  # part of the ocr cache key, change when the output changes
+MAX_SIDE = 2048  # receipts are long and narrow, keep their small print legible
+QUALITY = 85
+CROP_SAMPLE = 256  # side of the thumbnail the receipt is located in
+CROP_MARGIN = 0.02  # of each side, kept around the receipt
+MIN_CROP = 0.1  # smaller bright regions are not taken to be the receipt
+
+
+def key(max_side=MAX_SIDE):
+    """return the cache key part for images prepared with these settings"""
+    return f"preprocess:{VERSION}:{max_side}"
+
+
+def receipt_box(image):
+    """return the (left, top, right, bottom) box of the receipt, or None
+
+       the receipt is taken to be the bounding box of the pixels brighter
+       than the image's mean in a small thumbnail
+    """
+    from PIL import ImageStat
+
+    sample = image.copy()
+    sample.thumbnail((CROP_SAMPLE, CROP_SAMPLE))
+    threshold = ImageStat.Stat(sample).mean[0]
+    if (box := sample.point(lambda v: 255 if v > threshold else 0)
+            .getbbox()) is None:
+        return None
+
+    sx, sy = image.width / sample.width, image.height / sample.height
+    left, top, right, bottom = box
+    if (right - left) * (bottom - top) < \
+            MIN_CROP * sample.width * sample.height:
+        return None
+    mx, my = CROP_MARGIN * image.width, CROP_MARGIN * image.height
+    return (max(int(left * sx - mx), 0), max(int(top * sy - my), 0),
+            min(int(right * sx + mx), image.width),
+            min(int(bottom * sy + my), image.height))
+
+
+def prepare(content, max_side=MAX_SIDE, crop=True):
+    """return the image bytes in content prepared for ocr"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original).convert("L")
+    if crop and (box := receipt_box(image)) is not None:
+        image = image.crop(box)
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=QUALITY, optimize=True)
+    if output.tell() >= len(content):
+        return content
+    return output.getvalue()
@@ -1,111 +1,121 @@
+from copy import copy
+import os.path
 import re
+import sys
+import time
 
 import click
 
+from receipts import budget
+from receipts.errors import ReceiptError
 from receipts.item import Item
+from receipts import metrics
+from receipts.vendor import MARKERS
 
 
 NAME = "SAFEWAY"
+SIGNATURE = "SAFEWAY"
+BODY, FOOTER = MARKERS[NAME]
+
+HEADER = re.compile(BODY + r".*?\n", flags=re.DOTALL)
+TAX_LINE = re.compile(FOOTER)  # alone or with its amount
+DOLLARS = re.compile(r"\d+\.\d\d$")
+# an amount ending a row, in text rebuilt from word boxes (receipts.layout)
+ROW_DOLLARS = re.compile(r"(?:^| )(\d+\.\d\d)$")
+DATE = re.compile(r"(\d\d)/(\d\d)/(\d\d) ")
+
+# line patterns used by categorize
+FULL = re.compile(r"(.*?) (\d+\.\d\d) (B|T|Q|X)")
+PRICE = re.compile(r"((?:Regular Price)|(?:Member Savings)) (\d+\.\d\d)-?")
+DESC_COST = re.compile(r"(.*?) (\d+\.\d\d)")
+COST_KIND = re.compile(r"(\d+\.\d\d) (B|T)")
+COST = re.compile(r"(\d+\.\d\d)(-?)")
 
 
 def is_receipt(data: str) -> bool:
-    if re.search("SAFEWAY", data):
+    if re.search(SIGNATURE, data):
         return True
     return False
 
 
 def classify(data: str) -> list[Item]:
     """parse Items from safeway receipt data"""
-
-    # remove header
-    _, data = header(data)
-
-    # isolate body
-    body, remainder = footer(data)
-
-    # remove section labels
-    trimmed_body = remove_labels(body)
-    # separate data into full/partial items and orphaned costs
-    items, costs = categorize(trimmed_body)
-    # collate orphan costs with incomplete lines
-    collated = collate(items, costs)
-    # remove discount lines
-    result = remove_discount(collated)
-    result.append(Item(Item.VENDOR, value=NAME))
-
-    # extract tax, total and date from footer
-    result.append(Item(Item.TAX, value=tax(remainder)))
-    result.append(Item(Item.TOTAL, value=total(remainder)))
-    result.append(Item(Item.DATE, value=date(remainder)))
-
-    return result
+    pipeline = Pipeline(data)
+    try:
+        return pipeline["result"]
+    except ReceiptError:
+        raise
+    except Exception as exc:
+        raise ReceiptError(str(exc), NAME, pipeline.stage) from exc
 
 
 def header(data: str) -> tuple[str, str]:
     """chop the header information off the receipt"""
-    return re.split(r"GROCERY.*?\n", data, flags=re.DOTALL)
+    return HEADER.split(data)
 
 
 def footer(data: str) -> tuple[str, str]:
     """chop the footer information off the receipt"""
-    return data.split("\nTAX\n")
+    return TAX_LINE.split(data)
+
 
+def rows(data: str) -> bool:
+    """whether the TAX line holds its amount, as in text rebuilt row by row
+       from word boxes rather than vision's separate blocks of text"""
+    return (found := TAX_LINE.search(data)) is not None and \
+        found.group().endswith(" ")
 
-def dollars(data: str) -> list[str]:
-    """extract all dollar.cents lines from data"""
+
+def dollars(data: str, rows: bool = False) -> list[str]:
+    """extract all dollar.cents lines from data, or with rows, the
+       dollar.cents value ending each line"""
     result = []
     for line in data.split("\n"):
-        if re.match(r"\d+\.\d\d$", line):
+        if rows:
+            if (m := ROW_DOLLARS.search(line)):
+                result.append(m.group(1))
+        elif DOLLARS.match(line):
             result.append(line)
     return result
 
 
-def tax(data: str) -> str:
+def tax(data: str, rows: bool = False) -> str:
     """extract tax (first dollar value) from footer"""
-    return dollars(data)[0]
+    return dollars(data, rows)[0]
 
 
-def total(data: str) -> str:
+def total(data: str, rows: bool = False) -> str:
     """extract total (second dollar value) from footer"""
-    return dollars(data)[1]
+    return dollars(data, rows)[1]
 
 
 def date(data: str) -> str:
     """extract transaction date from footer"""
-    if (s := re.search(r"(\d\d)/(\d\d)/(\d\d) ", data)):
+    if (s := DATE.search(data)):
         month, day, year = s.groups()
         return f"20{year}-{month}-{day}"
 
 
+LABELS = frozenset((
+    "QTY",
+    "1 QTY",
+    "Age Restricted: 21",
+    "DELI",
+    "FLORAL",
+    "GEN MERCHANDISE",
+    "GROC NONEDIBLE",
+    "LIQUOR",
+    "PRODUCE",
+    "REFRIG/FROZEN",
+    "MISCELLANEOUS",
+    "MR",  # sometimes this "breaks off" from the "DSPSBL BAG" line
+))
+
+
 def remove_labels(data: str) -> list[str]:
     """remove unused lines"""
-    remove = [
-        "QTY",
-        "1 QTY",
-        "Age Restricted: 21",
-        "DELI",
-        "FLORAL",
-        "GEN MERCHANDISE",
-        "GROC NONEDIBLE",
-        "LIQUOR",
-        "PRODUCE",
-        "REFRIG/FROZEN",
-        "MISCELLANEOUS",
-        "MR",  # sometimes this "breaks off" from the "DSPSBL BAG" line
-    ]
-
-    def keep(data):
-        for check in remove:
-            if data == check:
-                return False
-        return True
-
-    result = []
-    for line in data.split("\n"):
-        if len(line.strip()):
-            if keep(line):
-                result.append(line)
-    return result
+    return [line for line in data.split("\n")
+            if line.strip() and line not in LABELS]
 
 
 class Description(Item):
@@ -135,33 +145,32 @@ def categorize(data: list[str]) -> tuple[list[Item], list[Cost]]:
     items = []
     costs = []
     for line in data:
+        budget.check("categorize")
 
         # full match
-        if (m := re.match(r"(.*?) (\d+\.\d\d) (B|T|Q|X)", line)):
+        if (m := FULL.match(line)):
             desc, cost, kind = m.groups()
             kind = Item.FOOD if kind == "B" else Item.NON_FOOD
             items.append(Item(kind, desc, cost))
 
         # "Regular Price" or "Member Savings" and cost
-        elif (m := re.match(
-                r"((?:Regular Price)|(?:Member Savings)) (\d+\.\d\d)-?",
-                line)):
+        elif (m := PRICE.match(line)):
             desc, cost = m.groups()
             items.append(Item(Item.NON_FOOD, desc, cost))
 
         # desc and cost
-        elif (m := re.match(r"(.*?) (\d+\.\d\d)", line)):
+        elif (m := DESC_COST.match(line)):
             desc, cost = m.groups()
             items.append(Item(Item.NON_FOOD, desc, cost))
 
         # cost and kind
-        elif (m := re.match(r"(\d+\.\d\d) (B|T)", line)):
+        elif (m := COST_KIND.match(line)):
             cost, kind = m.groups()
             kind = Item.FOOD if kind == "B" else Item.NON_FOOD
             costs.append(Cost(kind, cost))
 
         # cost
-        elif (m := re.match(r"(\d+\.\d\d)(-?)", line)):
+        elif (m := COST.match(line)):
             cost, sign = m.groups()
             costs.append(Cost(Item.NON_FOOD, sign + cost))
 
@@ -175,13 +184,14 @@ def categorize(data: list[str]) -> tuple[list[Item], list[Cost]]:
 def collate(items, costs):
     """re-unite orphaned descriptions and costs"""
 
+    costs = iter(costs)
     for item in items:
         if item.kind == Description.DESCRIPTION:
-            if not len(costs):
-                raise Exception(f"no matching cost for {item.desc}")
-            cost, costs = costs[0], costs[1:]
+            if (cost := next(costs, None)) is None:
+                raise ReceiptError(f"no matching cost for {item.desc}",
+                                   NAME, "collate")
             item.kind = cost.kind
-            item.value = cost.cost
+            item.cents = cost.cents
 
     return items
 
@@ -191,79 +201,192 @@ def remove_discount(items):
             if item.desc not in ("Regular Price", "Member Savings")]
 
 
+class Pipeline:
+    """the stages of classify, each run once on first use
+
+       pipeline[stage] returns the output of a stage, running it (and any
+       earlier stages) if needed, so the debug commands and classify can
+       inspect any intermediate without parsing the receipt again. the
+       seconds spent in each stage are kept in timings, and the stage last
+       started in stage.
+    """
+
+    STAGES = ("header", "footer", "labels", "categorize", "collate",
+              "result")
+
+    def __init__(self, data: str):
+        self.data = data
+        self.outputs = {}
+        self.timings = {}
+        self.stage = None
+
+    def __getitem__(self, stage):
+        if stage not in self.outputs:
+            run = getattr(self, f"_{stage}")
+            for earlier in self.STAGES[:self.STAGES.index(stage)]:
+                self[earlier]
+            self.stage = stage
+            budget.check(stage)
+            start = time.perf_counter()
+            self.outputs[stage] = run()
+            self.timings[stage] = time.perf_counter() - start
+            if metrics.enabled:
+                metrics.observe("safeway_stage", self.timings[stage],
+                                stage=stage)
+        return self.outputs[stage]
+
+    def _header(self):
+        # remove header
+        if len(parts := header(self.data)) < 2:
+            raise ReceiptError("no GROCERY header", NAME, "header", 0)
+        return parts
+
+    def _footer(self):
+        # isolate body
+        _, data = self["header"]
+        if len(parts := footer(data)) < 2:
+            raise ReceiptError("no TAX line", NAME, "footer")
+        return parts
+
+    def _labels(self):
+        # remove section labels
+        body, _ = self["footer"]
+        return remove_labels(body)
+
+    def _categorize(self):
+        # separate data into full/partial items and orphaned costs
+        return categorize(self["labels"])
+
+    def _collate(self):
+        # collate orphan costs with incomplete lines, leaving the
+        # categorized descriptions as they were
+        items, costs = self["categorize"]
+        return collate([
+            copy(item) if item.kind == Description.DESCRIPTION else item
+            for item in items], costs)
+
+    def _result(self):
+        # remove discount lines
+        result = remove_discount(self["collate"])
+        result.append(Item(Item.VENDOR, value=NAME))
+
+        # extract tax, total and date from footer
+        _, remainder = self["footer"]
+        by_row = rows(self["header"][1])
+        result.append(Item(Item.TAX, value=tax(remainder, by_row)))
+        result.append(Item(Item.TOTAL, value=total(remainder, by_row)))
+        result.append(Item(Item.DATE, value=date(remainder)))
+
+        return result
+
+
+def expand(paths):
+    """yield paths, replacing each directory with the files in it"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.isfile(entry := os.path.join(path, name)):
+                    yield entry
+        else:
+            yield path
+
+
 @click.group()
-def cli():
-    pass
+@click.option("--timings", is_flag=True, default=False,
+              help="report the time spent in each stage on stderr")
+@click.pass_context
+def cli(ctx, timings):
+    ctx.obj = totals = dict.fromkeys(Pipeline.STAGES, 0.0)
+    if timings:
+        ctx.call_on_close(lambda: report(totals))
+
+
+def report(totals):
+    for stage, seconds in totals.items():
+        print(f"{stage:<12} {seconds:>9.4f}s", file=sys.stderr)
+
+
+def run(paths, show):
+    """call show(pipeline) for each receipt file in paths
+
+       each file is named before its output when there is more than one,
+       and a receipt which fails to parse is reported and skipped
+    """
+    totals = click.get_current_context().obj
+    paths = list(expand(paths))
+    for path in paths:
+        if len(paths) > 1:
+            print(f"==> {path} <==")
+        with open(path) as input:
+            pipeline = Pipeline(input.read())
+        try:
+            show(pipeline)
+        except Exception as e:
+            print(f"{path}: {e!r}", file=sys.stderr)
+        for stage, seconds in pipeline.timings.items():
+            totals[stage] += seconds
+
+
+PATHS = click.argument("paths", nargs=-1, required=True,
+                       type=click.Path(exists=True))
 
 
 @cli.command()
-@click.argument("input", type=click.File("r"))
-def parse(input):
-    """display parsed data from receipt"""
-    data = input.read()
-    items = classify(data)
-    for i in items:
-        print(i.kind, i.desc, i.value)
+@PATHS
+def parse(paths):
+    """display parsed data from receipts"""
+    def show(pipeline):
+        for i in pipeline["result"]:
+            print(i.kind, i.desc, i.value)
+    run(paths, show)
 
 
 @cli.command("categorize")
-@click.argument("input", type=click.File("r"))
-def _categorize(input):
-    """display categorized items from receipt"""
-    data = input.read()
-    _, data = header(data)
-    body, _ = footer(data)
-    items, _ = categorize(remove_labels(body))
-    for item in items:
-        print(item)
+@PATHS
+def _categorize(paths):
+    """display categorized items from receipts"""
+    def show(pipeline):
+        items, _ = pipeline["categorize"]
+        for item in items:
+            print(item)
+    run(paths, show)
 
 
 @cli.command()
-@click.argument("input", type=click.File("r"))
-def costs(input):
-    """display cost from receipt"""
-    data = input.read()
-    _, data = header(data)
-    body, _ = footer(data)
-    _, costs = categorize(remove_labels(body))
-    for item in costs:
-        print(item)
+@PATHS
+def costs(paths):
+    """display costs from receipts"""
+    def show(pipeline):
+        _, costs = pipeline["categorize"]
+        for item in costs:
+            print(item)
+    run(paths, show)
 
 
 @cli.command("collate")
-@click.argument("input", type=click.File("r"))
-def _collate(input):
-    """display collated items from receipt"""
-    data = input.read()
-    _, data = header(data)
-    body, _ = footer(data)
-    trimmed_body = remove_labels(body)
-    items, costs = categorize(trimmed_body)
-    collated = collate(items, costs)
-
-    for item in collated:
-        print(item)
+@PATHS
+def _collate(paths):
+    """display collated items from receipts"""
+    def show(pipeline):
+        for item in pipeline["collate"]:
+            print(item)
+    run(paths, show)
 
 
 @cli.command()
-@click.argument("input", type=click.File("r"))
-def sidebyside(input):
+@PATHS
+def sidebyside(paths):
     """display collated items side by side"""
-    data = input.read()
-    _, data = header(data)
-    body, _ = footer(data)
-    trimmed_body = remove_labels(body)
-    items, costs = categorize(trimmed_body)
-
-    for item in items:
-        if item.kind == Description.DESCRIPTION:
-            if len(costs):
-                cost, costs = costs[0], costs[1:]
+    def show(pipeline):
+        items, costs = pipeline["categorize"]
+        costs = iter(costs)
+        for item in items:
+            if item.kind == Description.DESCRIPTION:
+                cost = next(costs, None)
+                print(item.kind, item.desc, cost.cost if cost else "*")
             else:
-                cost = None
-            print(item.kind, item.desc, cost.cost if cost else "*")
-        else:
-            print(item)
+                print(item)
+    run(paths, show)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""resident classify server
+
+   python -m receipts.server [--socket PATH]
+
+   keeps the vendor parsers loaded and classifies receipts sent over a unix
+   socket by receipts.client, so a per-receipt hook doesn't pay interpreter
+   and import start up on every call. each connection is handled in its own
+   thread and may send any number of requests. the threads share one
+   ItemCache.
+
+   a request is a json header line {"command": "classify" | "summary",
+   "source": name, "json": bool, "cache": bool, "budget": seconds,
+   "length": bytes} followed by the receipt text; cache and budget may be
+   left out. the reply is one json line: {"ok": true, "output": text} with the
+   output the matching CLI would print, or {"ok": false, "error": message}.
+"""
+import io
+import json
+import os
+import socket
+import socketserver
+
+import click
+
+from receipts.budget import BUDGET
+from receipts.cache import ItemCache
+from receipts.classify import classify, json_dump
+from receipts.client import socket_path
+from receipts import summary
+
+
+def respond(request, data, cache=None):
+    """return the output for one request"""
+    output = io.StringIO()
+    if not request.get("cache", True):
+        cache = None
+    if (budget := request.get("budget")) is None:
+        budget = BUDGET
+    items = classify(data, source=request.get("source"), cache=cache,
+                     budget=budget)
+    if request.get("command") == "summary":
+        print(json.dumps(summary.summary(items), cls=summary.ItemDecoder),
+              file=output)
+    elif request.get("json"):
+        json_dump(items, output)
+    else:
+        for item in items:
+            print(item, file=output)
+    return output.getvalue()
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while header := self.rfile.readline():
+            request = json.loads(header)
+            data = self.rfile.read(request["length"]).decode()
+            try:
+                response = dict(ok=True, output=respond(
+                    request, data, self.server.cache))
+            except Exception as exc:
+                response = dict(ok=False, error=str(exc))
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path=None, cache=None):
+        self.path = path or socket_path()
+        if os.path.exists(self.path):
+            with socket.socket(socket.AF_UNIX) as probe:
+                try:
+                    probe.connect(self.path)
+                except OSError:  # left behind by a previous server
+                    os.remove(self.path)
+                else:
+                    raise Exception(f"a server is already on {self.path}")
+        super().__init__(self.path, Handler)
+        self.cache = cache
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@click.command()
+@click.option("--socket", "path", help="unix socket to listen on")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+def cli(path, no_cache):
+    server = Server(path, None if no_cache else ItemCache())
+    print(f"listening on {server.path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    cli()
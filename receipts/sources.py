@@ -0,0 +1,88 @@
+"""read receipts from files, archives and large concatenated files
+
+   members(paths) yields (name, text) for each receipt without extracting
+   anything to disk:
+
+   - zip archives yield each member as "archive.zip:member"
+   - tar archives (optionally compressed) are streamed, yielding each
+     regular file as "archive.tar.gz:member"
+   - dump files (.dump or .dump.txt) hold many receipts back to back; they
+     are split (see receipts.split), memory mapped once they are
+     MMAP_SIZE or more, yielding each receipt as "scan.dump@offset" with
+     offset counted in bytes
+   - any other file is one receipt, named by its file name, whatever its
+     size
+
+   with qualified, names start with the file's absolute path instead of its
+   file name, so receipts of the same name in different directories differ.
+   iteration is lazy, so at most one member is read at a time.
+"""
+import mmap
+import os.path
+
+
+MMAP_SIZE = 1 << 20  # a single receipt is a few KB
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz",
+                ".txz")
+DUMP_SUFFIXES = (".dump", ".dump.txt")
+
+
+def zip_members(path, name):
+    import zipfile
+
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield f"{name}:{info.filename}", \
+                    archive.read(info).decode()
+
+
+def tar_members(path, name):
+    import tarfile
+
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if info.isfile():
+                yield f"{name}:{info.name}", \
+                    archive.extractfile(info).read().decode()
+
+
+def dump_members(path, name):
+    from receipts.split import segments
+
+    with open(path, "rb") as f:
+        if os.path.getsize(path) < MMAP_SIZE:
+            for offset, segment in segments(f.read()):
+                yield f"{name}@{offset}", segment.decode()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset, segment in segments(data):
+                yield f"{name}@{offset}", segment.decode()
+
+
+def source_name(path, qualified=False):
+    """return the name of the file at path, as receipts read from it are
+       named"""
+    return os.path.abspath(path) if qualified else os.path.split(path)[1]
+
+
+def file_members(path, qualified=False):
+    """yield (name, text) for each receipt held in the file at path"""
+    name = source_name(path, qualified)
+    lower = name.lower()
+    if lower.endswith(ZIP_SUFFIXES):
+        yield from zip_members(path, name)
+    elif lower.endswith(TAR_SUFFIXES):
+        yield from tar_members(path, name)
+    elif lower.endswith(DUMP_SUFFIXES):
+        yield from dump_members(path, name)
+    else:
+        with open(path) as filedata:
+            yield name, filedata.read()
+
+
+def members(paths, qualified=False):
+    """yield (name, text) for each receipt held in paths"""
+    for path in paths:
+        yield from file_members(path, qualified)
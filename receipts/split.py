@@ -0,0 +1,125 @@
+"""split an ocr dump holding many receipts back to back and parse each one
+
+   python -m receipts.split [--jobs 4] [--json] scan.txt ...
+
+   a receipt starts on the line holding a vendor signature. the vendor's
+   body marker must follow before any other signature (so a store name
+   repeated in a receipt's footer does not start a new one), and a new
+   receipt is only looked for once the current one's footer marker has
+   been seen (a receipt with no footer at all ends at the next signature;
+   one whose footer was lost is merged with the next receipt). finding
+   each receipt has its own time budget (see receipts.budget). segments
+   are streamed to a pool of worker processes and each result is tagged
+   with a SOURCE of "name@offset", offset being the character offset of the
+   receipt in the dump.
+"""
+from functools import partial
+import os.path
+
+import click
+
+from receipts.budget import BUDGET, check, limit
+from receipts.cache import ItemCache
+from receipts.classify import classify, json_dump, parallel
+from receipts import metrics
+from receipts import vendor
+
+
+def line_start(data, position):
+    newline = "\n" if isinstance(data, str) else b"\n"
+    return data.rfind(newline, 0, position) + 1
+
+
+def segments(data, budget=BUDGET):
+    """yield (offset, text) for each receipt found in data
+
+       data may be str, or bytes-like (such as an mmap), in which case the
+       segments are bytes and offsets count bytes. signatures are scanned
+       lazily, so only the current segment is held in memory. finding one
+       receipt stops with budget.ParseTimeout after budget seconds (None or
+       0 for no limit).
+    """
+    kind = vendor.kind_of(data)
+    found = None  # offset of the current receipt
+    closed = 0  # no new receipt starts before this position
+    signatures = vendor.signatures(data)
+    following = next(signatures, None)
+    while following is not None:
+        ready = None  # the receipt ended by the one just found
+        with limit(budget):
+            while following is not None and ready is None:
+                index, match = following
+                following = next(signatures, None)
+                check("split", match.start())
+                if match.start() < closed:
+                    continue
+                body, footer = vendor.markers(index, kind)
+                if body is None or footer is None:
+                    raise Exception(
+                        f"{vendor.names()[index]} has no split markers")
+                b = body.search(data, match.start())
+                if b is None or \
+                        (following and following[1].start() < b.start()):
+                    continue  # signature without a receipt body
+                start = line_start(data, match.start())
+                if found is not None:
+                    ready = found, data[found:start]
+                found = start
+                f = footer.search(data, b.end())
+                closed = b.end() if f is None else f.end()
+        if ready is not None:
+            yield ready
+
+    if found is None:
+        raise Exception("unable to find a receipt")
+    yield found, data[found:]
+
+
+def classify_segment(segment, source=None, cache=None):
+    offset, data = segment
+    return classify(data, source=f"{source or ''}@{offset}", cache=cache)
+
+
+def classify_dump(data, source=None, jobs=1, ordered=True, cache=None):
+    """classify each receipt in data, spreading the work over jobs processes
+
+       segments are handed to the pool as they are found, so a large dump
+       is never held as a list of pending segments
+    """
+    work = partial(classify_segment, source=source, cache=cache)
+    yield from parallel(work, segments(data), jobs, ordered)
+
+
+@click.command()
+@click.argument("source", nargs=-1)
+@click.option("--json", "-j", is_flag=True, default=False)
+@click.option("--jobs", "-n", type=int, default=1,
+              help="number of worker processes")
+@click.option("--unordered", is_flag=True, default=False,
+              help="print each result as soon as it is ready")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+@click.option("--metrics", "metrics_path", type=click.Path(dir_okay=False),
+              help="write timings and counts here (.json or prometheus)")
+def cli(source, json, jobs, unordered, no_cache, metrics_path):
+
+    if metrics_path:
+        metrics.enable()
+    cache = None if no_cache else ItemCache()
+    for path in source:
+        with open(path) as filedata:
+            data = filedata.read()
+        name = os.path.split(path)[1]
+        for items in classify_dump(data, name, jobs, ordered=not unordered,
+                                   cache=cache):
+            if json:
+                json_dump(items)
+            else:
+                for item in items:
+                    print(item)
+    if metrics_path:
+        metrics.write(metrics_path)
+
+
+if __name__ == "__main__":
+    cli()
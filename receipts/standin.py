@@ -0,0 +1,108 @@
+"""local stand-in for the google vision REST api
+
+   python -m receipts.standin [--port 8080] [--latency 0.2]
+
+   answers images:annotate requests with a canned response for each image,
+   so batch OCR can be tested and benchmarked without the network. the
+   default responder echoes the image bytes back as the detected text.
+"""
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import click
+
+
+def echo(content):
+    """respond with the image content as its text"""
+    return {"textAnnotations": [
+        {"description": content.decode(errors="replace")}]}
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = server.failures > 0
+            if fail:
+                server.failures -= 1
+        if fail:
+            self.send_error(503)
+            return
+
+        length = int(self.headers["Content-Length"])
+        body = json.loads(self.rfile.read(length))
+        time.sleep(server.latency +
+                   (length / server.bandwidth if server.bandwidth else 0))
+        responses = []
+        for request in body["requests"]:
+            content = base64.b64decode(request["image"]["content"])
+            with server.lock:
+                server.images += 1
+                server.bytes += len(content)
+            responses.append(server.responder(content))
+
+        data = json.dumps({"responses": responses}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    """threaded stand-in server
+
+       latency is added to every request, plus the time to upload it at
+       bandwidth bytes per second if given; the first failures requests are
+       answered with a 503. requests, images and bytes count what was sent.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, responder=echo, latency=0.0, failures=0,
+                 bandwidth=None):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.responder = responder
+        self.latency = latency
+        self.failures = failures
+        self.bandwidth = bandwidth
+        self.lock = threading.Lock()
+        self.requests = self.images = self.bytes = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/v1/images:annotate"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@click.command()
+@click.option("--port", type=int, default=8080)
+@click.option("--latency", type=float, default=0.0,
+              help="seconds added to each request")
+@click.option("--bandwidth", type=float,
+              help="simulated upload speed in bytes per second")
+def cli(port, latency, bandwidth):
+    server = StandIn(port, latency=latency, bandwidth=bandwidth)
+    print(f"listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,264 @@
+"""indexed history of classified receipts
+
+   python -m receipts.store ingest receipt.txt ...
+   python -m receipts.store query --vendor SAFEWAY --desc COFFEE --by month
+
+   receipts are stored in sqlite, one row per receipt plus one row per
+   money item. item rows repeat their receipt's vendor and date so range
+   and group-by queries are answered from the item indexes without a join.
+   receipts are named by the absolute path of their file, and archive
+   members by the archive's path and the member's name, so files of one
+   name in different directories are kept apart. ingesting a source again
+   replaces what was stored for it. each receipt is stored whole or not at
+   all; one which fails does not undo the others. a receipt
+   whose fingerprint (see receipts.dedup) matches one stored from another
+   source is a second copy of it and is skipped. receipts without a
+   vendor, date and total are never taken for copies. two identical
+   purchases made at one store on one day look like copies too, so the
+   second is only stored with --duplicates.
+"""
+from functools import partial
+import os
+import sqlite3
+import sys
+
+import click
+
+from receipts import batch
+from receipts.cache import ItemCache
+from receipts.classify import classify_member, classify_paths
+from receipts.dedup import fingerprint
+from receipts.item import Item, normalize
+from receipts.money import dollars
+
+
+DATABASE = os.environ.get("RECEIPTS_DB", "receipts.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipt (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    vendor TEXT,
+    date TEXT,
+    total INTEGER,
+    tax INTEGER,
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS item (
+    receipt INTEGER NOT NULL REFERENCES receipt(id),
+    kind TEXT NOT NULL,
+    description TEXT,
+    normalized TEXT,
+    cents INTEGER NOT NULL,
+    vendor TEXT,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS receipt_date ON receipt(date);
+CREATE INDEX IF NOT EXISTS receipt_fingerprint ON receipt(fingerprint);
+CREATE INDEX IF NOT EXISTS item_receipt ON item(receipt);
+CREATE INDEX IF NOT EXISTS item_date ON item(date, vendor, kind, cents);
+CREATE INDEX IF NOT EXISTS item_vendor ON item(vendor, date, kind, cents);
+CREATE INDEX IF NOT EXISTS item_kind ON item(kind, date, vendor, cents);
+CREATE INDEX IF NOT EXISTS item_normalized
+    ON item(normalized, vendor, date, kind, cents);
+"""
+
+# group by names and the sql which computes them
+GROUPS = {
+    "vendor": "vendor",
+    "day": "date",
+    "month": "substr(date, 1, 7)",
+    "year": "substr(date, 1, 4)",
+    "kind": "kind",
+    "desc": "normalized",
+}
+
+KINDS = {name: kind for kind, name in Item.KIND_NAMES.items()}
+
+
+class Store:
+
+    def __init__(self, path=None, duplicates=False):
+        """with duplicates, copies of stored receipts are stored too"""
+        self.connection = sqlite3.connect(path or DATABASE)
+        columns = [row[1] for row in
+                   self.connection.execute("PRAGMA table_info(receipt)")]
+        if columns and "fingerprint" not in columns:  # made before dedup
+            self.connection.execute(
+                "ALTER TABLE receipt ADD COLUMN fingerprint TEXT")
+        columns = [row[1] for row in
+                   self.connection.execute("PRAGMA table_info(item)")]
+        if "desc" in columns:  # made before the column was renamed
+            self.connection.execute(
+                'ALTER TABLE item RENAME COLUMN "desc" TO description')
+        self.connection.executescript(SCHEMA)
+        self.keep_duplicates = duplicates
+        self.duplicates = []  # (source, source of the stored copy) skipped
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self, receipts):
+        """store each receipt's Items, replacing any with the same source
+
+           returns the number of receipts stored. copies of receipts
+           already stored are added to duplicates instead. a receipt which
+           raises is rolled back alone: the receipts stored before it are
+           kept, and the exception is raised.
+        """
+        count = 0
+        db = self.connection
+        if not db.in_transaction:
+            db.execute("BEGIN")
+        try:
+            for items in receipts:
+                db.execute("SAVEPOINT receipt")
+                try:
+                    count += self._ingest(db, items)
+                except BaseException:
+                    db.execute("ROLLBACK TO receipt")
+                    raise
+                finally:
+                    db.execute("RELEASE receipt")
+        finally:
+            db.commit()
+        db.execute("PRAGMA optimize")  # refresh planner stats
+        return count
+
+    def _ingest(self, db, items):
+        attrs = {item.kind: item.value for item in items
+                 if item.kind in Item.TEXT_KINDS}
+        if not (source := attrs.get(Item.SOURCE)):
+            raise ValueError("receipt has no source")
+        vendor, date = attrs.get(Item.VENDOR), attrs.get(Item.DATE)
+        money = [item for item in items if item.kind not in Item.TEXT_KINDS]
+
+        def total(kind):
+            return sum(item.cents for item in money if item.kind == kind)
+
+        digest = fingerprint(items)
+        if not self.keep_duplicates and digest is not None and \
+                (original := db.execute(
+                    "SELECT source FROM receipt"
+                    " WHERE fingerprint = ? AND source != ? LIMIT 1",
+                    (digest, source)).fetchone()):
+            self.duplicates.append((source, original[0]))
+            return False
+        db.execute("DELETE FROM item WHERE receipt IN"
+                   " (SELECT id FROM receipt WHERE source = ?)", (source,))
+        db.execute("DELETE FROM receipt WHERE source = ?", (source,))
+        receipt = db.execute(
+            "INSERT INTO receipt"
+            " (source, vendor, date, total, tax, fingerprint)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (source, vendor, date, total(Item.TOTAL), total(Item.TAX),
+             digest),
+        ).lastrowid
+        db.executemany(
+            "INSERT INTO item"
+            " (receipt, kind, description, normalized, cents, vendor, date)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(receipt, item.kind, item.desc, normalize(item.desc),
+              item.cents, vendor, date) for item in money])
+        return True
+
+    def query(self, by=(), vendor=None, kinds=(Item.FOOD, Item.NON_FOOD),
+              desc=None, since=None, until=None):
+        """return rows of (*group values, cents, count)
+
+           desc matches the start of the normalized description, or is a
+           glob when it contains "*". since and until are inclusive
+           YYYY-MM-DD dates.
+        """
+        where, parameters = [], []
+        if vendor:
+            where.append("vendor = ?")
+            parameters.append(vendor)
+        if kinds:
+            where.append(f"kind IN ({','.join('?' * len(kinds))})")
+            parameters.extend(kinds)
+        if desc:
+            where.append("normalized GLOB ?")
+            pattern = desc if "*" in desc else normalize(desc) + "*"
+            parameters.append(pattern)
+        if since:
+            where.append("date >= ?")
+            parameters.append(since)
+        if until:
+            where.append("date <= ?")
+            parameters.append(until)
+
+        for name in by:
+            if name not in GROUPS:
+                raise ValueError(f"group must be one of {tuple(GROUPS)}")
+        columns = [GROUPS[name] for name in by]
+        sql = "SELECT " + ", ".join(columns + ["sum(cents)", "count(*)"])
+        sql += " FROM item"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if columns:
+            sql += " GROUP BY " + ", ".join(columns)
+            sql += " ORDER BY " + ", ".join(columns)
+        return self.connection.execute(sql, parameters).fetchall()
+
+
+@click.group()
+@click.option("--db", default=DATABASE, help="sqlite database file")
+@click.option("--duplicates", is_flag=True, default=False,
+              help="store copies of receipts already stored")
+@click.pass_context
+def cli(context, db, duplicates):
+    context.obj = Store(db, duplicates)
+
+
+@cli.command()
+@click.argument("source", nargs=-1)
+@click.option("--jobs", "-n", type=int, default=1,
+              help="number of worker processes")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+@batch.options
+@click.pass_obj
+def ingest(store, source, jobs, no_cache, errors_path, max_errors,
+           retry_failed):
+    """classify receipts and add them to the store"""
+    cache = None if no_cache else ItemCache()
+    run, results = batch.start(
+        partial(classify_member, cache=cache), source, errors_path,
+        max_errors, retry_failed, jobs, qualified=True)
+    if run is None:
+        results = classify_paths(source, jobs, cache=cache, qualified=True)
+    count = store.ingest(results)
+    for duplicate, original in store.duplicates:
+        print(f"{duplicate}: duplicate of {original}, skipped",
+              file=sys.stderr)
+    print(f"{count} receipts stored")
+    if run is not None:
+        run.finish()
+        if run.failures:
+            sys.exit(1)
+
+
+@cli.command()
+@click.option("--by", default="", help=f"comma separated {','.join(GROUPS)}")
+@click.option("--vendor")
+@click.option("--kind", "kinds", multiple=True,
+              type=click.Choice(sorted(KINDS)),
+              help="item kinds to include (default: food and non_food)")
+@click.option("--desc", help="description prefix, or glob with *")
+@click.option("--since", help="first date (YYYY-MM-DD)")
+@click.option("--until", help="last date (YYYY-MM-DD)")
+@click.pass_obj
+def query(store, by, vendor, kinds, desc, since, until):
+    """total item costs, optionally grouped"""
+    by = tuple(name for name in by.split(",") if name)
+    kinds = tuple(KINDS[kind] for kind in kinds) or \
+        (Item.FOOD, Item.NON_FOOD)
+    for row in store.query(by, vendor, kinds, desc, since, until):
+        *group, cents, count = row
+        print(" ".join(str(value) for value in group), dollars(cents or 0),
+              count)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,46 +1,94 @@
 from decimal import Decimal
+from functools import partial
 import json
+import sys
 
-from receipts.classify import classify
-from receipts.item import Item
+import click
+
+from receipts.cache import ItemCache
+from receipts import batch
+from receipts.budget import BUDGET
+from receipts.classify import classify_member
+from receipts.errors import ReceiptError
+from receipts.item import Item, ItemBatch
+from receipts import metrics
+from receipts.money import decimal
+from receipts import sources
 
 
 def summary(items):
-    sum = {Item.FOOD: Decimal("0.00"), Item.NON_FOOD: Decimal("0.00")}
-    for item in items:
-        if isinstance(item.value, Decimal):
-            if item.kind not in sum:
-                sum[item.kind] = Decimal("0.00")
-            sum[item.kind] += item.value
-        else:
-            sum[item.kind] = item.value
+    if isinstance(items, ItemBatch):
+        sum = items.totals()
+        sum.update(items.attrs())
+    else:
+        sum = {Item.FOOD: 0, Item.NON_FOOD: 0}
+        for item in items:
+            if item.kind in Item.TEXT_KINDS:
+                sum[item.kind] = item.value
+            else:
+                sum[item.kind] = sum.get(item.kind, 0) + item.cents
 
     if (total := sum[Item.TOTAL]) != (
             calculated := sum.get(Item.FOOD) +
             sum.get(Item.NON_FOOD) +
             sum[Item.TAX]):
-        raise Exception(
-            f"total ({total}) does not match sum of items ({calculated})")
+        raise ReceiptError(
+            f"total ({decimal(total)}) does not match sum of items"
+            f" ({decimal(calculated)})", sum.get(Item.VENDOR), "summary")
 
-    return {Item.KIND_NAMES[key]: sum.get(key) for key in Item.VALID_KIND}
+    result = {}
+    for key in Item.VALID_KIND:
+        if (value := sum.get(key)) is not None and \
+                key not in Item.TEXT_KINDS:
+            value = decimal(value)
+        result[Item.KIND_NAMES[key]] = value
+    return result
 
 
-if __name__ == "__main__":
-    import os
-    import sys
+def summarize_member(member, cache=None, budget=BUDGET):
+    """classify a (name, data) pair and return its summary"""
+    items = classify_member(member, cache, budget)
+    with metrics.timer("summary"):
+        return summary(items)
+
 
-    for path in sys.argv[1:]:
+class ItemDecoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return json.JSONEncoder.default(self, obj)
 
-        with open(path) as source:
-            data = source.read()
 
-        name = os.path.split(path)[1]
+@click.command()
+@click.argument("source", nargs=-1)
+@click.option("--no-cache", is_flag=True, default=False,
+              help="parse every receipt, ignoring cached results")
+@click.option("--metrics", "metrics_path", type=click.Path(dir_okay=False),
+              help="write timings and counts here (.json or prometheus)")
+@click.option("--budget", type=float, default=BUDGET,
+              help="seconds allowed to parse one receipt, checked between"
+              " parsing steps (0 for no limit)")
+@batch.options
+def cli(source, no_cache, metrics_path, budget, errors_path, max_errors,
+        retry_failed):
 
-        class ItemDecoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, Decimal):
-                    return str(obj)
-                return json.JSONEncoder.default(self, obj)
+    if metrics_path:
+        metrics.enable()
+    cache = None if no_cache else ItemCache()
+    work = partial(summarize_member, cache=cache, budget=budget)
+    run, results = batch.start(work, source, errors_path, max_errors,
+                               retry_failed)
+    if run is None:
+        results = map(work, sources.members(source))
+    for result in results:
+        print(json.dumps(result, cls=ItemDecoder))
+    if run is not None:
+        run.finish()
+    if metrics_path:
+        metrics.write(metrics_path)
+    if run is not None and run.failures:
+        sys.exit(1)
 
-        items = classify(data, source=name)
-        print(json.dumps(summary(items), cls=ItemDecoder))
+
+if __name__ == "__main__":
+    cli()
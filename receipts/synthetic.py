@@ -0,0 +1,312 @@
+"""synthetic ocr text for each vendor, for tests and benchmarks
+
+   python -m receipts.synthetic [--vendor SAFEWAY] [--lines 50] [--count 3]
+
+   receipt(vendor, lines) returns text laid out the way the ocr output for
+   that vendor's receipts is: item descriptions and costs on the same or
+   separate lines, discounts, section labels, and the header and footer
+   each parser looks for. discounts is the chance an item carries a
+   discount, and misalign the chance a safeway item's cost is separated
+   from its description, ending up in a run of costs after a run of
+   descriptions. the tax and total always add up, so summary() accepts the
+   parsed items. photo(text) draws text as a phone photo of a receipt, for
+   the image preprocessing benchmark and tests. garble(text) damages text
+   the way bad ocr does, and repeats the markers the parsers search for;
+   adversarial(vendor, size) builds receipts shaped to make a parser
+   backtrack or rescan. both are for the fuzz tests and benchmark.
+"""
+import random
+
+import click
+
+from receipts.money import dollars
+
+
+VENDORS = ("HARRISTEETER", "SAFEWAY", "WHOLEFOODS")
+
+WORDS = (
+    "APPLES", "BANANAS", "BREAD", "BUTTER", "CEREAL", "CHEESE", "CHIPS",
+    "COFFEE", "CRACKERS", "EGGS", "FLOUR", "GRAPES", "HONEY", "JUICE",
+    "LETTUCE", "MILK", "ONIONS", "ORGANIC", "PASTA", "PEPPERS", "RICE",
+    "SALSA", "SOUP", "SPINACH", "SUGAR", "TEA", "TOMATOES", "YOGURT",
+)
+NON_FOOD = (
+    "BATTERIES", "DETERGENT", "FOIL", "NAPKINS", "PAPER TOWELS", "SOAP",
+    "SPONGES", "TISSUE",
+)
+SAFEWAY_LABELS = (
+    "DELI", "FLORAL", "GEN MERCHANDISE", "GROC NONEDIBLE", "LIQUOR",
+    "PRODUCE", "REFRIG/FROZEN", "MISCELLANEOUS",
+)
+RUN = 5  # longest run of misaligned safeway descriptions
+
+# text the parsers and the receipt splitter search for
+MARKERS = (
+    "Harris Teeter", "VIC CUSTOMER ", "VIC SAVINGS ", "PRICE YOU PAY ",
+    "**** ", "BALANCE ", "SAFEWAY", "GROCERY\n", "\nTAX\n", "\nTAX ",
+    "Regular Price ", "Member Savings ", "WHOLE FOODS", "WH0LE FOODS",
+    "MARKET\n", ", MO 12345", "*Sale* ", "Prime Extra ",
+    "**PRIME MEMBER DEAL ", "Tax: ", "Total: $", "$1.00 ", "1.00 ",
+    "1.00-B ", "-$0.50 ", "2 @ ", " FT", " B", "12/31/22 ", "\n", " ",
+)
+# characters ocr mistakes for each other
+CONFUSIONS = {
+    "0": "O", "O": "0", "1": "l", "l": "1", "5": "S", "S": "5", "8": "B",
+    "B": "8", ".": ",", ",": ".", "$": "S", "-": "~", " ": "", "\n": " ",
+}
+
+
+class Receipt:
+    """the items drawn for one receipt, in cents"""
+
+    def __init__(self, rng, lines, discounts):
+        self.rng = rng
+        self.items = []  # (desc, cents, food, discount cents)
+        for _ in range(max(lines // 2, 1)):
+            food = rng.random() < 0.8
+            desc = " ".join(rng.sample(WORDS, rng.randint(1, 3))) if food \
+                else rng.choice(NON_FOOD)
+            cost = rng.randint(49, 2999)
+            discount = rng.randint(1, cost // 4 + 1) \
+                if rng.random() < discounts else 0
+            self.items.append((desc, cost, food, discount))
+        self.date = (rng.randint(1, 12), rng.randint(1, 28),
+                     rng.randint(2019, 2024))
+
+    def subtotal(self):
+        return sum(cost - discount for _, cost, _, discount in self.items)
+
+    def tax(self, rate):
+        return sum(cost - discount for _, cost, food, discount in self.items
+                   if not food) * rate // 100
+
+
+def harristeeter(receipt):
+    rng = receipt.rng
+    lines = ["Harris Teeter", "Store 123 Main St", "VIC CUSTOMER 4567"]
+    for desc, cost, food, discount in receipt.items:
+        flag = "B" if food else "T"
+        if rng.random() < 0.5:
+            lines.append(f"{desc} {dollars(cost)} {flag}")
+        else:
+            lines.extend((desc, f"{dollars(cost)} {flag}"))
+        if discount:
+            lines.append(f"VIC SAVINGS {dollars(discount)}-{flag}")
+    tax = receipt.tax(7)
+    total = dollars(receipt.subtotal() + tax)
+    month, day, year = receipt.date
+    lines.extend((f"TAX {dollars(tax)}", f"**** BALANCE {total}",
+                  f"CREDIT {total}",
+                  f"{month:02d}/{day:02d}/{year % 100:02d} 13:46 STORE 123"))
+    return "\n".join(lines) + "\n"
+
+
+def safeway(receipt, misalign=0.0):
+    rng = receipt.rng
+    lines = ["SAFEWAY", "Store 1234 Dir Foo Barstein",
+             "Main:(800) 123-4567 RX: (800) 123-4568", "123 Main Street",
+             "MYTOWN, MO 12345", "GROCERY"]
+    descs, costs = [], []  # a run of misaligned items
+
+    def flush():
+        lines.extend(descs)
+        lines.extend(costs)
+        descs.clear()
+        costs.clear()
+
+    for desc, cost, food, discount in receipt.items:
+        flag = "B" if food else "T"
+        price = f"{dollars(cost - discount)} {flag}"
+        if rng.random() < 0.1:
+            flush()
+            lines.append(rng.choice(SAFEWAY_LABELS))
+        if rng.random() < misalign:
+            descs.append(desc)
+            costs.append(price)
+            if len(descs) == RUN:
+                flush()
+        else:
+            flush()
+            if rng.random() < 0.5:
+                lines.append(f"{desc} {price}")
+            else:
+                lines.extend((desc, price))
+        if discount:
+            lines.extend((f"Regular Price {dollars(cost)}",
+                          f"Member Savings {dollars(discount)}-"))
+    flush()
+    tax = receipt.tax(3)
+    total = dollars(receipt.subtotal() + tax)
+    month, day, year = receipt.date
+    lines.extend((
+        "TAX", "**** BALANCE", dollars(tax), total,
+        f"Credit Purchase {month:02d}/{day:02d}/{year % 100:02d} 13:46",
+        "CARD # ***********0123", "PAYMENT AMOUNT", total, "CHANGE", "0.00",
+        "TOTAL TAX", dollars(tax)))
+    return "\n".join(lines) + "\n"
+
+
+def wholefoods(receipt):
+    rng = receipt.rng
+    lines = ["WHOLE FOODS", "MARKET", "123 Main St", "Mytown, MO 12345"]
+    for desc, cost, food, discount in receipt.items:
+        flag = "FT" if food else "T"
+        if rng.random() < 0.5:
+            lines.append(f"{desc} ${dollars(cost)} {flag}")
+        else:
+            lines.extend((desc, f"${dollars(cost)} {flag}"))
+        if discount:
+            lines.extend((f"*Sale* {desc.title()}",
+                          f"-${dollars(discount)}"))
+    tax = receipt.tax(6)
+    month, day, year = receipt.date
+    lines.extend((f"Tax: 6.00% ${dollars(tax)}",
+                  f"Total: ${dollars(receipt.subtotal() + tax)}", "VISA",
+                  f"{month:02d}/{day:02d}/{year} 13:46"))
+    return "\n".join(lines) + "\n"
+
+
+def receipt(vendor, lines=50, discounts=0.2, misalign=0.0, seed=None):
+    """return the text of a synthetic receipt with about lines item lines"""
+    drawn = Receipt(random.Random(seed), lines, discounts)
+    if vendor == "HARRISTEETER":
+        return harristeeter(drawn)
+    if vendor == "SAFEWAY":
+        return safeway(drawn, misalign)
+    if vendor == "WHOLEFOODS":
+        return wholefoods(drawn)
+    raise ValueError(f"unknown vendor {vendor}")
+
+
+def photo(text, size=(3024, 4032), orientation=1, seed=0):
+    """return JPEG bytes of a phone photo of a receipt holding text
+
+       the receipt is a white strip on a noisy coloured background. with an
+       orientation other than 1 the pixels are stored turned and the EXIF
+       orientation tag says how to turn them back, as phones do. needs
+       Pillow.
+    """
+    import io
+
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    width, height = size
+    noise = [Image.effect_noise(size, 40).point(
+        lambda v, base=base: v * 0.5 + base) for base in (40, 60, 30)]
+    image = Image.merge("RGB", noise)
+
+    lines = text.splitlines()
+    font = ImageFont.load_default(size=max(
+        min(height // 90, int(height * 0.8 / 1.4 / max(len(lines), 1))), 8))
+    pitch = font.size * 1.4
+    left, top = width * 0.3 + rng.randint(-20, 20), height * 0.08
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((left - font.size, top - font.size, width * 0.7,
+                    min(top + pitch * len(lines) + font.size, height * 0.95)),
+                   fill=(245, 243, 236))
+    for index, line in enumerate(lines):
+        y = top + index * pitch
+        if y > height * 0.95 - pitch:
+            break
+        draw.text((left, y), line, fill=(20, 20, 20), font=font)
+
+    turn = {3: Image.Transpose.ROTATE_180, 6: Image.Transpose.ROTATE_90,
+            8: Image.Transpose.ROTATE_270}.get(orientation)
+    if turn is not None:
+        image = image.transpose(turn)
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=92, exif=exif)
+    return output.getvalue()
+
+
+def garble(text, rng, mutations=10):
+    """return text with mutations applied at random places
+
+       a mutation confuses characters, deletes a span, joins lines,
+       repeats a span or a marker many times, or cuts the text short
+    """
+    for _ in range(mutations):
+        start = rng.randrange(len(text) + 1)
+        end = min(start + rng.randint(1, 80), len(text))
+        span = text[start:end]
+        choice = rng.random()
+        if choice < 0.3:
+            span = "".join(CONFUSIONS.get(c, c) if rng.random() < 0.3 else c
+                           for c in span)
+        elif choice < 0.45:
+            span = ""
+        elif choice < 0.6:
+            span = span.replace("\n", " ")
+        elif choice < 0.75:
+            span = span * rng.randint(2, 200)
+        elif choice < 0.97:
+            span = rng.choice(MARKERS) * rng.randint(1, 500) + span
+        else:
+            text, span, end = text[:start], "", start
+        text = text[:start] + span + text[end:]
+    return text
+
+
+def fuzzed(vendor, size, seed=0):
+    """return a garbled receipt from vendor of about size characters"""
+    rng = random.Random(seed)
+    text = receipt(vendor, lines=max(size // 25, 2), seed=seed)
+    return garble(text, rng, max(size // 500, 3))
+
+
+def adversarial(vendor, size):
+    """yield (name, text) for receipts of about size characters built to
+       make the vendor's parser backtrack or rescan"""
+    def repeat(unit):
+        return unit * max(size // len(unit), 1)
+
+    if vendor == "HARRISTEETER":
+        head, tail = "Harris Teeter\nVIC CUSTOMER 1 \n", "**** BALANCE 1.00\n"
+        yield "no footer", head + repeat("FOO 1.00 B\n")
+        yield "no costs", head + repeat("FOO ") + "1.00 B\n" + tail
+        yield "quantity prices", head + repeat("2 @ 1.00 ") + tail
+        yield "no header", "Harris Teeter\n" + repeat("VIC 1.00 B\n")
+    elif vendor == "SAFEWAY":
+        head, tail = "SAFEWAY\nGROCERY\n", "\nTAX\n1.00\n2.00\n"
+        yield "one line", head + repeat("JIFFY 1.00 ") + tail
+        yield "digits", head + repeat("1") + tail
+        yield "orphan costs", head + repeat("1.00 B\n") + tail
+        yield "orphan descriptions", head + repeat("JIFFY\n") + tail
+        yield "no footer", head + repeat("JIFFY 1.00 B\n")
+    elif vendor == "WHOLEFOODS":
+        head = "WHOLE FOODS\nMARKET\n123 Main St\nMytown, MO 12345\n"
+        yield "no address", repeat("WHOLE FOODS\nMARKET\n")
+        yield "no flags", head + repeat("$1.00 ")
+        yield "open sale", head + repeat("*Sale* x ") + "$1.00 FT\n"
+        yield "sales", head + repeat("$1.00 FT\n*Sale* x\n-$0.50\n")
+    else:
+        raise ValueError(f"unknown vendor {vendor}")
+
+
+def receipts(count, vendors=VENDORS, seed=0, **options):
+    """yield count synthetic receipts, cycling through vendors"""
+    for index in range(count):
+        yield receipt(vendors[index % len(vendors)], seed=seed + index,
+                      **options)
+
+
+@click.command()
+@click.option("--vendor", "-v", type=click.Choice(VENDORS), multiple=True,
+              help="vendors to generate (default all)")
+@click.option("--lines", "-l", default=50, help="item lines per receipt")
+@click.option("--count", "-c", default=1, help="number of receipts")
+@click.option("--discounts", default=0.2, help="chance of a discount")
+@click.option("--misalign", default=0.0,
+              help="chance of a misaligned safeway cost")
+@click.option("--seed", default=0)
+def cli(vendor, lines, count, discounts, misalign, seed):
+    for text in receipts(count, vendor or VENDORS, seed, lines=lines,
+                         discounts=discounts, misalign=misalign):
+        print(text, end="")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,133 @@
+"""registry of vendor parsers
+
+   each vendor is registered with its NAME, its SIGNATURE (a regular
+   expression which identifies the vendor's receipts) and its parser
+   module, which provides classify(data). the signatures of all registered
+   vendors are combined into a single pattern, so a receipt is identified
+   with one pass over its header. a parser module given by name is only
+   imported once a receipt from that vendor is seen.
+
+   a vendor may also give the BODY and FOOTER markers its parser relies on,
+   which receipts.split uses to find where one receipt ends and the next
+   begins. the markers of the built in vendors are kept in MARKERS, so they
+   are known without importing the parsers, which build their own patterns
+   from them.
+"""
+from importlib import import_module
+import re
+
+
+HEADER_WINDOW = 2048  # signatures are expected in the first part of a receipt
+
+# name: (body, footer) regular expressions of the built in vendors. the
+# Whole Foods header bounds each gap, so garbled text with many signatures
+# and no address is rejected in linear time instead of backtracking over
+# the whole receipt
+MARKERS = {
+    "HARRISTEETER": (r"VIC CUSTOMER", r"\*\*\*\* "),
+    "SAFEWAY": (r"GROCERY", r"\nTAX(?:\n| (?=\d))"),
+    "WHOLEFOODS": (
+        r"WH.LE FOODS.{0,300}?MARKET\n.{0,300}?, [A-Z]{2} \d{5}[^\n]*\n",
+        r"Total: +?\$"),
+}
+
+_vendors = []  # [name, signature, module or module name, body, footer]
+_detectors = {}  # str or bytes: combined signature pattern
+_markers = {}  # (index, str or bytes): (body pattern, footer pattern)
+
+
+def register(module, name=None, signature=None, body=None, footer=None):
+    """add a vendor parser to the registry
+
+       module is a module, or the dotted name of one to import when it is
+       first needed (in which case name and signature are required, and
+       the markers default to those in MARKERS). vendors registered first
+       win if more than one signature matches.
+    """
+    if isinstance(module, str):
+        if name is None or signature is None:
+            raise ValueError("name and signature are required")
+        default_body, default_footer = MARKERS.get(name, (None, None))
+        body = body or default_body
+        footer = footer or default_footer
+    else:
+        name = name or module.NAME
+        signature = signature or module.SIGNATURE
+        body = body or getattr(module, "BODY", None)
+        footer = footer or getattr(module, "FOOTER", None)
+    _vendors.append([name, signature, module, body, footer])
+    _detectors.clear()
+    _markers.clear()
+
+
+def names():
+    """return the registered vendor names in priority order"""
+    return [entry[0] for entry in _vendors]
+
+
+def load(index):
+    """return the parser module for the vendor at index, importing it"""
+    entry = _vendors[index]
+    if isinstance(module := entry[2], str):
+        module = entry[2] = import_module(module)
+    return module
+
+
+def _compile(pattern, kind=str, flags=0):
+    """compile pattern for searching str, or bytes (and mmap) data"""
+    return re.compile(pattern if kind is str else pattern.encode(), flags)
+
+
+def detector(kind=str):
+    """return the combined signature pattern for all registered vendors"""
+    if (found := _detectors.get(kind)) is None:
+        found = _detectors[kind] = _compile("|".join(
+            f"(?P<v{index}>{entry[1]})"
+            for index, entry in enumerate(_vendors)), kind)
+    return found
+
+
+def markers(index, kind=str):
+    """return the compiled (body, footer) markers for the vendor at index
+
+       either is None if the vendor did not register it
+    """
+    if (found := _markers.get((index, kind))) is None:
+        _, _, _, body, footer = _vendors[index]
+        found = _markers[index, kind] = (
+            body and _compile(body, kind, re.DOTALL),
+            footer and _compile(footer, kind))
+    return found
+
+
+def kind_of(data):
+    return str if isinstance(data, str) else bytes
+
+
+def signatures(data, start=0, end=None):
+    """yield (index, match) for each vendor signature found in data
+
+       data may be str, or bytes-like (such as an mmap)
+    """
+    if not _vendors:
+        return
+    end = len(data) if end is None else end
+    for match in detector(kind_of(data)).finditer(data, start, end):
+        yield int(match.lastgroup[1:]), match
+
+
+def detect(data):
+    """return the vendor module matching the receipt header, or None"""
+    found = None
+    for index, _ in signatures(data, 0, HEADER_WINDOW):
+        if found is None or index < found:
+            found = index
+            if index == 0:
+                break
+
+    return None if found is None else load(found)
+
+
+register("receipts.harristeeter", "HARRISTEETER", "Harris Teeter")
+register("receipts.safeway", "SAFEWAY", "SAFEWAY")
+register("receipts.wholefoods", "WHOLEFOODS", "WH.LE FOODS")
@@ -1,18 +1,418 @@
-from google.cloud import vision
+import base64
+import json
+import os.path
+import sys
+import time
 
+import click
 
-def annotate(image_file_name):
-    """call google vision to extract text from image"""
+from receipts.cache import DIRECTORY, Cache, digest
+
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif",
+                  ".tiff", ".heic")
+
+
+class GoogleAnnotator:
+    """document text detection with the google cloud vision client
+
+       the client is created on first use and reused for every later call.
+       responses are returned as dicts, in the json form used by the
+       vision REST api.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud import vision
+            self._client = vision.ImageAnnotatorClient()
+        return self._client
+
+    def annotate(self, content):
+        from google.cloud import vision
+        response = self.client.document_text_detection(
+            image=vision.Image(content=content))
+        if response.error.message:
+            raise Exception(f"vision error: {response.error.message}")
+        return json.loads(vision.AnnotateImageResponse.to_json(response))
+
+    def annotate_batch(self, contents):
+        """annotate several images with one request"""
+        from google.cloud import vision
+        feature = vision.Feature(
+            type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        response = self.client.batch_annotate_images(requests=[
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=content), features=[feature])
+            for content in contents])
+        return [json.loads(vision.AnnotateImageResponse.to_json(item))
+                for item in response.responses]
+
+
+class HttpAnnotator:
+    """document text detection through the vision REST api
+
+       endpoint can point at a local stand-in server (see receipts.standin)
+    """
+
+    ENDPOINT = "https://vision.googleapis.com/v1/images:annotate"
+
+    def __init__(self, endpoint=None, key=None, timeout=60):
+        self.endpoint = endpoint or self.ENDPOINT
+        self.key = key or os.environ.get("GOOGLE_VISION_API_KEY")
+        self.timeout = timeout
+
+    def annotate(self, content):
+        response = self.annotate_batch([content])[0]
+        if error := response.get("error"):
+            raise Exception(f"vision error: {error.get('message')}")
+        return response
+
+    def annotate_batch(self, contents):
+        """annotate several images with one request"""
+        import urllib.request
+
+        body = json.dumps({"requests": [{
+            "image": {"content": base64.b64encode(content).decode()},
+            "features": [{"type": "DOCUMENT_TEXT_DETECTION"}],
+        } for content in contents]}).encode()
+        url = self.endpoint
+        if self.key:
+            url += f"?key={self.key}"
+        request = urllib.request.Request(
+            url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as reply:
+            return json.loads(reply.read())["responses"]
+
+
+class ResponseCache(Cache):
+    """cache of annotate responses keyed by a hash of the image content"""
+
+    DIRECTORY = os.path.join(DIRECTORY, "vision")
+    MAX_SIZE = 1024 * 1024 * 1024
+    NAMESPACE = "responses"
+
+    def load(self, content, *variant):
+        """return the response for content, sent as variant, or None
+
+           variant names any preprocessing, so a prepared image is cached
+           under the original image's content
+        """
+        if (entry := self.get(self.NAMESPACE,
+                              digest(content, *variant))) is None:
+            return None
+        return json.loads(entry)
+
+    def save(self, content, response, *variant):
+        self.put(self.NAMESPACE, digest(content, *variant),
+                 json.dumps(response).encode())
+
+
+_annotator = None
+
+
+def default_annotator():
+    """return the process wide GoogleAnnotator"""
+    global _annotator
+    if _annotator is None:
+        _annotator = GoogleAnnotator()
+    return _annotator
+
+
+def annotate(image_file_name, annotator=None, cache=None, prepare=False):
+    """call google vision to extract text from image
+
+       annotator is anything with an annotate(content) method returning a
+       response dict; the shared GoogleAnnotator is used by default. if a
+       cache is supplied, an image which has already been seen is not sent
+       again. with prepare, the image is shrunk before it is sent (see
+       receipts.preprocess).
+    """
     with open(image_file_name, "rb") as data:
         content = data.read()
-    image = vision.Image(content=content)
-    client = vision.ImageAnnotatorClient()
-    return client.document_text_detection(image=image)
 
+    variant = _variant(prepare)
+    if cache is not None and \
+            (response := cache.load(content, *variant)) is not None:
+        return response
 
-if __name__ == "__main__":
-    import sys
+    upload = content
+    if prepare:
+        from receipts import preprocess
+        upload = preprocess.prepare(content)
+    response = (annotator or default_annotator()).annotate(upload)
+    if cache is not None:
+        cache.save(content, response, *variant)
+    return response
+
+
+def _variant(prepare):
+    if not prepare:
+        return ()
+    from receipts import preprocess
+    return (preprocess.key(),)
+
+
+def _prepared(loaded):
+    """(path, content, response, upload) with the upload prepared, or with
+       an error response for an image which cannot be read"""
+    path, content, response, _ = loaded
+    from receipts import preprocess
+    try:
+        return path, content, response, preprocess.prepare(content)
+    except Exception as exc:
+        return path, None, {"error": {"message": str(exc)}}, None
 
-    image_file = sys.argv[1]
-    text = annotate(image_file)
-    print(text.text_annotations[0].description)
+
+def _prepare_unsent(loaded, jobs):
+    """prepare the images in loaded which are to be sent in a pool of jobs
+       processes, passing the others straight on
+
+       each image is yielded as soon as it is ready, so at most
+       IN_FLIGHT per job are held waiting to be prepared
+    """
+    if jobs <= 1:
+        for found in loaded:
+            yield found if found[2] is not None else _prepared(found)
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    from receipts.classify import IN_FLIGHT
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for found in loaded:
+            if found[2] is not None:
+                yield found
+                continue
+            pending.append(pool.submit(_prepared, found))
+            while pending and (len(pending) >= jobs * IN_FLIGHT or
+                               pending[0].done()):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def submit(annotator, contents, retries=3, backoff=1.0):
+    """annotate_batch, retrying failed requests with exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return annotator.annotate_batch(contents)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def annotate_batch(paths, annotator=None, cache=None, batch_size=16, jobs=4,
+                   retries=3, backoff=1.0, prepare=False, prepare_jobs=4,
+                   dedup=None):
+    """annotate many images, yielding (path, response) as each is ready
+
+       images are grouped into multi-image requests of batch_size and at
+       most jobs requests are in flight at once. cached images are yielded
+       without being sent. with prepare, images are shrunk before they are
+       sent by a pool of prepare_jobs processes. an image which cannot be
+       read is not sent. with a dedup.ImageIndex, retakes of images
+       already read are not sent and their response is {"duplicate": path
+       of the first image}. an image is added to the index once it has been
+       read, so a retake of an image still being read waits until the end,
+       and is only sent if that image failed. a response may hold an
+       "error" instead of text.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from itertools import chain
+
+    annotator = annotator or default_annotator()
+    variant = _variant(prepare)
+    keys = {}  # perceptual hash of each image sent, indexed once it is read
+    deferred = []  # retakes of images which were being read
+    if dedup is not None:
+        from receipts.dedup import ImageIndex, hashed
+        reading = ImageIndex()
+
+    def loaded(paths, defer):
+        for path in paths:
+            try:
+                with open(path, "rb") as data:
+                    content = data.read()
+            except OSError as exc:
+                yield path, None, {"error": {"message": str(exc)}}, None
+                continue
+            response = None if cache is None else \
+                cache.load(content, *variant)
+            if dedup is not None and (key := hashed(content)) is not None:
+                if original := dedup.duplicate(key, path):
+                    response = {"duplicate": original}
+                elif defer and reading.duplicate(key, path):
+                    deferred.append(path)
+                    continue
+                else:
+                    keys[path] = key
+                    reading.add(key, path)
+            if response is not None:  # not sent, so the image is not kept
+                content = None
+            yield path, content, response, content
+
+    def batches(paths, defer):
+        found = loaded(paths, defer)
+        if prepare:
+            found = _prepare_unsent(found, prepare_jobs)
+        batch = []
+        for path, content, response, upload in found:
+            if response is not None:
+                yield path, content, response
+                continue
+            batch.append((path, content, upload))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def annotated(paths, defer):
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            pending = {}
+            for batch in batches(paths, defer):
+                if isinstance(batch, tuple):  # cache hit, duplicate or error
+                    path, _, response = batch
+                    yield path, response
+                    continue
+
+                while len(pending) >= jobs:
+                    yield from _finished(pending, cache, variant)
+
+                future = pool.submit(submit, annotator,
+                                     [upload for _, _, upload in batch],
+                                     retries, backoff)
+                pending[future] = batch
+
+            while pending:
+                yield from _finished(pending, cache, variant)
+
+    for path, response in chain(annotated(paths, True),
+                                annotated(deferred, False)):
+        if (key := keys.pop(path, None)) is not None and \
+                "error" not in response:
+            dedup.add(key, path)
+        yield path, response
+
+
+def _finished(pending, cache, variant=()):
+    """wait for at least one pending request, yielding its results"""
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        batch = pending.pop(future)
+        try:
+            responses = future.result()
+        except Exception as exc:
+            responses = [{"error": {"message": str(exc)}}] * len(batch)
+        for (path, content, _), response in zip(batch, responses):
+            if cache is not None and "error" not in response:
+                cache.save(content, response, *variant)
+            yield path, response
+
+
+def dedup_index(enabled):
+    """the default dedup.ImageIndex when enabled, otherwise None"""
+    if not enabled:
+        return None
+    from receipts.dedup import default_index
+    return default_index()
+
+
+def text_path(image_file, output_dir=None):
+    """return the .txt path for image_file's text"""
+    path = os.path.splitext(image_file)[0] + ".txt"
+    if output_dir:
+        path = os.path.join(output_dir, os.path.basename(path))
+    return path
+
+
+def text(response, layout=False):
+    """return the full text from an annotate response
+
+       with layout, the text is rebuilt row by row from the word boxes
+       (see receipts.layout)
+    """
+    if layout:
+        from receipts import layout
+        return layout.text(response)
+    if annotations := response.get("textAnnotations"):
+        return annotations[0]["description"]
+    return ""
+
+
+@click.command()
+@click.argument("image_file", nargs=-1, required=True)
+@click.option("--no-cache", is_flag=True, default=False,
+              help="always send the image to google vision")
+@click.option("--output-dir", "-o",
+              help="write a .txt per image here (default: beside the image)")
+@click.option("--batch", is_flag=True, default=False,
+              help="write a .txt per image even for a single image")
+@click.option("--batch-size", type=int, default=16,
+              help="images per annotate request")
+@click.option("--jobs", "-n", type=int, default=4,
+              help="annotate requests in flight at once")
+@click.option("--retries", type=int, default=3)
+@click.option("--endpoint",
+              help="use the vision REST api (or a stand-in) at this url")
+@click.option("--layout", is_flag=True, default=False,
+              help="rebuild receipt rows from the word boxes")
+@click.option("--preprocess", "prepare", is_flag=True, default=False,
+              help="rotate, crop, grayscale and shrink images before upload")
+@click.option("--dedup", is_flag=True, default=False,
+              help="skip retakes of images already seen")
+def cli(image_file, no_cache, output_dir, batch, batch_size, jobs, retries,
+        endpoint, layout, prepare, dedup):
+    cache = None if no_cache else ResponseCache()
+    annotator = HttpAnnotator(endpoint) if endpoint else None
+    index = dedup_index(dedup)
+
+    if len(image_file) == 1 and not (batch or output_dir):
+        key = None
+        if index is not None:
+            from receipts.dedup import hashed
+            with open(image_file[0], "rb") as image:
+                key = hashed(image.read())
+            if key is not None and \
+                    (original := index.duplicate(key, image_file[0])):
+                print(f"{image_file[0]}: duplicate of {original},"
+                      " skipped", file=sys.stderr)
+                return
+        print(text(annotate(image_file[0], annotator, cache, prepare),
+                   layout))
+        if key is not None:
+            index.add(key, image_file[0])
+        return
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    failed = 0
+    for path, response in annotate_batch(
+            image_file, annotator, cache, batch_size, jobs, retries,
+            prepare=prepare, dedup=index):
+        if original := response.get("duplicate"):
+            print(f"{path}: duplicate of {original}, skipped",
+                  file=sys.stderr)
+            continue
+        if error := response.get("error"):
+            failed += 1
+            print(f"{path}: {error.get('message')}", file=sys.stderr)
+            continue
+        with open(text_path(path, output_dir), "w") as output:
+            output.write(text(response, layout))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,300 @@
+"""classify receipts as they are dropped into a directory
+
+   python -m receipts.watch [--db receipts.db] directory
+
+   a manifest in the directory records the mtime, size and content hash of
+   every file already handled, so a restart only looks at files which are
+   new or have changed. a file which failed (an ocr or network error, or a
+   receipt which could not be parsed) is tried again after RETRY_DELAY,
+   doubling each time up to RETRY_MAX. .txt files are classified directly
+   and images are OCR'd first. each receipt's summary is written as a json
+   line, or its items are added to the store with --db. inotify is used to
+   wait for new files where available, otherwise the directory is polled;
+   if inotify drops events the whole directory is scanned again.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import tempfile
+import time
+
+import click
+
+from receipts.cache import ItemCache, digest
+from receipts.classify import classify
+from receipts import sources
+from receipts.store import Store
+from receipts import summary
+from receipts import vision
+
+
+MANIFEST = ".receipts-manifest.json"
+TEXT_SUFFIXES = (".txt",)
+RETRY_DELAY = 60.0  # seconds before a failed file is first tried again
+RETRY_MAX = 6 * 60 * 60.0
+SAVE_EVERY = 100  # files handled between manifest saves within one scan
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT = struct.Struct("iIII")
+
+
+class Manifest:
+    """{file name: {mtime, size, sha256, error, failures, retry}} for
+       handled files
+
+       retry is the time a file which failed is due to be tried again
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(path) as data:
+                self.files = json.load(data)
+        except FileNotFoundError:
+            self.files = {}
+
+    def changed(self, path):
+        """return (stat, content hash) if path is new, changed or due to
+           be tried again, else None
+
+           the content is only hashed when the mtime or size differ
+        """
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        entry = self.files.get(name)
+        if entry and entry["mtime"] == stat.st_mtime and \
+                entry["size"] == stat.st_size:
+            return (stat, entry["sha256"]) if self.due(entry) else None
+        with open(path, "rb") as data:
+            sha256 = digest(data.read())
+        if entry and entry["sha256"] == sha256:  # touched, not changed
+            self.files[name] = dict(entry, mtime=stat.st_mtime)
+            self.dirty = True
+            return (stat, sha256) if self.due(entry) else None
+        return stat, sha256
+
+    @staticmethod
+    def due(entry):
+        return entry.get("error") is not None and \
+            entry.get("retry", 0) <= time.time()
+
+    def failed(self):
+        """return the names of the files which failed"""
+        return [name for name, entry in self.files.items()
+                if entry.get("error") is not None]
+
+    def next_retry(self):
+        """return the time the next failed file is due, or None"""
+        return min((self.files[name].get("retry", 0)
+                    for name in self.failed()), default=None)
+
+    def record(self, path, stat, sha256, error=None):
+        """record path as handled, or as failed with error"""
+        name = os.path.basename(path)
+        entry = dict(mtime=stat.st_mtime, size=stat.st_size, sha256=sha256,
+                     error=error)
+        if error is not None:
+            previous = self.files.get(name, {})
+            failures = previous.get("failures", 0) + 1 \
+                if previous.get("sha256") == sha256 else 1
+            delay = min(RETRY_DELAY * 2 ** (failures - 1), RETRY_MAX)
+            entry.update(failures=failures, retry=time.time() + delay)
+        self.files[name] = entry
+        self.dirty = True
+
+    def forget(self, path):
+        if self.files.pop(os.path.basename(path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, "w") as data:
+            json.dump(self.files, data)
+        os.replace(temp, self.path)
+        self.dirty = False
+
+
+def wanted(name):
+    name = name.lower()
+    return name.endswith(TEXT_SUFFIXES + vision.IMAGE_SUFFIXES) and \
+        not name.startswith(".")
+
+
+def scan(directory):
+    """return the paths of receipt files in directory"""
+    return sorted(entry.path for entry in os.scandir(directory)
+                  if entry.is_file() and wanted(entry.name))
+
+
+class Inotify:
+    """wait for files to be written to, or moved into, a directory"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory),
+                                  IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+        self.directory = directory
+
+    def wait(self, timeout=None):
+        """return the paths of files written since the last call, or of
+           every file if events were lost"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        paths = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT.unpack_from(data, offset)
+            if mask & IN_Q_OVERFLOW:
+                return scan(self.directory)
+            offset += EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if wanted(name):
+                paths.append(os.path.join(self.directory, name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poll:
+    """wait for changes by re-scanning the directory"""
+
+    def __init__(self, directory, interval=2.0):
+        self.directory = directory
+        self.interval = interval
+
+    def wait(self, timeout=None):
+        time.sleep(self.interval)
+        return scan(self.directory)
+
+    def close(self):
+        pass
+
+
+def watcher(directory, interval=2.0):
+    """return an Inotify watcher, or Poll where inotify is unavailable"""
+    try:
+        return Inotify(directory)
+    except (AttributeError, OSError, TypeError):
+        return Poll(directory, interval)
+
+
+class Handler:
+    """classify a receipt file and emit its summary or store its items"""
+
+    def __init__(self, output=sys.stdout, store=None, annotator=None,
+                 cache=True):
+        self.output = output
+        self.store = store
+        self.annotator = annotator
+        self.item_cache = ItemCache() if cache else None
+        self.ocr_cache = vision.ResponseCache() if cache else None
+
+    def __call__(self, path):
+        name = os.path.basename(path)
+        if name.lower().endswith(TEXT_SUFFIXES):
+            with open(path) as data:
+                data = data.read()
+        else:
+            data = vision.text(vision.annotate(
+                path, self.annotator, self.ocr_cache))
+
+        source = sources.source_name(path, qualified=self.store is not None)
+        items = classify(data, source=source, cache=self.item_cache)
+        if self.store is not None:
+            self.store.ingest([items])
+        else:
+            print(json.dumps(summary.summary(items), cls=summary.ItemDecoder),
+                  file=self.output, flush=True)
+
+
+def update(paths, manifest, handle):
+    """handle each new or changed path, recording it in the manifest
+
+       the manifest is saved every SAVE_EVERY files and at the end
+    """
+    handled = 0
+    for path in paths:
+        try:
+            if (changed := manifest.changed(path)) is None:
+                continue
+        except FileNotFoundError:  # removed before it could be read
+            manifest.forget(path)
+            continue
+        stat, sha256 = changed
+        error = None
+        try:
+            handle(path)
+        except Exception as exc:
+            error = str(exc)
+            print(f"{path}: {error}", file=sys.stderr)
+        manifest.record(path, stat, sha256, error)
+        handled += 1
+        if handled % SAVE_EVERY == 0:
+            manifest.save()
+    if manifest.dirty:
+        manifest.save()
+
+
+def watch(directory, handle, manifest=None, interval=2.0, once=False):
+    """handle existing receipts in directory, then new ones as they arrive
+
+       failed files are tried again as they fall due
+    """
+    manifest = manifest or Manifest(os.path.join(directory, MANIFEST))
+    changes = None if once else watcher(directory, interval)
+
+    def retried(paths):
+        return sorted(set(paths) | {os.path.join(directory, name)
+                                    for name in manifest.failed()})
+
+    try:
+        update(retried(scan(directory)), manifest, handle)
+        while changes:
+            due = manifest.next_retry()
+            timeout = None if due is None else max(due - time.time(), 0)
+            update(retried(changes.wait(timeout)), manifest, handle)
+    finally:
+        if changes:
+            changes.close()
+
+
+@click.command()
+@click.argument("directory")
+@click.option("--db", help="add receipts to this store instead of printing")
+@click.option("--manifest",
+              help=f"manifest file (default: DIRECTORY/{MANIFEST})")
+@click.option("--interval", type=float, default=2.0,
+              help="seconds between scans when polling")
+@click.option("--once", is_flag=True, default=False,
+              help="handle new files and exit instead of watching")
+@click.option("--endpoint",
+              help="use the vision REST api (or a stand-in) at this url")
+@click.option("--no-cache", is_flag=True, default=False,
+              help="ignore cached ocr responses and parsed items")
+def cli(directory, db, manifest, interval, once, endpoint, no_cache):
+    handle = Handler(
+        store=Store(db) if db else None,
+        annotator=vision.HttpAnnotator(endpoint) if endpoint else None,
+        cache=not no_cache)
+    watch(directory, handle, Manifest(manifest) if manifest else None,
+          interval, once)
+
+
+if __name__ == "__main__":
+    cli()
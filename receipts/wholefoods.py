@@ -1,30 +1,69 @@
 import re
 
+from receipts import budget
+from receipts.errors import ReceiptError
+from receipts import lexer
 from receipts.item import Item
+from receipts.vendor import MARKERS
 
 
 NAME = "WHOLEFOODS"
+SIGNATURE = "WH.LE FOODS"
+BODY, FOOTER = MARKERS[NAME]
+
+HEADER = re.compile(BODY, flags=re.DOTALL)  # bounded, see vendor.MARKERS
+DISCOUNTS = (
+    re.compile(r"(\*Sale\*.+?)- ?\$(\d+\.\d\d) "),
+    re.compile(r"(Prime Extra.+?)- ?\$(\d+\.\d\d) "),
+    re.compile(r"(\*\*PRIME MEMBER DEAL) - ?\$(\d+\.\d\d) "),
+)
+TAX = re.compile(r"(Tax:? \d\.\d\d%) \$(\d+\.\d\d) ")
+TOTAL = re.compile(FOOTER + r"(\d+\.\d\d) ")
+DATE = re.compile(r"(\d\d)/(\d\d)/(20\d\d) ")
 
 
 def is_receipt(data):
-    if re.search("WH.LE FOODS", data):
+    if re.search(SIGNATURE, data):
         return True
     return False
 
 
+def find_cost(body, tokens, index, position):
+    """return the index of the next "$1.23 FT" cost after position, or None
+
+       tokens[index] is the first token to consider
+    """
+    count = len(tokens) - 1
+    while index < count:
+        token, flag = tokens[index], tokens[index + 1]
+        if token.kind == lexer.DOLLAR and token.start > position and \
+                flag.text in ("T", "FT") and flag.start == token.end + 1 \
+                and flag.end < len(body):
+            return index
+        index += 1
+    return None
+
+
 def classify(data):
     """parse Items from wholefoods receipt data"""
 
     # remove header
-    _, data = re.split(r"WH.LE FOODS.*?MARKET\n.+?, [A-Z]{2} \d{5}.*?\n",
-                       data, flags=re.DOTALL)
+    if (m := HEADER.search(data)) is None:
+        raise ReceiptError("no address header", NAME, "header", 0)
+    start, data = m.end(), data[m.end():]
 
     # remove newlines
     body = data.replace("\n", " ")
 
+    tokens = lexer.tokenize(body)
+    index = position = 0
+
     yield Item(Item.VENDOR, value=NAME)
-    while (m := re.match(r"(^.*?) \$(\d+\.\d\d) (F?T) (.*)", body)):
-        desc, cost, kind, body = m.groups()
+    while (found := find_cost(body, tokens, index, position)) is not None:
+        budget.check("items", start + position)
+        cost, flag = tokens[found], tokens[found + 1]
+        desc = body[position:cost.start - 1]
+        kind = flag.text
 
         if desc.find("HOT BAR") >= 0:  # treat HOT BAR like food
             kind = Item.FOOD
@@ -33,31 +72,30 @@ def classify(data):
         else:
             kind = Item.NON_FOOD
 
-        yield Item(kind, desc, cost)
-
-        if (s := re.match(r"(\*Sale\*.+?)- ?\$(\d+\.\d\d) (.*)", body)):
-            desc, discount, body = s.groups()
-            yield Item(kind, desc, "-" + discount)
-
-        if (s := re.match(r"(Prime Extra.+?)- ?\$(\d+\.\d\d) (.*)", body)):
-            desc, discount, body = s.groups()
-            yield Item(kind, desc, "-" + discount)
+        yield Item(kind, desc, cost.amount)
+        index, position = found + 2, flag.end + 1
 
-        if (s := re.match(
-                r"(\*\*PRIME MEMBER DEAL) - ?\$(\d+\.\d\d) (.*)", body)):
-            desc, discount, body = s.groups()
-            yield Item(kind, desc, "-" + discount)
+        # a discount ends before the next cost
+        limit = find_cost(body, tokens, index, position)
+        limit = len(body) if limit is None else tokens[limit].start
+        for pattern in DISCOUNTS:
+            if (s := pattern.match(body, position, limit)):
+                desc, discount = s.groups()
+                yield Item(kind, desc, "-" + discount)
+                position = s.end()
 
-    while (s := re.search(r"(Tax:? \d\.\d\d%) \$(\d\.\d\d) (.*)", body)):
-        desc, cost, body = s.groups()
+    for s in TAX.finditer(body, position):
+        desc, cost = s.groups()
         yield Item(Item.TAX, value=cost)
+        position = s.end()
 
-    if (s := re.search(r"Total: +?\$(\d+\.\d\d) (.*)", body)):
-        cost, body = s.groups()
+    if (s := TOTAL.search(body, position)):
+        cost = s.group(1)
         yield Item(Item.TOTAL, value=cost)
+        position = s.end()
 
-    if (s := re.search(r"(\d\d)/(\d\d)/(20\d\d) (.*)", body)):
-        month, day, year, body = s.groups()
+    if (s := DATE.search(body, position)):
+        month, day, year = s.groups()
         yield Item(Item.DATE, value=f"{year}-{month}-{day}")
 
 
@@ -0,0 +1,76 @@
+import pytest
+
+from receipts import aggregate
+from receipts.item import Item, ItemBatch
+
+
+def receipt(vendor, date, food, non_food, tax, total):
+    return [
+        Item(Item.VENDOR, value=vendor),
+        Item(Item.FOOD, "Food", food),
+        Item(Item.NON_FOOD, "Non Food", non_food),
+        Item(Item.TAX, value=tax),
+        Item(Item.TOTAL, value=total),
+        Item(Item.DATE, value=date),
+    ]
+
+
+@pytest.fixture(params=("numpy", "array"))
+def receipts(request, monkeypatch):
+    if request.param == "array":
+        monkeypatch.setattr(aggregate, "numpy", None)
+    elif aggregate.numpy is None:
+        pytest.skip("numpy is not installed")
+
+    result = aggregate.Receipts()
+    result.add(
+        receipt("SAFEWAY", "2022-01-08", "1.00", "2.00", "0.10", "3.10"))
+    result.add(
+        receipt("SAFEWAY", "2022-01-20", "4.00", "0.00", "0.20", "4.20"))
+    result.add(ItemBatch.from_items(
+        receipt("WHOLEFOODS", "2022-02-01", "5.00", "1.00", "0.30", "9.99")))
+    return result
+
+
+def test_totals(receipts):
+    assert receipts.totals() == {
+        ("SAFEWAY", "2022-01", "food"): 500,
+        ("SAFEWAY", "2022-01", "non_food"): 200,
+        ("SAFEWAY", "2022-01", "tax"): 30,
+        ("WHOLEFOODS", "2022-02", "food"): 500,
+        ("WHOLEFOODS", "2022-02", "non_food"): 100,
+        ("WHOLEFOODS", "2022-02", "tax"): 30,
+    }
+
+
+def test_totals_by(receipts):
+    assert receipts.totals(("kind", "vendor"), kinds=(Item.FOOD,)) == {
+        ("food", "SAFEWAY"): 500,
+        ("food", "WHOLEFOODS"): 500,
+    }
+    assert receipts.totals(("day",), kinds=(Item.TOTAL,)) == {
+        ("2022-01-08",): 310,
+        ("2022-01-20",): 420,
+        ("2022-02-01",): 999,
+    }
+    assert receipts.totals((), kinds=(Item.TOTAL,)) == {(): 1729}
+
+
+def test_totals_bad_key(receipts):
+    with pytest.raises(ValueError):
+        receipts.totals(("store",))
+
+
+def test_check(receipts):
+    assert receipts.check() == [2]
+
+
+def test_add_empty_text():
+    result = aggregate.Receipts()
+    batch = ItemBatch()
+    batch.append(Item.VENDOR, value="SAFEWAY")
+    batch.append(Item.DATE, value=None)
+    batch.append(Item.FOOD, "Food", "1.00")
+    result.add(batch)
+    assert list(result.kinds) == [ord(Item.FOOD)]
+    assert result.totals(("vendor", "kind")) == {("SAFEWAY", "food"): 100}
@@ -0,0 +1,152 @@
+import json
+import zipfile
+
+from click.testing import CliRunner
+import pytest
+
+from receipts import batch
+from receipts.classify import classify, cli as classify_cli
+from receipts.errors import ReceiptError
+from receipts.item import Item
+from receipts.summary import cli as summary_cli, summary
+from receipts import synthetic
+
+
+def receipts(tmp_path, bad=(0, 3)):
+    """write six receipts, with the header of those in bad broken"""
+    paths = []
+    for index in range(6):
+        vendor = synthetic.VENDORS[index % 3]
+        text = synthetic.receipt(vendor, lines=10, seed=index)
+        if index in bad:
+            text = text.replace("VIC CUSTOMER", "VIC KUSTOMER")
+        path = tmp_path / f"r{index}.txt"
+        path.write_text(text)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("data, vendor, stage, offset", [
+    ("hello\n", None, "detect", None),
+    ("Harris Teeter\nVIC CUSTOMER 1 \nJUNK\n**** BALANCE\n", "HARRISTEETER",
+     "items", 29),
+    ("SAFEWAY\nGROCERY\nJIFFY\nTAX\n1.00\n2.00\n", "SAFEWAY", "collate",
+     None),
+    ("SAFEWAY\nJIFFY 1.00 B\n", "SAFEWAY", "header", 0),
+    ("SAFEWAY\nGROCERY\nJIFFY 1.00 B\n", "SAFEWAY", "footer", None),
+    ("WHOLE FOODS\nMARKET\n", "WHOLEFOODS", "header", 0),
+])
+def test_errors(data, vendor, stage, offset):
+    with pytest.raises(ReceiptError) as error:
+        classify(data)
+    assert (error.value.vendor, error.value.stage, error.value.offset) == \
+        (vendor, stage, offset)
+
+
+def test_summary_error():
+    items = [Item(Item.VENDOR, value="SAFEWAY"), Item(Item.TAX, value="0.10"),
+             Item(Item.TOTAL, value="1.00")]
+    with pytest.raises(ReceiptError) as error:
+        summary(items)
+    assert (error.value.vendor, error.value.stage) == ("SAFEWAY", "summary")
+
+
+def test_batch(tmp_path):
+    paths = receipts(tmp_path)
+    report = str(tmp_path / "failed.jsonl")
+    run = batch.Batch(lambda member: member[0], report)
+    assert list(run.run(batch.selected(paths))) == \
+        ["r0.txt", "r1.txt", "r2.txt", "r3.txt", "r4.txt", "r5.txt"]
+
+    run = batch.Batch(lambda member: summary(classify(member[1])), report)
+    assert len(list(run.run(batch.selected(paths)))) == 4
+    run.finish()
+    assert (run.done, run.failures) == (6, 2)
+    records = [json.loads(line) for line in open(report)]
+    assert [(record["source"], record["vendor"], record["stage"],
+             record["exception"]) for record in records] == [
+        ("r0.txt", "HARRISTEETER", "header", "ReceiptError"),
+        ("r3.txt", "HARRISTEETER", "header", "ReceiptError")]
+    assert batch.failed(report) == {paths[0]: {"r0.txt"}, paths[3]: {"r3.txt"}}
+
+
+def test_max_errors(tmp_path):
+    paths = receipts(tmp_path)
+    run = batch.Batch(lambda member: classify(member[1]), max_errors=2)
+    assert len(list(run.run(batch.selected(paths)))) == 2
+    assert (run.done, run.failures, run.stopped) == (4, 2, True)
+
+
+def test_retry_archive_members(tmp_path):
+    paths = receipts(tmp_path, bad=(3,))
+    archive = tmp_path / "receipts.zip"
+    with zipfile.ZipFile(archive, "w") as output:
+        for path in paths:
+            output.write(path, path.rsplit("/", 1)[1])
+    report = tmp_path / "failed.jsonl"
+    report.write_text(json.dumps(batch.failure(
+        str(archive), "receipts.zip:r3.txt", ValueError("oops"))) + "\n")
+    assert [name for _, name, _ in batch.selected([], str(report))] == \
+        ["receipts.zip:r3.txt"]
+
+
+def test_cli(tmp_path):
+    paths = receipts(tmp_path)
+    report = str(tmp_path / "failed.jsonl")
+    result = CliRunner().invoke(summary_cli, ["--no-cache", "--errors",
+                                              report, *paths])
+    assert result.exit_code == 1
+    assert len(result.stdout.splitlines()) == 4
+    assert "4 receipts, 2 failed" in result.stderr
+
+    # fix one receipt, then retry the failures only
+    (tmp_path / "r0.txt").write_text(
+        synthetic.receipt("HARRISTEETER", lines=10, seed=0))
+    result = CliRunner().invoke(classify_cli, [
+        "--no-cache", "--json", "--retry-failed", report, "--errors",
+        report])
+    assert result.exit_code == 1
+    assert {json.loads(line)["source"] for line in
+            result.stdout.splitlines()} == {"r0.txt"}
+    assert [json.loads(line)["source"] for line in open(report)] == \
+        ["r3.txt"]
+
+
+def test_cli_without_batch_mode_stops(tmp_path):
+    paths = receipts(tmp_path)
+    result = CliRunner().invoke(summary_cli, ["--no-cache", *paths])
+    assert isinstance(result.exception, ReceiptError)
+    assert result.stdout == ""
+
+
+def test_unreadable_files(tmp_path):
+    paths = receipts(tmp_path, bad=())
+    (tmp_path / "latin1.txt").write_bytes("CAF\xc9\n".encode("latin-1"))
+    paths[1:1] = [str(tmp_path / "missing.txt"), str(tmp_path / "latin1.txt")]
+    report = str(tmp_path / "failed.jsonl")
+    result = CliRunner().invoke(summary_cli, ["--no-cache", "--errors",
+                                              report, *paths])
+    assert result.exit_code == 1
+    assert len(result.stdout.splitlines()) == 6
+    assert "6 receipts, 2 failed" in result.stderr
+    assert [(record["source"], record["stage"], record["exception"])
+            for record in map(json.loads, open(report))] == [
+        ("missing.txt", "read", "FileNotFoundError"),
+        ("latin1.txt", "read", "UnicodeDecodeError")]
+
+
+def test_retry_deleted_file(tmp_path):
+    paths = receipts(tmp_path, bad=(0,))
+    report = str(tmp_path / "failed.jsonl")
+    run = batch.Batch(lambda member: classify(member[1]), report)
+    assert len(list(run.run(batch.selected(paths)))) == 5
+    run.finish()
+
+    (tmp_path / "r0.txt").unlink()
+    found = batch.selected([], report)
+    run = batch.Batch(lambda member: classify(member[1]), report)
+    assert list(run.run(found)) == []
+    run.finish()
+    assert [(record["source"], record["stage"])
+            for record in map(json.loads, open(report))] == \
+        [("r0.txt", "read")]
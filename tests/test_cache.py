@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from receipts import cache
+from receipts import safeway
+from receipts.classify import classify, classify_paths
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+def test_get_put(tmp_path):
+    store = cache.Cache(str(tmp_path))
+    assert store.get("ns", "key") is None
+    store.put("ns", "key", b"data")
+    assert store.get("ns", "key") == b"data"
+
+
+def test_evict(tmp_path):
+    store = cache.Cache(str(tmp_path), max_size=150)
+    for index in range(5):
+        store.put("ns", f"key{index}", b"x" * 30)
+        os.utime(store.path("ns", f"key{index}"), (index, index))
+    store.get("ns", "key0")  # most recently used
+    store.put("ns", "key5", b"x" * 30)
+    assert store.size == 120
+    assert store.get("ns", "key0") == b"x" * 30
+    assert store.get("ns", "key1") is None
+    assert store.get("ns", "key2") is None
+    assert store.get("ns", "key5") == b"x" * 30
+
+
+def test_overwrite(tmp_path):
+    store = cache.Cache(str(tmp_path), max_size=150)
+    store.put("ns", "key", b"x" * 30)
+    for _ in range(10):
+        store.put("ns", "key", b"x" * 40)
+    assert store.size == 40
+    assert store.get("ns", "key") == b"x" * 40
+
+
+def test_threads(tmp_path):
+    store = cache.Cache(str(tmp_path), max_size=10000)
+    store.put("ns", "first", b"")
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda index: store.put("ns", f"key{index}",
+                                              b"x" * 100), range(400)))
+    assert store.size == sum(size for _, size, _ in store.entries())
+    assert store.size <= 10000
+
+
+def test_worker_processes(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"receipt{index}.txt"
+        path.write_text(HEADER + BODY + FOOTER)
+        paths.append(str(path))
+    store = cache.ItemCache(str(tmp_path / "cache"))
+    for _ in range(2):  # parsed, then loaded from the cache
+        result = list(classify_paths(paths, jobs=2, cache=store))
+        assert [items[-1].value for items in result] == [
+            f"receipt{index}.txt" for index in range(4)]
+    store.put("ns", "key", b"data")  # the lock still works here
+
+
+def test_item_cache(tmp_path, monkeypatch):
+    data = HEADER + BODY + FOOTER
+    store = cache.ItemCache(str(tmp_path))
+    parsed = classify(data, source="a.txt", cache=store)
+    assert store.load(safeway, data) is not None
+
+    monkeypatch.setattr(safeway, "classify", None)  # must not be called
+    cached = classify(data, source="a.txt", cache=store)
+    assert [str(i) for i in cached] == [str(i) for i in parsed]
+
+
+def test_version_change(tmp_path, monkeypatch):
+    data = HEADER + BODY + FOOTER
+    store = cache.ItemCache(str(tmp_path))
+    classify(data, cache=store)
+    monkeypatch.setitem(cache._versions, safeway.__name__, "changed")
+    assert store.load(safeway, data) is None
+
+
+def test_shared_version_change(tmp_path, monkeypatch):
+    data = HEADER + BODY + FOOTER
+    store = cache.ItemCache(str(tmp_path))
+    classify(data, cache=store)
+    monkeypatch.setitem(cache._versions, cache.SHARED, "changed")
+    assert store.load(safeway, data) is None
@@ -0,0 +1,49 @@
+from click.testing import CliRunner
+
+from receipts import classify
+from receipts.cache import ItemCache
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+def write_receipts(tmp_path, count):
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"receipt{index}.txt"
+        path.write_text(HEADER + BODY + FOOTER)
+        paths.append(str(path))
+    return paths
+
+
+def test_classify_paths(tmp_path):
+    paths = write_receipts(tmp_path, 3)
+    result = list(classify.classify_paths(paths))
+    assert [items[-1].value for items in result] == [
+        "receipt0.txt", "receipt1.txt", "receipt2.txt"]
+
+
+def test_classify_paths_parallel(tmp_path):
+    paths = write_receipts(tmp_path, 5)
+    serial = list(classify.classify_paths(paths))
+    parallel = list(classify.classify_paths(paths, jobs=2))
+    assert [[str(i) for i in items] for items in parallel] == [
+        [str(i) for i in items] for items in serial]
+
+
+def test_classify_paths_unordered(tmp_path):
+    paths = write_receipts(tmp_path, 5)
+    result = classify.classify_paths(paths, jobs=2, ordered=False)
+    assert sorted(items[-1].value for items in result) == [
+        f"receipt{index}.txt" for index in range(5)]
+
+
+def test_cli_parallel_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(ItemCache, "DIRECTORY", str(tmp_path / "cache"))
+    paths = write_receipts(tmp_path, 4)
+    for _ in range(2):  # parsed, then loaded from the cache
+        result = CliRunner().invoke(classify.cli, ["--jobs", "2"] + paths)
+        assert result.exit_code == 0, result.output
+        assert [line for line in result.output.splitlines()
+                if line.startswith("R ")] == [
+            f"R Source receipt{index}.txt" for index in range(4)]
+    assert list((tmp_path / "cache").rglob("*"))
@@ -0,0 +1,201 @@
+import random
+
+import pytest
+
+from receipts import dedup, synthetic
+from receipts.item import Item
+from receipts.store import Store
+
+
+def flip(rng, key, count):
+    for bit in rng.sample(range(dedup.BITS), count):
+        key ^= 1 << bit
+    return key
+
+
+def test_search():
+    rng = random.Random(0)
+    index = dedup.ImageIndex()
+    keys = [rng.getrandbits(dedup.BITS) for _ in range(500)]
+    for number, key in enumerate(keys):
+        index.add(key, str(number))
+    assert len(index) == len(keys)
+
+    found = 0
+    for number, key in enumerate(keys[:200]):
+        near = flip(rng, key, rng.randint(0, dedup.DISTANCE))
+        if matches := index.search(near):
+            assert matches == [(dedup.distance(near, key), str(number))]
+            found += 1
+        assert index.search(flip(rng, key, 200)) == []
+    assert found >= 195  # buckets may miss a few near hashes
+
+
+def test_search_nearest_first():
+    rng = random.Random(1)
+    index = dedup.ImageIndex()
+    key = rng.getrandbits(dedup.BITS)
+    for count in (30, 10, 20):
+        index.add(flip(rng, key, count), str(count))
+    assert [source for _, source in index.search(key)] == ["10", "20", "30"]
+
+
+def receipt(source, *lines, total="19.97"):
+    items = [Item(Item.VENDOR, value="SAFEWAY"),
+             Item(Item.DATE, value="2022-01-08")]
+    items.extend(Item(kind, desc, cost) for kind, desc, cost in lines)
+    items.append(Item(Item.TOTAL, value=total))
+    items.append(Item(Item.SOURCE, value=source))
+    return items
+
+
+LINES = ((Item.FOOD, "COFFEE", "11.99"), (Item.FOOD, "Coffee-Beans", "5.00"),
+         (Item.NON_FOOD, "FOIL", "2.98"))
+
+
+def test_fingerprint():
+    original = dedup.fingerprint(receipt("a.txt", *LINES))
+    # source, item order and description punctuation do not matter
+    assert dedup.fingerprint(receipt("b.txt", *reversed(LINES))) == original
+    assert dedup.fingerprint(receipt(
+        "c.txt", (Item.FOOD, "COFFEE BEANS", "5.00"), *LINES[::2])) == \
+        original
+    # but the multiset of items does
+    assert dedup.fingerprint(receipt("d.txt", *LINES, LINES[0])) != original
+    assert dedup.fingerprint(receipt("e.txt", *LINES, total="20.97")) != \
+        original
+    assert dedup.fingerprint([Item(Item.SOURCE, value="f.txt")]) is None
+
+
+def test_store_skips_duplicates(tmp_path):
+    store = Store(str(tmp_path / "receipts.db"))
+    assert store.ingest([receipt("a.txt", *LINES),
+                         receipt("b.txt", *reversed(LINES)),
+                         receipt("a.txt", *LINES)]) == 2
+    assert store.duplicates == [("b.txt", "a.txt")]
+    assert store.query() == [(1997, 3)]
+    store.close()
+
+    store = Store(str(tmp_path / "receipts.db"), duplicates=True)
+    assert store.ingest([receipt("b.txt", *LINES)]) == 1
+    assert store.duplicates == []
+    assert store.query() == [(3994, 6)]
+    store.close()
+
+
+def test_store_keeps_receipts_without_fingerprint(tmp_path):
+    store = Store(str(tmp_path / "receipts.db"))
+    assert store.ingest([[Item(Item.SOURCE, value="x.txt")],
+                         [Item(Item.SOURCE, value="y.txt")]]) == 2
+    assert store.duplicates == []
+    store.close()
+
+
+def test_store_same_purchase_twice_in_a_day(tmp_path):
+    # two identical purchases on one day cannot be told from two copies of
+    # one receipt: the second is only stored with duplicates
+    store = Store(str(tmp_path / "receipts.db"))
+    assert store.ingest([receipt("morning.txt", *LINES),
+                         receipt("evening.txt", *LINES)]) == 1
+    assert store.duplicates == [("evening.txt", "morning.txt")]
+    store.close()
+
+    store = Store(str(tmp_path / "receipts.db"), duplicates=True)
+    assert store.ingest([receipt("evening.txt", *LINES)]) == 1
+    store.close()
+
+
+def test_store_adds_fingerprint_column(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "receipts.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE receipt (id INTEGER PRIMARY KEY,"
+        " source TEXT NOT NULL UNIQUE, vendor TEXT, date TEXT,"
+        " total INTEGER, tax INTEGER)")
+    connection.close()
+    store = Store(path)
+    assert store.ingest([receipt("a.txt", *LINES)]) == 1
+    store.close()
+
+
+def test_image_index(tmp_path):
+    pytest.importorskip("PIL")
+    texts = [synthetic.receipt(vendor, lines=30, seed=seed)
+             for vendor in ("SAFEWAY", "HARRISTEETER") for seed in (1, 2)]
+    path = str(tmp_path / "images.db")
+    index = dedup.ImageIndex(path)
+    for number, text in enumerate(texts):
+        key = dedup.hashed(synthetic.photo(text, (900, 1200), seed=0))
+        assert index.duplicate(key, f"{number}.jpg") is None
+        index.add(key, f"{number}.jpg")
+        index.add(key, f"{number}.jpg")  # seen again
+        assert index.duplicate(key, f"{number}.jpg") is None
+    index.close()
+
+    index = dedup.ImageIndex(path)
+    assert len(index) == len(texts)
+    for number, text in enumerate(texts):
+        retake = synthetic.photo(text, (900, 1200), orientation=6)
+        assert index.duplicate(dedup.hashed(retake), "retake.jpg") == \
+            f"{number}.jpg"
+    assert dedup.hashed(b"not an image") is None
+
+
+def test_annotate_batch_skips_retakes(tmp_path):
+    pytest.importorskip("PIL")
+    from receipts import vision
+    from receipts.standin import StandIn
+
+    text = synthetic.receipt("SAFEWAY", lines=30, seed=0)
+    paths = []
+    for index, orientation in enumerate((1, 8, 1)):
+        path = tmp_path / f"receipt{index}.jpg"
+        path.write_bytes(synthetic.photo(text, (900, 1200), orientation))
+        paths.append(str(path))
+
+    server = StandIn().start()
+    try:
+        result = dict(vision.annotate_batch(
+            paths, vision.HttpAnnotator(server.url),
+            dedup=dedup.ImageIndex()))
+    finally:
+        server.stop()
+    assert server.images == 1
+    assert "textAnnotations" in result[paths[0]]
+    assert result[paths[1]] == result[paths[2]] == {"duplicate": paths[0]}
+
+
+def test_annotate_batch_indexes_read_photos_only(tmp_path):
+    pytest.importorskip("PIL")
+    from receipts import vision
+    from receipts.standin import StandIn
+
+    text = synthetic.receipt("SAFEWAY", lines=30, seed=0)
+    photo = synthetic.photo(text, (900, 1200))
+    paths = []
+    for name, content in (("good.jpg", photo), ("bad.jpg", b"not an image"),
+                          ("retake.jpg", photo)):
+        (tmp_path / name).write_bytes(content)
+        paths.append(str(tmp_path / name))
+    index = dedup.ImageIndex()
+
+    server = StandIn().start()
+    server.failures = 10
+    try:
+        result = dict(vision.annotate_batch(
+            paths[:2], vision.HttpAnnotator(server.url), retries=0,
+            dedup=index))
+        assert all("error" in response for response in result.values())
+        assert len(index) == 0  # failed photos are not indexed
+
+        server.failures = 0
+        result = dict(vision.annotate_batch(
+            paths, vision.HttpAnnotator(server.url), dedup=index))
+    finally:
+        server.stop()
+    assert "textAnnotations" in result[paths[0]]
+    assert "textAnnotations" in result[paths[1]]  # sent, though unhashable
+    assert result[paths[2]] == {"duplicate": paths[0]}
+    assert len(index) == 1
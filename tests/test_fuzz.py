@@ -0,0 +1,89 @@
+import random
+import time
+
+import pytest
+
+from receipts import budget
+from receipts.classify import classify
+from receipts.errors import ReceiptError
+from receipts import synthetic
+from receipts.vendor import detect
+
+try:
+    from hypothesis import given, settings, strategies
+except ImportError:
+    given = None
+
+
+def parse(data):
+    """classify data, allowing only the errors of a bad receipt"""
+    try:
+        return classify(data, budget=None)
+    except ReceiptError:
+        return None
+
+
+@pytest.mark.parametrize("vendor", synthetic.VENDORS)
+@pytest.mark.parametrize("seed", range(20))
+def test_garbled(vendor, seed):
+    parse(synthetic.fuzzed(vendor, random.Random(seed).choice(
+        (500, 2000, 8000)), seed))
+
+
+@pytest.mark.parametrize("vendor", synthetic.VENDORS)
+def test_adversarial(vendor):
+    for _, data in synthetic.adversarial(vendor, 20000):
+        start = time.perf_counter()
+        parse(data)
+        # a few ms each; the unbounded whole foods header took minutes
+        assert time.perf_counter() - start < 2.0
+
+
+if given is not None:
+    @settings(max_examples=50, deadline=None)
+    @given(strategies.sampled_from(synthetic.VENDORS),
+           strategies.integers(0, 2 ** 32), strategies.integers(1, 40))
+    def test_garbled_hypothesis(vendor, seed, mutations):
+        rng = random.Random(seed)
+        parse(synthetic.garble(synthetic.receipt(vendor, lines=20,
+                                                 seed=seed), rng, mutations))
+
+
+def test_garble_repeatable():
+    text = synthetic.receipt("SAFEWAY", seed=0)
+    assert synthetic.garble(text, random.Random(1)) == \
+        synthetic.garble(text, random.Random(1)) != text
+
+
+@pytest.mark.parametrize("vendor", synthetic.VENDORS)
+def test_budget(vendor):
+    data = synthetic.receipt(vendor, lines=2000, seed=0)
+    assert classify(data)
+    with pytest.raises(budget.ParseTimeout) as error:
+        classify(data, budget=1e-9)
+    assert error.value.vendor == vendor
+    assert error.value.stage is not None
+
+
+def test_budget_includes_detect(monkeypatch):
+    data = synthetic.receipt("SAFEWAY", seed=0)
+
+    def slow_detect(data):
+        time.sleep(0.05)
+        return detect(data)
+
+    monkeypatch.setattr("receipts.vendor.detect", slow_detect)
+    with pytest.raises(budget.ParseTimeout):
+        classify(data, budget=0.01)
+
+
+def test_limit():
+    budget.check()  # no budget
+    with budget.limit(60):
+        with budget.limit(1e-9):
+            with pytest.raises(budget.ParseTimeout):
+                budget.check("items", 12)
+        budget.check()
+        with budget.limit(0):
+            budget.check()
+    budget.check()
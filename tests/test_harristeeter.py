@@ -0,0 +1,46 @@
+import pytest
+
+from receipts import harristeeter
+
+
+RECEIPT = (
+    "Harris Teeter\n"
+    "Store 123 Main St\n"
+    "VIC CUSTOMER 4567\n"
+    "BANANAS\n"
+    "1.23 B\n"
+    "2 @ 1.99\n"
+    "YOGURT 3.98 B\n"
+    "VIC SAVINGS 0.50-B\n"
+    "PAPER TOWELS\n"
+    "5.99 T\n"
+    "PRICE YOU PAY 5.49\n"
+    "HOT FOODS BAR 6.50 T\n"
+    "BATTERIES 7.99\n"
+    "TAX 0.45\n"
+    "**** BALANCE 25.64\n"
+    "CREDIT 25.64\n"
+    "01/08/22 13:46 STORE 123\n"
+)
+
+
+def test_classify():
+    result = [str(item) for item in harristeeter.classify(RECEIPT)]
+    assert result == [
+        "V Vendor HARRISTEETER",
+        "F BANANAS 1.23",
+        "F 2 @ 1.99 YOGURT 3.98",
+        "F VIC SAVINGS -0.50",
+        "N PAPER TOWELS 5.99",
+        "F HOT FOODS BAR 6.50",
+        "N BATTERIES 7.99",
+        "X Tax 0.45",
+        "T Total 25.64",
+        "D Date 2022-01-08",
+    ]
+
+
+def test_unmatched():
+    data = RECEIPT.split("TAX")[0]
+    with pytest.raises(Exception):
+        list(harristeeter.classify(data))
@@ -2,7 +2,8 @@ from decimal import Decimal
 
 import pytest
 
-from receipts.item import Item
+from receipts.item import CompactItem, Item, ItemBatch
+from receipts.money import cents, dollars
 
 
 def test_basic():
@@ -50,3 +51,90 @@ def test_missing_desc():
 def invalid_kind():
     with pytest.raises(ValueError):
         Item("Z")
+
+
+@pytest.mark.parametrize("value,result", (
+    ("12.34", 1234),
+    ("-1.50", -150),
+    ("0.05", 5),
+    (None, 0),
+    (100.00, 10000),
+    (1.1, 110),
+    (-19.99, -1999),
+    (Decimal("3.1"), 310),
+))
+def test_cents(value, result):
+    assert cents(value) == result
+
+
+@pytest.mark.parametrize("value", ("asdf", "1.234", 1.234, float("nan")))
+def test_bad_cents(value):
+    with pytest.raises(ValueError):
+        cents(value)
+
+
+@pytest.mark.parametrize("value,result", (
+    (1234, "12.34"),
+    (-150, "-1.50"),
+    (5, "0.05"),
+    (0, "0.00"),
+))
+def test_dollars(value, result):
+    assert dollars(value) == result
+
+
+def test_compact_item():
+    item = Item(Item.FOOD, "Blah", "-1.50")
+    compact = CompactItem.from_item(item)
+    assert compact.value == -150
+    assert str(compact) == str(item)
+    assert compact.as_dict() == item.as_dict()
+    assert compact.as_item().value == item.value
+    with pytest.raises(AttributeError):
+        compact.other = 1
+
+
+def test_item_batch():
+    items = [
+        Item(Item.VENDOR, value="SAFEWAY"),
+        Item(Item.FOOD, "Blah", "12.34"),
+        Item(Item.NON_FOOD, "Foo", "1.00"),
+        Item(Item.FOOD, "Discount", "-0.34"),
+        Item(Item.TAX, value="0.50"),
+        Item(Item.DATE, value="2020-12-13"),
+    ]
+    batch = ItemBatch.from_items(items)
+    assert len(batch) == 6
+    assert [str(i) for i in batch] == [str(i) for i in items]
+    assert list(batch.dumps()) == [i.dumps() for i in items]
+    assert batch.attrs() == {Item.VENDOR: "SAFEWAY", Item.DATE: "2020-12-13"}
+    assert list(batch.lines()) == [
+        (Item.FOOD, "Blah", 1234),
+        (Item.NON_FOOD, "Foo", 100),
+        (Item.FOOD, "Discount", -34),
+    ]
+    assert batch.totals() == {Item.FOOD: 1200, Item.NON_FOOD: 100,
+                              Item.TAX: 50}
+
+    loaded = ItemBatch.loads(batch.dumps())
+    assert [str(i) for i in loaded] == [str(i) for i in items]
+
+
+def test_item_batch_empty_text():
+    batch = ItemBatch()
+    batch.append(Item.VENDOR, value="SAFEWAY")
+    batch.append(Item.DATE, value=None)
+    batch.append(Item.FOOD, "Blah", "1.00")
+    assert batch.attrs() == {Item.VENDOR: "SAFEWAY", Item.DATE: None}
+    assert batch.totals() == {Item.FOOD: 100, Item.NON_FOOD: 0}
+
+
+def test_item_cents():
+    item = Item(Item.FOOD, "Blah", "12.34")
+    assert item.cents == 1234
+    item.cents = -150
+    assert item.value == Decimal("-1.50")
+    assert str(item) == "F Blah -1.50"
+    with pytest.raises(ValueError):
+        item.cents = "1.50"
+    assert Item(Item.DATE, value="2020-12-13").cents is None
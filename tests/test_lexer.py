@@ -0,0 +1,30 @@
+import pytest
+
+from receipts import lexer
+
+
+@pytest.mark.parametrize("text,kind,amount,flag", (
+    ("BANANAS", lexer.WORD, None, None),
+    ("1.23", lexer.AMOUNT, "1.23", None),
+    ("$1.23", lexer.DOLLAR, "1.23", None),
+    ("0.50-B", lexer.DISCOUNT, "0.50", "B"),
+    ("0.50-", lexer.DISCOUNT, "0.50", None),
+    ("-$0.20", lexer.DISCOUNT, "0.20", None),
+    ("B", lexer.FLAG, None, "B"),
+    ("FT", lexer.FLAG, None, "FT"),
+    ("1.234", lexer.WORD, None, None),
+    ("$1.23x", lexer.WORD, None, None),
+))
+def test_kind(text, kind, amount, flag):
+    token, = lexer.tokenize(text)
+    assert token.kind == kind
+    assert token.amount == amount
+    assert token.flag == flag
+
+
+def test_positions():
+    data = "XX  COFFEE 11.99 B\nTAX"
+    tokens = lexer.tokenize(data, 2)
+    assert [t.text for t in tokens] == ["COFFEE", "11.99", "B", "TAX"]
+    assert [data[t.start:t.end] for t in tokens] == [
+        "COFFEE", "11.99", "B", "TAX"]
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from receipts import classify
+from receipts import metrics
+from receipts import synthetic
+
+
+@pytest.fixture
+def recording():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_disabled():
+    metrics.reset()
+    assert metrics.timer("detect") is metrics.NULL_TIMER
+    classify.classify(synthetic.receipt("SAFEWAY"))
+    assert metrics.snapshot() == ({}, {})
+
+
+def test_timer(recording):
+    with metrics.timer("detect"):
+        pass
+    with metrics.timer("detect"):
+        pass
+    metrics.observe("detect", 100.0)
+    ((key, histogram),) = metrics.snapshot()[0].items()
+    assert key == ("detect", ())
+    assert histogram[0] == 2  # under the first bucket
+    assert histogram[-2] == 1  # +Inf
+    assert histogram[-1] >= 100.0
+
+
+def test_classify(recording):
+    for data in synthetic.receipts(6, lines=20, discounts=0.0):
+        classify.classify(data)
+    report = metrics.report()
+    calls = {(t["name"], tuple(t["labels"].values())): t["count"]
+             for t in report["timers"]}
+    assert calls[("classify", ())] == 6
+    assert calls[("vendor_classify", ("SAFEWAY",))] == 2
+    assert calls[("safeway_stage", ("collate",))] == 2
+    counts = {(c["name"], c["labels"]["vendor"]): c["value"]
+              for c in report["counters"]}
+    assert counts[("receipts", "WHOLEFOODS")] == 2
+    assert counts[("items", "HARRISTEETER")] == 2 * (10 + 4)
+
+
+def test_parallel(recording):
+    members = [(str(index), data)
+               for index, data in enumerate(synthetic.receipts(4))]
+    list(classify.parallel(classify.classify_member, members, jobs=2))
+    (classified,) = [t for t in metrics.report()["timers"]
+                     if t["name"] == "classify"]
+    assert classified["count"] == 4
+
+
+def test_prometheus(recording):
+    metrics.observe("classify", 0.003)
+    metrics.count("items", 3, vendor="SAFEWAY")
+    text = metrics.prometheus()
+    assert "# TYPE receipts_classify_seconds histogram\n" in text
+    assert 'receipts_classify_seconds_bucket{le="0.0025"} 0\n' in text
+    assert 'receipts_classify_seconds_bucket{le="0.005"} 1\n' in text
+    assert 'receipts_classify_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "receipts_classify_seconds_count 1\n" in text
+    assert 'receipts_items_total{vendor="SAFEWAY"} 3\n' in text
+
+
+def test_write(recording, tmp_path):
+    metrics.count("receipts", vendor="SAFEWAY")
+    metrics.write(str(tmp_path / "metrics.json"))
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert report["counters"] == [
+        dict(name="receipts", labels=dict(vendor="SAFEWAY"), value=1)]
+    metrics.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text().startswith("# TYPE")
@@ -0,0 +1,136 @@
+import io
+import json
+
+from click.testing import CliRunner
+import pytest
+
+from receipts import pipeline
+from receipts import vision
+from receipts.standin import StandIn
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+@pytest.fixture
+def standin():
+    server = StandIn().start()
+    yield server
+    server.stop()
+
+
+def test_run(tmp_path, standin):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"photo{index}.jpg"
+        path.write_text(HEADER + BODY + FOOTER)
+        paths.append(str(path))
+    path = tmp_path / "text.txt"
+    path.write_text(HEADER + BODY + FOOTER)
+    paths.append(str(path))
+    path = tmp_path / "bad.jpg"
+    path.write_text("garbage\n")
+    paths.append(str(path))
+
+    output = io.StringIO()
+    stages = pipeline.run(
+        paths, output, annotator=vision.HttpAnnotator(standin.url),
+        batch_size=2)
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(result["source"] for result in results) == [
+        "bad.jpg", "photo0.jpg", "photo1.jpg", "photo2.jpg", "text.txt"]
+    for result in results:
+        if result["source"] == "bad.jpg":
+            assert result["stage"] == "parse"
+        else:
+            assert result["total"] == "70.68"
+
+    assert [stage.count for stage in stages] == [1, 4, 5, 5]
+    assert "summary" in stages[-1].report()
+
+
+def test_run_items(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_text(HEADER + BODY + FOOTER)
+    output = io.StringIO()
+    pipeline.run([str(path)], output, items=True)
+    items, = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert items[-1] == {"kind": "R", "desc": "Source", "value": "text.txt"}
+
+
+def test_run_missing_files(tmp_path, standin):
+    paths = []
+    for name in ("a.txt", "missing.txt", "missing.jpg", "b.txt", "c.jpg"):
+        path = tmp_path / name
+        if not name.startswith("missing"):
+            path.write_text(HEADER + BODY + FOOTER)
+        paths.append(str(path))
+    (tmp_path / "latin1.txt").write_bytes("CAF\xc9\n".encode("latin-1"))
+    paths.insert(2, str(tmp_path / "latin1.txt"))
+
+    output = io.StringIO()
+    stages = pipeline.run(
+        paths, output, annotator=vision.HttpAnnotator(standin.url))
+
+    results = {result["source"]: result for result in
+               map(json.loads, output.getvalue().splitlines())}
+    assert sorted(results) == ["a.txt", "b.txt", "c.jpg", "latin1.txt",
+                               "missing.jpg", "missing.txt"]
+    assert results["missing.txt"]["stage"] == "read"
+    assert results["latin1.txt"]["stage"] == "read"
+    assert results["missing.jpg"]["stage"] == "ocr"
+    for name in ("a.txt", "b.txt", "c.jpg"):
+        assert results[name]["total"] == "70.68"
+    assert [stage.count for stage in stages] == [4, 2, 6, 6]
+
+
+def test_run_dedup(tmp_path, standin):
+    pytest.importorskip("PIL")
+    from receipts import dedup, synthetic
+
+    text = synthetic.receipt("SAFEWAY", lines=30, seed=0)
+    paths = []
+    for index, orientation in enumerate((1, 8)):
+        path = tmp_path / f"receipt{index}.jpg"
+        path.write_bytes(synthetic.photo(text, (900, 1200), orientation))
+        paths.append(str(path))
+
+    output = io.StringIO()
+    index = dedup.ImageIndex(str(tmp_path / "images.db"))  # this thread's
+    pipeline.run(paths, output, annotator=vision.HttpAnnotator(standin.url),
+                 dedup=index)
+    results = {result["source"]: result for result in
+               map(json.loads, output.getvalue().splitlines())}
+    assert sorted(results) == ["receipt0.jpg", "receipt1.jpg"]
+    assert results["receipt1.jpg"]["duplicate"] == paths[0]
+    assert len(index) == 1
+
+
+def test_ocr_stage_failure(tmp_path, monkeypatch):
+    paths = []
+    for name in ("a.jpg", "b.jpg", "c.jpg", "d.txt"):
+        path = tmp_path / name
+        path.write_text(HEADER + BODY + FOOTER)
+        paths.append(str(path))
+
+    def annotate_batch(paths, *args, **kwargs):
+        yield next(paths), {"textAnnotations": [
+            {"description": HEADER + BODY + FOOTER}]}
+        next(paths)  # taken, then lost
+        raise RuntimeError("index is broken")
+
+    monkeypatch.setattr(vision, "annotate_batch", annotate_batch)
+    output = io.StringIO()
+    stages = pipeline.run(paths, output)
+    assert stages[1].error == "index is broken"
+    results = {result["source"]: result for result in
+               map(json.loads, output.getvalue().splitlines())}
+    assert sorted(results) == ["a.jpg", "b.jpg", "c.jpg", "d.txt"]
+    assert results["a.jpg"]["total"] == results["d.txt"]["total"] == "70.68"
+    for name in ("b.jpg", "c.jpg"):
+        assert results[name] == {"source": name, "stage": "ocr",
+                                 "error": "index is broken"}
+
+    result = CliRunner().invoke(pipeline.cli, ["--no-cache"] + paths)
+    assert result.exit_code == 1
+    assert "ocr failed: index is broken" in result.stderr
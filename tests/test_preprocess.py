@@ -0,0 +1,130 @@
+import io
+
+import pytest
+
+from receipts import synthetic
+from receipts import vision
+from receipts.standin import StandIn
+
+Image = pytest.importorskip("PIL.Image")
+ImageStat = pytest.importorskip("PIL.ImageStat")
+from receipts import preprocess  # noqa: E402
+
+
+SIZE = (1200, 1600)
+TEXT = synthetic.receipt("SAFEWAY", lines=20, seed=0)
+
+
+def open_image(content):
+    return Image.open(io.BytesIO(content))
+
+
+@pytest.mark.parametrize("orientation", (1, 3, 6, 8))
+def test_prepare(orientation):
+    content = synthetic.photo(TEXT, SIZE, orientation)
+    prepared = preprocess.prepare(content, max_side=800)
+    assert len(prepared) < len(content) / 4
+    image = open_image(prepared)
+    assert image.mode == "L"
+    assert max(image.size) == 800
+    # upright (the receipt is taller than it is wide) and cropped to the
+    # bright paper
+    width, height = image.size
+    assert width < height
+    assert ImageStat.Stat(image).mean[0] > 180
+
+
+def test_prepare_no_crop():
+    content = synthetic.photo(TEXT, SIZE)
+    image = open_image(preprocess.prepare(content, max_side=800, crop=False))
+    assert image.size == (600, 800)
+    assert ImageStat.Stat(image).mean[0] < 150
+
+
+def test_prepare_small_image():
+    output = io.BytesIO()
+    Image.new("L", (40, 40), 255).save(output, "PNG")
+    content = output.getvalue()
+    assert preprocess.prepare(content) == content
+
+
+def test_annotate_batch(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"receipt{index}.jpg"
+        path.write_bytes(synthetic.photo(TEXT, SIZE, seed=index))
+        paths.append(str(path))
+    cache = vision.ResponseCache(str(tmp_path / "cache"))
+
+    sent = {}
+    for prepare in (False, True):
+        server = StandIn().start()
+        try:
+            result = list(vision.annotate_batch(
+                paths, vision.HttpAnnotator(server.url), cache,
+                prepare=prepare, prepare_jobs=2))
+        finally:
+            server.stop()
+        assert [path for path, _ in result] == paths
+        sent[prepare] = server.bytes
+    assert sent[True] < sent[False] / 4
+
+    # prepared responses are cached apart from the originals
+    content = open(paths[0], "rb").read()
+    assert cache.load(content) != cache.load(content, preprocess.key())
+
+
+def test_annotate_batch_unreadable(tmp_path, monkeypatch):
+    good = tmp_path / "good.jpg"
+    good.write_bytes(synthetic.photo(TEXT, SIZE))
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not an image")
+    paths = [str(good), str(bad), str(good)]
+    cache = vision.ResponseCache(str(tmp_path / "cache"))
+    server = StandIn().start()
+    try:
+        result = list(vision.annotate_batch(
+            paths, vision.HttpAnnotator(server.url), cache, prepare=True,
+            prepare_jobs=2))
+    finally:
+        server.stop()
+    assert sorted(("error" in response, path) for path, response in
+                  result) == [(False, str(good)), (False, str(good)),
+                              (True, str(bad))]
+
+    # cached images are not prepared again
+    prepared = []
+    monkeypatch.setattr(vision, "_prepared", prepared.append)
+    result = list(vision.annotate_batch(
+        [str(good)], vision.HttpAnnotator(server.url), cache, prepare=True,
+        prepare_jobs=1))
+    assert prepared == []
+    assert "error" not in result[0][1]
+
+
+def test_prepare_unsent_streams_cached(tmp_path):
+    read = []
+
+    def loaded():
+        for index in range(40):
+            read.append(index)
+            yield f"{index}.jpg", None, {"textAnnotations": []}, None
+
+    found = vision._prepare_unsent(loaded(), 2)
+    assert next(found)[0] == "0.jpg"
+    assert read == [0]  # passed on before the next image is read
+    assert [path for path, *_ in found] == [f"{i}.jpg" for i in range(1, 40)]
+
+    # a cache hit is passed on without its image
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(synthetic.photo(TEXT, SIZE))
+    cache = vision.ResponseCache(str(tmp_path / "cache"))
+    server = StandIn().start()
+    try:
+        for _ in range(2):
+            list(vision.annotate_batch(
+                [str(photo)], vision.HttpAnnotator(server.url), cache,
+                prepare=True, prepare_jobs=2))
+    finally:
+        server.stop()
+    assert server.images == 1
@@ -1,8 +1,10 @@
 from decimal import Decimal
 
 import pytest
+from click.testing import CliRunner
 
 from receipts import safeway
+from receipts.item import Item
 
 
 HEADER = (
@@ -110,6 +112,7 @@ def test_header(data, header, body):
 @pytest.mark.parametrize("data,body,footer", (
     (BODY + FOOTER, BODY[:-1], FOOTER[4:]),
     ("ABC\nTAX\nDEF", "ABC", "DEF"),
+    ("ABC\nTAX 1.23\nDEF", "ABC", "1.23\nDEF"),
 ))
 def test_footer(data, body, footer):
     a, b = safeway.footer(data)
@@ -125,6 +128,22 @@ def test_dollars():
     ]
 
 
+def test_dollars_rows():
+    assert safeway.dollars("0.59\n**** BALANCE 36.03\nCHANGE 0.00\n",
+                           rows=True) == ["0.59", "36.03", "0.00"]
+
+
+def test_footer_amounts_after_text():
+    # vision text keeps amounts on lines of their own, so a line ending in
+    # an amount is not taken for the tax or total
+    data = HEADER + BODY + FOOTER.replace(
+        "**** BALANCE\n", "**** BALANCE\nBOTTLE DEPOSIT 0.10\n")
+    assert not safeway.rows(data)
+    items = safeway.classify(data)
+    assert [str(item.value) for item in items
+            if item.kind in (Item.TAX, Item.TOTAL)] == ["2.50", "70.68"]
+
+
 def test_tax():
     result = safeway.tax(FOOTER)
     assert result == "2.50"
@@ -187,3 +206,31 @@ def test_remove_discount():
     for item in result:
         sum += item.value
     assert sum == Decimal("68.18")
+
+
+def test_pipeline():
+    pipeline = safeway.Pipeline(HEADER + BODY + FOOTER)
+    collated = pipeline["collate"]
+    assert list(pipeline.timings) == [
+        "header", "footer", "labels", "categorize", "collate"]
+    assert pipeline["collate"] is collated
+
+    # collating leaves the categorized descriptions for inspection
+    items, _ = pipeline["categorize"]
+    assert items[0].desc == "JIFFY"
+    assert items[0].value == 0
+    assert collated[0].value == Decimal("3.99")
+
+    assert [str(i) for i in pipeline["result"]] == [
+        str(i) for i in safeway.classify(HEADER + BODY + FOOTER)]
+
+
+def test_cli_directory(tmp_path):
+    (tmp_path / "a.txt").write_text(HEADER + BODY + FOOTER)
+    (tmp_path / "b.txt").write_text(HEADER + BODY)
+    result = CliRunner().invoke(
+        safeway.cli, ["--timings", "collate", str(tmp_path)])
+    assert result.exit_code == 0
+    assert result.stdout.count("==> ") == 2
+    assert "b.txt: ReceiptError('no TAX line')" in result.stderr
+    assert "categorize" in result.stderr
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import threading
+
+import pytest
+
+from receipts import client
+from receipts.cache import ItemCache
+from receipts.classify import classify
+from receipts.server import Server
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = Server(str(tmp_path / "receipts.sock"))
+    threading.Thread(target=server.serve_forever, args=(0.05,),
+                     daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(path, command, data, json_output=False):
+    with socket.socket(socket.AF_UNIX) as connection:
+        connection.connect(path)
+        with connection.makefile("rb") as replies:
+            return client.send(connection, replies, command, data, "a.txt",
+                               json_output)
+
+
+def test_classify(server):
+    data = HEADER + BODY + FOOTER
+    response = request(server.path, "classify", data)
+    assert response["ok"]
+    assert response["output"].splitlines() == [
+        str(item) for item in classify(data, source="a.txt")]
+
+
+def test_summary(server):
+    response = request(server.path, "summary", HEADER + BODY + FOOTER)
+    assert '"total": "70.68"' in response["output"]
+
+
+def test_error(server):
+    response = request(server.path, "classify", "garbage")
+    assert response == {"ok": False, "error": "unable to classify data"}
+
+
+def test_concurrent(server):
+    data = HEADER + BODY + FOOTER
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(
+            lambda _: request(server.path, "classify", data, True),
+            range(32)))
+    assert all(response["ok"] for response in responses)
+    assert len({response["output"] for response in responses}) == 1
+
+
+def test_client(server, tmp_path, capsys):
+    path = tmp_path / "a.txt"
+    path.write_text(HEADER + BODY + FOOTER)
+    client.main(["--socket", server.path, "--summary", str(path)])
+    assert '"source": "a.txt"' in capsys.readouterr().out
+
+
+def test_already_running(server):
+    with pytest.raises(Exception):
+        Server(server.path)
+
+
+def test_no_cache(tmp_path):
+    cache = ItemCache(str(tmp_path / "cache"))
+    server = Server(str(tmp_path / "receipts.sock"), cache)
+    threading.Thread(target=server.serve_forever, args=(0.05,),
+                     daemon=True).start()
+    try:
+        path = tmp_path / "a.txt"
+        path.write_text(HEADER + BODY + FOOTER)
+        client.main(["--socket", server.path, "--no-cache", "--budget", "2",
+                     "-n", "4", "--unordered", str(path)])
+        assert not (tmp_path / "cache").exists()
+        client.main(["--socket", server.path, str(path)])
+        assert list(cache.entries())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_errors_run_locally(server, tmp_path, capsys):
+    good = tmp_path / "a.txt"
+    good.write_text(HEADER + BODY + FOOTER)
+    bad = tmp_path / "b.txt"
+    bad.write_text("garbage\n")
+    report = tmp_path / "failed.jsonl"
+    with pytest.raises(SystemExit) as exit:
+        client.main(["--socket", server.path, "--summary", "--no-cache",
+                     "--errors", str(report), str(good), str(bad)])
+    assert exit.value.code == 1
+    assert '"source": "a.txt"' in capsys.readouterr().out
+    assert '"source": "b.txt"' in report.read_text()
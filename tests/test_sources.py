@@ -0,0 +1,79 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from receipts import classify
+from receipts import sources
+from tests.test_safeway import BODY, FOOTER, HEADER
+from tests.test_wholefoods import RECEIPT as WHOLEFOODS
+
+
+SAFEWAY = HEADER + BODY + FOOTER
+
+
+def write_zip(tmp_path):
+    path = tmp_path / "2022-01.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("jan/", "")
+        archive.writestr("jan/a.txt", SAFEWAY)
+        archive.writestr("jan/b.txt", WHOLEFOODS)
+    return str(path)
+
+
+@pytest.mark.parametrize("suffix,mode", (
+    (".tar", "w"),
+    (".tar.gz", "w:gz"),
+))
+def test_tar_members(tmp_path, suffix, mode):
+    (tmp_path / "a.txt").write_text(SAFEWAY)
+    (tmp_path / "b.txt").write_text(WHOLEFOODS)
+    path = tmp_path / f"2022-01{suffix}"
+    with tarfile.open(path, mode) as archive:
+        archive.add(tmp_path / "a.txt", "jan/a.txt")
+        archive.add(tmp_path / "b.txt", "jan/b.txt")
+    result = list(sources.members([str(path)]))
+    assert result == [
+        (f"2022-01{suffix}:jan/a.txt", SAFEWAY),
+        (f"2022-01{suffix}:jan/b.txt", WHOLEFOODS),
+    ]
+
+
+def test_zip_members(tmp_path):
+    result = list(sources.members([write_zip(tmp_path)]))
+    assert result == [
+        ("2022-01.zip:jan/a.txt", SAFEWAY),
+        ("2022-01.zip:jan/b.txt", WHOLEFOODS),
+    ]
+
+
+@pytest.mark.parametrize("mmap_size", (1, 1 << 20))
+def test_dump_members(tmp_path, monkeypatch, mmap_size):
+    monkeypatch.setattr(sources, "MMAP_SIZE", mmap_size)
+    path = tmp_path / "scan.dump"
+    path.write_text(SAFEWAY + WHOLEFOODS)
+    result = list(sources.members([str(path)]))
+    assert result == [
+        ("scan.dump@0", SAFEWAY),
+        (f"scan.dump@{len(SAFEWAY.encode())}", WHOLEFOODS),
+    ]
+
+
+def test_file_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(sources, "MMAP_SIZE", 1)
+    path = tmp_path / "receipt.txt"
+    path.write_text(SAFEWAY)
+    assert list(sources.members([str(path)])) == [("receipt.txt", SAFEWAY)]
+    # a large plain file is still one receipt
+    path.write_text(SAFEWAY + WHOLEFOODS)
+    assert list(sources.members([str(path)])) == \
+        [("receipt.txt", SAFEWAY + WHOLEFOODS)]
+
+
+def test_classify_paths(tmp_path):
+    path = tmp_path / "receipt.txt"
+    path.write_text(WHOLEFOODS)
+    result = classify.classify_paths([write_zip(tmp_path), str(path)],
+                                     jobs=2)
+    assert [items[-1].value for items in result] == [
+        "2022-01.zip:jan/a.txt", "2022-01.zip:jan/b.txt", "receipt.txt"]
@@ -0,0 +1,69 @@
+import pytest
+
+from receipts import budget
+from receipts import split
+from tests import test_harristeeter
+from tests import test_wholefoods
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+SAFEWAY = HEADER + BODY + FOOTER
+# a store name in the footer is not followed by a receipt body
+HARRISTEETER = (
+    test_harristeeter.RECEIPT + "Thank you for shopping Harris Teeter\n")
+WHOLEFOODS = test_wholefoods.RECEIPT
+RECEIPTS = (HARRISTEETER, SAFEWAY, WHOLEFOODS, SAFEWAY)
+DUMP = "scanner page 1\n" + "".join(RECEIPTS)
+
+
+def offsets():
+    result, offset = [], len("scanner page 1\n")
+    for receipt in RECEIPTS:
+        result.append(offset)
+        offset += len(receipt)
+    return result
+
+
+def test_segments():
+    result = list(split.segments(DUMP))
+    assert [offset for offset, _ in result] == offsets()
+    assert [text for _, text in result] == list(RECEIPTS)
+
+
+def test_segments_signature_in_body():
+    # a section label after an item named for the store is not a new receipt
+    safeway = SAFEWAY.replace("JIFFY\n", "SAFEWAY JIFFY\nGROCERY\n")
+    result = list(split.segments(safeway + WHOLEFOODS))
+    assert [offset for offset, _ in result] == [0, len(safeway)]
+
+
+def test_segments_none():
+    with pytest.raises(Exception):
+        list(split.segments("TRADER JOES\n"))
+
+
+def test_segments_budget():
+    segments = split.segments(DUMP, budget=1e-9)
+    with pytest.raises(budget.ParseTimeout) as error:
+        next(segments)
+    assert error.value.stage == "split"
+    budget.check()  # the limit ends with the search
+    assert list(split.segments(DUMP, budget=None)) == \
+        list(split.segments(DUMP))
+
+
+def test_classify_dump():
+    result = list(split.classify_dump(DUMP, "scan.txt"))
+    assert [items[-1].value for items in result] == [
+        f"scan.txt@{offset}" for offset in offsets()]
+
+
+def test_classify_dump_parallel():
+    data = "".join(RECEIPTS * 20)
+    serial = list(split.classify_dump(data, "scan.txt"))
+    parallel = list(split.classify_dump(data, "scan.txt", jobs=2))
+    assert [[str(i) for i in items] for items in parallel] == [
+        [str(i) for i in items] for items in serial]
+    unordered = split.classify_dump(data, "scan.txt", jobs=2, ordered=False)
+    assert sorted(items[-1].value for items in unordered) == sorted(
+        items[-1].value for items in serial)
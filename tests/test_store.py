@@ -0,0 +1,141 @@
+import json
+import sqlite3
+
+from click.testing import CliRunner
+import pytest
+
+from receipts.item import Item, normalize
+from receipts.store import Store, cli
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+SAFEWAY = HEADER + BODY + FOOTER
+
+
+def receipt(source, vendor, date, *lines):
+    items = [Item(Item.VENDOR, value=vendor)]
+    items.extend(Item(kind, desc, cost) for kind, desc, cost in lines)
+    items.append(Item(Item.TAX, value="0.10"))
+    items.append(Item(Item.DATE, value=date))
+    items.append(Item(Item.SOURCE, value=source))
+    return items
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(str(tmp_path / "receipts.db"))
+    store.ingest([
+        receipt("a.txt", "SAFEWAY", "2022-01-08",
+                (Item.FOOD, "COFFEE", "11.99"),
+                (Item.FOOD, "Coffee-Beans", "5.00"),
+                (Item.NON_FOOD, "FOIL", "5.99")),
+        receipt("b.txt", "SAFEWAY", "2022-02-01",
+                (Item.FOOD, "COFFEE", "12.99")),
+        receipt("c.txt", "WHOLEFOODS", "2022-02-03",
+                (Item.FOOD, "COFFEE BEANS", "9.99")),
+    ])
+    yield store
+    store.close()
+
+
+def test_normalize():
+    assert normalize(" Coffee-Beans, 12oz ") == "COFFEE BEANS 12OZ"
+
+
+def test_query(store):
+    assert store.query() == [(4596, 5)]
+    assert store.query(("vendor",)) == [
+        ("SAFEWAY", 3597, 4), ("WHOLEFOODS", 999, 1)]
+
+
+def test_query_desc_month(store):
+    assert store.query(("month",), vendor="SAFEWAY", desc="coffee") == [
+        ("2022-01", 1699, 2), ("2022-02", 1299, 1)]
+    assert store.query(desc="*BEANS") == [(1499, 2)]
+
+
+def test_query_range(store):
+    assert store.query(since="2022-02-01", until="2022-02-02") == [(1299, 1)]
+    assert store.query(("kind",), kinds=(Item.TAX,)) == [("X", 30, 3)]
+
+
+def test_ingest_idempotent(store):
+    store.ingest([receipt("b.txt", "SAFEWAY", "2022-02-01",
+                          (Item.FOOD, "COFFEE", "1.00"))])
+    assert store.query(("vendor",)) == [
+        ("SAFEWAY", 2398, 4), ("WHOLEFOODS", 999, 1)]
+    count, = store.connection.execute("SELECT count(*) FROM receipt")
+    assert count == (3,)
+
+
+def test_no_source(store):
+    with pytest.raises(ValueError):
+        store.ingest([[Item(Item.FOOD, "COFFEE", "1.00")]])
+
+
+def test_bad_group(store):
+    with pytest.raises(ValueError):
+        store.query(("store",))
+
+
+def test_failed_receipt_keeps_others(store):
+    def receipts():
+        yield receipt("d.txt", "SAFEWAY", "2022-03-01",
+                      (Item.FOOD, "COFFEE", "1.00"))
+        yield [Item(Item.FOOD, "COFFEE", "2.00")]  # no source
+
+    with pytest.raises(ValueError):
+        store.ingest(receipts())
+    sources = [row[0] for row in store.connection.execute(
+        "SELECT source FROM receipt ORDER BY source")]
+    assert sources == ["a.txt", "b.txt", "c.txt", "d.txt"]
+    assert store.query(since="2022-03-01") == [(100, 1)]
+
+
+def test_desc_column_renamed(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        "CREATE TABLE item (receipt INTEGER NOT NULL, kind TEXT NOT NULL,"
+        " desc TEXT, normalized TEXT, cents INTEGER NOT NULL, vendor TEXT,"
+        " date TEXT);")
+    connection.close()
+    store = Store(path)
+    store.ingest([receipt("a.txt", "SAFEWAY", "2022-01-08",
+                          (Item.FOOD, "COFFEE", "11.99"))])
+    assert store.connection.execute(
+        "SELECT description FROM item WHERE kind = ?",
+        (Item.FOOD,)).fetchall() == [("COFFEE",)]
+    store.close()
+
+
+def test_cli_same_names(tmp_path):
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "0001.txt").write_text(SAFEWAY)
+    db = str(tmp_path / "receipts.db")
+    result = CliRunner().invoke(cli, [
+        "--db", db, "--duplicates", "ingest", "--no-cache",
+        str(tmp_path / "a" / "0001.txt"), str(tmp_path / "b" / "0001.txt")])
+    assert result.exit_code == 0, result.output
+    assert "2 receipts stored" in result.output
+    store = Store(db)
+    sources = [row[0] for row in store.connection.execute(
+        "SELECT source FROM receipt ORDER BY source")]
+    store.close()
+    assert sources == [str(tmp_path / "a" / "0001.txt"),
+                       str(tmp_path / "b" / "0001.txt")]
+
+
+def test_cli_errors(tmp_path):
+    (tmp_path / "good.txt").write_text(SAFEWAY)
+    (tmp_path / "bad.txt").write_text("garbage\n")
+    db = str(tmp_path / "receipts.db")
+    errors = tmp_path / "failed.jsonl"
+    result = CliRunner().invoke(cli, [
+        "--db", db, "ingest", "--no-cache", "--errors", str(errors),
+        str(tmp_path / "bad.txt"), str(tmp_path / "good.txt")])
+    assert result.exit_code == 1
+    assert "1 receipts stored" in result.output
+    record, = map(json.loads, errors.read_text().splitlines())
+    assert record["source"] == str(tmp_path / "bad.txt")
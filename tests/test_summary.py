@@ -0,0 +1,59 @@
+import json
+import zipfile
+
+from click.testing import CliRunner
+import pytest
+
+from receipts.classify import classify
+from receipts.item import Item, ItemBatch
+from receipts.summary import cli, summary
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+def test_summary():
+    result = summary(classify(HEADER + BODY + FOOTER, source="a.txt"))
+    assert result["vendor"] == "SAFEWAY"
+    assert result["source"] == "a.txt"
+    assert str(result["total"]) == "70.68"
+    assert str(result["food"]) == "33.23"
+
+
+def test_summary_batch():
+    data = HEADER + BODY + FOOTER
+    items = classify(data)
+    assert summary(ItemBatch.from_items(items)) == summary(items)
+
+
+def test_summary_batch_without_date():
+    items = [Item(Item.VENDOR, value="SAFEWAY"),
+             Item(Item.FOOD, "Blah", "1.00"), Item(Item.TAX, value="0.10"),
+             Item(Item.TOTAL, value="1.10")]
+    batch = ItemBatch.from_items(items)
+    batch.append(Item.DATE, value=None)
+    assert summary(batch)["date"] is None
+    assert summary(batch) == summary(items)
+
+
+def test_summary_mismatch():
+    items = [Item(Item.FOOD, "Blah", "1.00"), Item(Item.TAX, value="0.10"),
+             Item(Item.TOTAL, value="1.00")]
+    with pytest.raises(Exception):
+        summary(items)
+    with pytest.raises(Exception):
+        summary(ItemBatch.from_items(items))
+
+
+def test_cli_archive_and_dump(tmp_path):
+    data = HEADER + BODY + FOOTER
+    archive = tmp_path / "receipts.zip"
+    with zipfile.ZipFile(archive, "w") as members:
+        members.writestr("a.txt", data)
+    dump = tmp_path / "scan.dump"
+    dump.write_text(data + data)
+    result = CliRunner().invoke(cli, ["--no-cache", str(archive), str(dump)])
+    assert result.exit_code == 0, result.output
+    results = [json.loads(line) for line in result.output.splitlines()]
+    assert [result["source"] for result in results] == [
+        "receipts.zip:a.txt", "scan.dump@0", f"scan.dump@{len(data)}"]
+    assert {result["total"] for result in results} == {"70.68"}
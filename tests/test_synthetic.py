@@ -0,0 +1,49 @@
+import pytest
+
+from receipts.classify import classify
+from receipts.item import Item
+from receipts.summary import summary
+from receipts import synthetic
+from receipts import vendor
+
+
+@pytest.mark.parametrize("name", synthetic.VENDORS)
+@pytest.mark.parametrize("lines,discounts,misalign", (
+    (2, 0.0, 0.0),
+    (50, 0.2, 0.0),
+    (50, 1.0, 1.0),
+    (2000, 0.5, 0.5),
+))
+def test_receipt(name, lines, discounts, misalign):
+    for seed in range(5):
+        data = synthetic.receipt(name, lines, discounts, misalign, seed)
+        items = classify(data)
+        assert vendor.detect(data).NAME == name
+        result = summary(items)
+        assert result["vendor"] == name
+        assert result["total"] > 0
+
+
+def test_receipt_items():
+    data = synthetic.receipt("HARRISTEETER", lines=20, discounts=0.0,
+                             seed=1)
+    items = [i for i in classify(data) if i.kind in (Item.FOOD,
+                                                     Item.NON_FOOD)]
+    assert len(items) == 10
+
+
+def test_seed():
+    assert synthetic.receipt("SAFEWAY", seed=3) == \
+        synthetic.receipt("SAFEWAY", seed=3)
+    assert synthetic.receipt("SAFEWAY", seed=3) != \
+        synthetic.receipt("SAFEWAY", seed=4)
+
+
+def test_receipts():
+    result = [vendor.detect(data).NAME for data in synthetic.receipts(4)]
+    assert result == list(synthetic.VENDORS) + [synthetic.VENDORS[0]]
+
+
+def test_unknown_vendor():
+    with pytest.raises(ValueError):
+        synthetic.receipt("TRADERJOES")
@@ -0,0 +1,79 @@
+import re
+import subprocess
+import sys
+import types
+
+import pytest
+
+from receipts import harristeeter
+from receipts import safeway
+from receipts import vendor
+from receipts import wholefoods
+
+
+@pytest.mark.parametrize("data,result", (
+    ("Harris Teeter\nVIC CUSTOMER 12\n", harristeeter),
+    ("SAFEWAY\nStore 1234\nGROCERY\n", safeway),
+    ("WHOLE FOODS\nMARKET\n", wholefoods),
+    ("WH0LE FOODS\nMARKET\n", wholefoods),
+    ("TRADER JOES\n", None),
+))
+def test_detect(data, result):
+    assert vendor.detect(data) is result
+
+
+def test_detect_priority():
+    assert vendor.detect("SAFEWAY\nHarris Teeter\n") is harristeeter
+
+
+def test_detect_header_window():
+    data = "\n" * vendor.HEADER_WINDOW + "SAFEWAY\n"
+    assert vendor.detect(data) is None
+
+
+@pytest.mark.parametrize("module", (harristeeter, safeway, wholefoods))
+def test_builtin(module):
+    signature = vendor._vendors[vendor.names().index(module.NAME)][1]
+    assert signature == module.SIGNATURE
+
+
+def test_register(monkeypatch):
+    monkeypatch.setattr(vendor, "_vendors", [
+        list(entry) for entry in vendor._vendors])
+    monkeypatch.setattr(vendor, "_detectors", {})
+    monkeypatch.setattr(vendor, "_markers", {})
+    other = types.SimpleNamespace(NAME="OTHER", SIGNATURE=re.escape("CO-OP"))
+    vendor.register(other)
+    assert vendor.detect("THE CO-OP\n") is other
+    assert vendor.detect("SAFEWAY\n") is safeway
+    assert vendor.names()[-1] == "OTHER"
+
+
+def test_register_by_name(monkeypatch):
+    monkeypatch.setattr(vendor, "_vendors", [])
+    monkeypatch.setattr(vendor, "_detectors", {})
+    monkeypatch.setattr(vendor, "_markers", {})
+    vendor.register("receipts.safeway", "SAFEWAY", "SAFEWAY")
+    assert vendor._vendors[0][2] == "receipts.safeway"
+    assert vendor.detect("SAFEWAY\n") is safeway
+    assert vendor._vendors[0][2] is safeway
+    with pytest.raises(ValueError):
+        vendor.register("receipts.other")
+
+
+def test_lazy_import():
+    code = (
+        "import sys, receipts.classify, receipts.summary, receipts.pipeline;"
+        "print(sorted(m for m in sys.modules if m in ("
+        "'receipts.harristeeter', 'receipts.safeway',"
+        "'receipts.wholefoods', 'google.cloud.vision')))")
+    result = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_builtin_markers():
+    for index, name in enumerate(vendor.names()):
+        module = vendor.load(index)
+        body, footer = vendor.markers(index)
+        assert (body.pattern, footer.pattern) == (module.BODY, module.FOOTER)
@@ -0,0 +1,120 @@
+import sys
+
+from click.testing import CliRunner
+import pytest
+
+from receipts import vision
+from receipts.standin import StandIn
+
+
+class FakeAnnotator:
+
+    def __init__(self):
+        self.calls = 0
+
+    def annotate(self, content):
+        self.calls += 1
+        return {"textAnnotations": [{"description": content.decode()}]}
+
+
+def write_image(tmp_path, content):
+    path = tmp_path / "receipt.jpg"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_annotate(tmp_path):
+    annotator = FakeAnnotator()
+    path = write_image(tmp_path, b"SAFEWAY\n")
+    response = vision.annotate(path, annotator=annotator)
+    assert vision.text(response) == "SAFEWAY\n"
+    assert "google.cloud.vision" not in sys.modules
+
+
+def test_text_empty():
+    assert vision.text({}) == ""
+
+
+def test_cache(tmp_path):
+    annotator = FakeAnnotator()
+    cache = vision.ResponseCache(str(tmp_path / "cache"))
+    path = write_image(tmp_path, b"SAFEWAY\n")
+    first = vision.annotate(path, annotator=annotator, cache=cache)
+    second = vision.annotate(path, annotator=annotator, cache=cache)
+    assert first == second
+    assert annotator.calls == 1
+
+    path = write_image(tmp_path, b"WHOLE FOODS\n")
+    vision.annotate(path, annotator=annotator, cache=cache)
+    assert annotator.calls == 2
+
+
+@pytest.fixture
+def standin():
+    server = StandIn().start()
+    yield server
+    server.stop()
+
+
+def write_images(tmp_path, count):
+    paths = []
+    for index in range(count):
+        path = tmp_path / f"receipt{index}.jpg"
+        path.write_bytes(f"RECEIPT {index}\n".encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_http_annotator(standin):
+    annotator = vision.HttpAnnotator(standin.url)
+    assert vision.text(annotator.annotate(b"SAFEWAY\n")) == "SAFEWAY\n"
+
+
+def test_annotate_batch(tmp_path, standin):
+    paths = write_images(tmp_path, 10)
+    annotator = vision.HttpAnnotator(standin.url)
+    result = dict(vision.annotate_batch(
+        paths, annotator, batch_size=3, jobs=2))
+    assert {path: vision.text(response) for path, response in
+            result.items()} == {path: f"RECEIPT {index}\n"
+                                for index, path in enumerate(paths)}
+    assert standin.requests == 4
+    assert standin.images == 10
+
+
+def test_annotate_batch_retry(tmp_path, standin):
+    standin.failures = 2
+    paths = write_images(tmp_path, 2)
+    annotator = vision.HttpAnnotator(standin.url)
+    result = list(vision.annotate_batch(
+        paths, annotator, batch_size=2, backoff=0.01))
+    assert all("error" not in response for _, response in result)
+    assert standin.requests == 3
+
+
+def test_annotate_batch_error(tmp_path, standin):
+    standin.failures = 10
+    paths = write_images(tmp_path, 2)
+    annotator = vision.HttpAnnotator(standin.url)
+    result = list(vision.annotate_batch(
+        paths, annotator, retries=1, backoff=0.01))
+    assert len(result) == 2
+    assert all("error" in response for _, response in result)
+
+
+def test_annotate_batch_cache(tmp_path, standin):
+    paths = write_images(tmp_path, 4)
+    annotator = vision.HttpAnnotator(standin.url)
+    cache = vision.ResponseCache(str(tmp_path / "cache"))
+    list(vision.annotate_batch(paths[:2], annotator, cache))
+    list(vision.annotate_batch(paths, annotator, cache))
+    assert standin.images == 4
+
+
+def test_cli(tmp_path, standin):
+    paths = write_images(tmp_path, 3)
+    output = tmp_path / "text"
+    result = CliRunner().invoke(vision.cli, [
+        "--no-cache", "--endpoint", standin.url, "-o", str(output)] + paths)
+    assert result.exit_code == 0
+    assert (output / "receipt2.txt").read_text() == "RECEIPT 2\n"
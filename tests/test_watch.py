@@ -0,0 +1,119 @@
+import io
+import json
+import os
+
+import pytest
+
+from receipts import watch
+
+from tests.test_safeway import BODY, FOOTER, HEADER
+
+
+class Recorder:
+
+    def __init__(self):
+        self.paths = []
+
+    def __call__(self, path):
+        self.paths.append(os.path.basename(path))
+        if "bad" in path:
+            raise Exception("unable to classify data")
+
+
+def test_watch_once(tmp_path):
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "b.jpg").write_text("B")
+    (tmp_path / "notes.md").write_text("C")
+    handle = Recorder()
+    watch.watch(str(tmp_path), handle, once=True)
+    assert handle.paths == ["a.txt", "b.jpg"]
+
+    # restart: nothing new
+    handle = Recorder()
+    watch.watch(str(tmp_path), handle, once=True)
+    assert handle.paths == []
+
+    # touched but unchanged, then changed, then new
+    os.utime(tmp_path / "a.txt", (1, 1))
+    (tmp_path / "b.jpg").write_text("BB")
+    (tmp_path / "c.txt").write_text("C")
+    watch.watch(str(tmp_path), handle, once=True)
+    assert handle.paths == ["b.jpg", "c.txt"]
+
+
+def test_watch_error(tmp_path, capsys, monkeypatch):
+    (tmp_path / "bad.txt").write_text("A")
+    handle = Recorder()
+    now = 1000.0
+    monkeypatch.setattr(watch.time, "time", lambda: now)
+    watch.watch(str(tmp_path), handle, once=True)
+    watch.watch(str(tmp_path), handle, once=True)
+    assert handle.paths == ["bad.txt"]  # not retried until it is due
+
+    manifest = json.loads((tmp_path / watch.MANIFEST).read_text())
+    assert manifest["bad.txt"]["error"] == "unable to classify data"
+    assert manifest["bad.txt"]["retry"] == now + watch.RETRY_DELAY
+
+    # retried once due, waiting twice as long after failing again
+    now += watch.RETRY_DELAY
+    watch.watch(str(tmp_path), handle, once=True)
+    assert handle.paths == ["bad.txt", "bad.txt"]
+    manifest = json.loads((tmp_path / watch.MANIFEST).read_text())
+    assert manifest["bad.txt"]["retry"] == now + 2 * watch.RETRY_DELAY
+
+    # recorded as handled once it succeeds
+    now += 2 * watch.RETRY_DELAY
+    (tmp_path / "bad.txt").rename(tmp_path / "good.txt")
+    watch.watch(str(tmp_path), handle, once=True)
+    manifest = json.loads((tmp_path / watch.MANIFEST).read_text())
+    assert list(manifest) == ["good.txt"]
+    assert manifest["good.txt"]["error"] is None
+
+
+def test_update_saves_in_batches(tmp_path, monkeypatch):
+    for index in range(5):
+        (tmp_path / f"{index}.txt").write_text(str(index))
+    monkeypatch.setattr(watch, "SAVE_EVERY", 2)
+    manifest = watch.Manifest(str(tmp_path / watch.MANIFEST))
+    saves = []
+    save = manifest.save
+    monkeypatch.setattr(manifest, "save", lambda: saves.append(
+        len(manifest.files)) or save())
+    watch.update(watch.scan(str(tmp_path)), manifest, Recorder())
+    assert saves == [2, 4, 5]
+    watch.update(watch.scan(str(tmp_path)), manifest, Recorder())
+    assert saves == [2, 4, 5]  # nothing changed, nothing saved
+
+
+def test_handler(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text(HEADER + BODY + FOOTER)
+    output = io.StringIO()
+    watch.Handler(output, cache=False)(str(path))
+    assert json.loads(output.getvalue())["total"] == "70.68"
+
+
+def test_inotify(tmp_path):
+    try:
+        changes = watch.Inotify(str(tmp_path))
+    except (AttributeError, OSError, TypeError):
+        pytest.skip("inotify is not available")
+    assert changes.wait(0) == []
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "notes.md").write_text("B")
+    assert changes.wait(1) == [str(tmp_path / "a.txt")]
+    changes.close()
+
+
+def test_inotify_overflow(tmp_path, monkeypatch):
+    try:
+        changes = watch.Inotify(str(tmp_path))
+    except (AttributeError, OSError, TypeError):
+        pytest.skip("inotify is not available")
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "b.txt").write_text("B")
+    overflow = watch.EVENT.pack(-1, watch.IN_Q_OVERFLOW, 0, 0)
+    monkeypatch.setattr(watch.os, "read", lambda fd, size: overflow)
+    assert changes.wait(1) == [str(tmp_path / "a.txt"),
+                               str(tmp_path / "b.txt")]
+    changes.close()
@@ -0,0 +1,54 @@
+from receipts import wholefoods
+
+
+RECEIPT = (
+    "WHOLE FOODS\n"
+    "MARKET\n"
+    "123 Main St\n"
+    "Mytown, MO 12345\n"
+    "ORGANIC BANANAS\n"
+    "$1.23 FT\n"
+    "*Sale* Bananas\n"
+    "-$0.20\n"
+    "COFFEE BEANS $11.99 FT\n"
+    "Prime Extra 10% - $1.20\n"
+    "**PRIME MEMBER DEAL - $1.00\n"
+    "HOT BAR\n"
+    "$8.50 T\n"
+    "PAPER TOWELS $5.99 T\n"
+    "Tax: 2.00% $0.42\n"
+    "Tax 6.00% $0.36\n"
+    "Total: $25.09\n"
+    "VISA\n"
+    "01/08/2022 13:46\n"
+)
+
+
+def test_classify():
+    result = [str(item) for item in wholefoods.classify(RECEIPT)]
+    assert result == [
+        "V Vendor WHOLEFOODS",
+        "F ORGANIC BANANAS 1.23",
+        "F *Sale* Bananas  -0.20",
+        "F COFFEE BEANS 11.99",
+        "F Prime Extra 10%  -1.20",
+        "F **PRIME MEMBER DEAL -1.00",
+        "F HOT BAR 8.50",
+        "N PAPER TOWELS 5.99",
+        "X Tax 0.42",
+        "X Tax 0.36",
+        "T Total 25.09",
+        "D Date 2022-01-08",
+    ]
+
+
+def test_discount_before_next_item():
+    data = RECEIPT.replace("-$0.20\n", "")
+    result = [str(item) for item in wholefoods.classify(data)]
+    assert result[2] == "F *Sale* Bananas COFFEE BEANS 11.99"
+
+
+def test_tax_over_ten_dollars():
+    data = RECEIPT.replace("Tax 6.00% $0.36", "Tax 6.00% $10.36")
+    result = [str(item) for item in wholefoods.classify(data)]
+    assert "X Tax 10.36" in result